@@ -0,0 +1,77 @@
+"""
+Measure the import time of the package's entry point (`pyxsys.cli`, as imported by
+`python -m pyxsys`) and of each collector's modules on top of it (imported only when
+the collector is toggled on), and of the daemon's thin client (`pyxsys.client`), from
+`python -X importtime` in fresh interpreters.
+
+Usage (from the repository root):
+
+    python benchmarks/bench_import.py [-n REPEATS]
+"""
+import subprocess
+import sys
+from pathlib import Path
+from argparse import ArgumentParser
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+
+# The modules imported by each collector of `pyxsys.collect` when it runs
+COLLECTOR_MODULES = {
+    "firefox": ["pyxsys.firefox"],
+    "x": ["pyxsys.xwininfo", "pyxsys.x11"],
+    "wm": ["pyxsys.wm.territory"],
+    "tmux": ["pyxsys.tm.server", "pyxsys.tm.session", "pyxsys.tm.window"],
+}
+
+
+def import_time(modules):
+    """
+    Import the modules in a fresh interpreter with `-X importtime`, and return the
+    total import time in seconds (the sum of the cumulative times of the modules it
+    imported at the top level) and the names of the `pyxsys` modules imported.
+    """
+    statement = "; ".join(f"import {m}" for m in modules)
+    cmd = [sys.executable, "-X", "importtime", "-c", statement]
+    result = subprocess.run(cmd, capture_output=True, cwd=SRC_DIR, text=True)
+    assert result.returncode == 0, f"Import failed.\n{result.stderr}"
+    total_us = 0
+    pyxsys_modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or line.endswith("imported package"):
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if not name.startswith("  "):
+            total_us += int(cumulative)
+        if name.strip().startswith("pyxsys"):
+            pyxsys_modules.append(name.strip())
+    return total_us / 1e6, pyxsys_modules
+
+
+def best_import_time(modules, repeats):
+    timings = []
+    for _ in range(repeats):
+        t, pyxsys_modules = import_time(modules)
+        timings.append(t)
+    return min(timings), pyxsys_modules
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("-n", "--repeats", type=int, default=5)
+    args = parser.parse_args()
+    all_modules = [m for ms in COLLECTOR_MODULES.values() for m in ms]
+    cases = {"pyxsys.cli": ["pyxsys.cli"]}
+    for name, modules in COLLECTOR_MODULES.items():
+        cases[f"pyxsys.cli + {name}"] = ["pyxsys.cli"] + modules
+    cases["pyxsys.cli + all collectors"] = ["pyxsys.cli"] + all_modules
+    cases["pyxsys.client"] = ["pyxsys.client"]
+    for case, modules in cases.items():
+        t, pyxsys_modules = best_import_time(modules, args.repeats)
+        n = len(pyxsys_modules)
+        msg = f"  {case:<30} {t * 1000:8.2f} ms ({n:2} pyxsys modules)"
+        print(f"{msg} (best of {args.repeats})")
+    return
+
+
+if __name__ == "__main__":
+    main()
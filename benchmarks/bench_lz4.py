@@ -0,0 +1,70 @@
+"""
+Compare reading a Firefox recovery.jsonlz4 through the `dejsonlz4` subprocess with
+the in-process mozLz4 decoder (pure Python, and the C decoder if `lz4` is installed),
+then time re-encoding the decompressed JSON with each mozLz4 encoder.
+
+Usage (from the repository root):
+
+    python benchmarks/bench_lz4.py [PATH_TO_JSONLZ4] [-n REPEATS]
+
+If no path is given, the default profile's recovery.jsonlz4 is used.
+"""
+from sys import path as syspath
+from pathlib import Path
+from argparse import ArgumentParser
+from shutil import which
+from time import perf_counter
+
+syspath.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from pyxsys.lz4 import read_jsonlz4_subprocess, decompress_mozlz4, c_block_decompress
+from pyxsys.lz4 import compress_mozlz4, c_block_compress
+from pyxsys.firefox import find_recovery_json
+from json import loads
+
+
+def best_time(func, repeats):
+    timings = []
+    for _ in range(repeats):
+        t0 = perf_counter()
+        func()
+        timings.append(perf_counter() - t0)
+    return min(timings)
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("path", nargs="?")
+    parser.add_argument("-n", "--repeats", type=int, default=5)
+    args = parser.parse_args()
+    jsonlz4_path = find_recovery_json() if args.path is None else Path(args.path)
+    raw_size = jsonlz4_path.stat().st_size
+    print(f"{jsonlz4_path} ({raw_size} bytes compressed)")
+    cases = {}
+    if which("dejsonlz4") is not None:
+        cases["dejsonlz4 subprocess"] = lambda: read_jsonlz4_subprocess(jsonlz4_path)
+    cases["in-process (pure Python)"] = lambda: loads(
+        decompress_mozlz4(jsonlz4_path.read_bytes(), accelerated=False)
+    )
+    if c_block_decompress is not None:
+        cases["in-process (lz4.block)"] = lambda: loads(
+            decompress_mozlz4(jsonlz4_path.read_bytes())
+        )
+    for label, func in cases.items():
+        t = best_time(func, args.repeats)
+        print(f"{label:<28} {t * 1000:10.2f} ms (best of {args.repeats})")
+    json_buf = bytes(decompress_mozlz4(jsonlz4_path.read_bytes()))
+    print(f"Encoding {len(json_buf)} bytes of JSON")
+    encoders = {"encode (pure Python)": False}
+    if c_block_compress is not None:
+        encoders["encode (lz4.block)"] = True
+    for label, accelerated in encoders.items():
+        encoded = compress_mozlz4(json_buf, accelerated=accelerated)
+        t = best_time(lambda: compress_mozlz4(json_buf, accelerated), args.repeats)
+        ratio = len(json_buf) / len(encoded)
+        print(f"{label:<28} {t * 1000:10.2f} ms (ratio {ratio:.1f}x)")
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Compare parsing `xwininfo -tree -root` output with the single-pass regex parser
+(`process_xwin_tree`) against the original line-by-line parser, on synthetic trees
+of 10k and 100k windows (or on a file of real xwininfo output, if given).
+
+Usage (from the repository root):
+
+    python benchmarks/bench_xwininfo.py [XWININFO_OUTPUT_FILE] [-n REPEATS]
+"""
+from sys import path as syspath
+from pathlib import Path
+from argparse import ArgumentParser
+from time import perf_counter
+
+syspath.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from pyxsys.xwininfo import process_xwin_tree, process_xwin_tree_linewise
+
+
+def best_time(func, repeats):
+    timings = []
+    for _ in range(repeats):
+        t0 = perf_counter()
+        func()
+        timings.append(perf_counter() - t0)
+    return min(timings)
+
+
+def synthetic_xwin_tree(n_windows):
+    """
+    Generate `xwininfo -tree -root` output for about `n_windows` windows, shaped like a
+    reparenting window manager's tree: each client is nested inside an unnamed frame
+    window under the root, and has a child window of its own.
+    """
+    lines = [
+        "",
+        "xwininfo: Window id: 0x6c9 (the root window) (has no name)",
+        "",
+        "  Root window id: 0x6c9 (the root window) (has no name)",
+        "  Parent window id: 0x0 (none)",
+    ]
+    n_frames = n_windows // 3
+    lines.append(f"     {n_frames} children:")
+    for i in range(n_frames):
+        frame_id, client_id, inner_id = (hex(0x1000000 + 3 * i + j) for j in range(3))
+        x, y = (i * 37) % 1920 - 10, (i * 23) % 1080
+        lines.append(f"     {frame_id} (has no name): ()  800x600+{x}+{y}  +{x}+{y}")
+        lines.append("        1 child:")
+        title = f'"Window {i}: a "quoted" title"' if i % 7 else f'"Client {i}"'
+        lines.append(
+            f'        {client_id} {title}: ("app{i % 13}" "App")'
+            + f"  798x570+1+29  +{x + 1}+{y + 29}"
+        )
+        lines.append("           1 child:")
+        lines.append(
+            f"           {inner_id} (has no name): ()  1x1+-1+-1  +{x}+{y + 28}"
+        )
+    lines.extend(["", ""])
+    return "\n".join(lines)
+
+
+def flatten(window):
+    """
+    The fields of every window below `window` (depth-first), to compare parses.
+    """
+    rows = []
+    stack = [window]
+    while stack:
+        win = stack.pop()
+        g = win.geom
+        geom = None if g is None else (g.width, g.height, g.abs_x, g.abs_y)
+        rows.append((win.win_id, win.name, geom, len(win.children)))
+        stack.extend(reversed(win.children))
+    return rows
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("path", nargs="?")
+    parser.add_argument("-n", "--repeats", type=int, default=3)
+    args = parser.parse_args()
+    if args.path is None:
+        inputs = {f"{n} windows": synthetic_xwin_tree(n) for n in (10_000, 100_000)}
+    else:
+        inputs = {args.path: Path(args.path).read_text()}
+    for label, tree_str in inputs.items():
+        n_lines = tree_str.count("\n")
+        print(f"{label} ({n_lines} lines)")
+        new, old = process_xwin_tree(tree_str), process_xwin_tree_linewise(tree_str)
+        assert flatten(new.source) == flatten(old.source), "Parsers disagree"
+        del new, old  # Don't time the garbage collector traversing these trees
+        cases = {
+            "line-by-line parser": process_xwin_tree_linewise,
+            "single-pass regex parser": process_xwin_tree,
+        }
+        for case, func in cases.items():
+            t = best_time(lambda: func(tree_str), args.repeats)
+            print(f"  {case:<26} {t * 1000:10.2f} ms (best of {args.repeats})")
+    return
+
+
+if __name__ == "__main__":
+    main()
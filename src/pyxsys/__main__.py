@@ -1,12 +1,10 @@
-from sys import path as syspath
 from sys import argv
-from pathlib import Path
 from argparse import ArgumentParser
-
-# Put the absolute path to the module directory on the system PATH:
-syspath.insert(0, str(Path(__file__).parent))
+from contextlib import nullcontext
+from pathlib import Path
 
 from pyxsys.cli import main as run_cli
+from pyxsys.instrument import Profiler
 
 parser = ArgumentParser(
     description="Store system session or restore a session from file."
@@ -17,7 +15,25 @@ parser = ArgumentParser(
 # parser.add_argument("-k", "--kill", action="store_true")
 parser.add_argument("-j", "--jsonlz4", action="store")
 parser.add_argument("--remap-territory", dest="wmt_remap", action="store")
+parser.add_argument("--dry-run", dest="remap_dry_run", action="store_true")
 parser.add_argument("-q", "--quiet", action="store_true")
+parser.add_argument("-l", "--lazy", action="store_true")
+parser.add_argument("-p", "--projected", action="store_true")
+parser.add_argument("-c", "--compact", action="store_true")
+parser.add_argument("--x11", dest="x_protocol", action="store_true")
+parser.add_argument("--clients-only", dest="x_clients_only", action="store_true")
+parser.add_argument(
+    "--profile",
+    nargs="?",
+    const="-",
+    metavar="JSON_FILE",
+    help="print a table of the time taken by each stage (or write it as JSON)",
+)
+parser.add_argument(
+    "--profile-memory",
+    action="store_true",
+    help="also trace the peak memory allocated in each stage (slower)",
+)
 target_group = parser.add_argument_group()
 target_group.add_argument("-f", "--firefox-only", action="store_true")
 target_group.add_argument("-x", "--x-win-only", action="store_true")
@@ -37,12 +53,41 @@ arg_l = parser.parse_args(argv)
 jsonlz4 = arg_l.jsonlz4
 wmt_remap = arg_l.wmt_remap
 report = not arg_l.quiet
+ff_lazy = arg_l.lazy
+ff_projected = arg_l.projected
+ff_compact = arg_l.compact
+x_protocol = arg_l.x_protocol
+x_clients_only = arg_l.x_clients_only
+remap_dry_run = arg_l.remap_dry_run
+cli_kwargs = dict(
+    ff_session_file=jsonlz4,
+    wm_territory_file=wmt_remap,
+    report=report,
+    ff_lazy=ff_lazy,
+    ff_projected=ff_projected,
+    ff_compact=ff_compact,
+    x_protocol=x_protocol,
+    x_clients_only=x_clients_only,
+    remap_dry_run=remap_dry_run,
+)
 
-tog_on = [x for (x, v) in arg_l._get_kwargs() if v is True and x in target_dests]
-if len(tog_on) > 0:
-    toggled = tuple([arg_l.__dict__[x] for x in target_dests])
-    rets = run_cli(ff_x_wm_tmux_toggle=toggled, ff_session_file=jsonlz4, wm_territory_file=wmt_remap, report=report)
+if arg_l.profile is not None:
+    profiler = Profiler(trace_memory=arg_l.profile_memory)
 else:
-    rets = run_cli(ff_session_file=jsonlz4, wm_territory_file=wmt_remap, report=report)
+    profiler = None
+
+tog_on = [x for (x, v) in arg_l._get_kwargs() if v is True and x in target_dests]
+with nullcontext() if profiler is None else profiler:
+    if len(tog_on) > 0:
+        toggled = tuple([arg_l.__dict__[x] for x in target_dests])
+        rets = run_cli(ff_x_wm_tmux_toggle=toggled, **cli_kwargs)
+    else:
+        rets = run_cli(**cli_kwargs)
+
+if profiler is not None:
+    if arg_l.profile == "-":
+        print(profiler.table())
+    else:
+        Path(arg_l.profile).write_text(profiler.to_json())
 
 ff_session, x_session, wm_territory, tmux_server, wm_remap = rets
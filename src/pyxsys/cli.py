@@ -1,43 +1,65 @@
-from pyxsys.firefox import read_session as read_ff_session
-from pyxsys.xwininfo import read_xwin_tree
-from pyxsys.wmctrl import read_wmctrl_listings as read_wm
-from pyxsys.tmux import read_tmux_server
-from pyxsys.recover.unpickling import unpickle_vars
-from pyxsys.recover.remap import recover_territory_placement
+from pyxsys.collect import collect
 from sys import _getframe as sys_frame
 
-def main(ff_x_wm_tmux_toggle=tuple([True] * 4), ff_session_file=None, wm_territory_file=None, report=True):
+# The modules of the collectors, the Firefox session projection, and the remapping are
+# only imported once they are needed (see `pyxsys.collect`), to start up quickly
+
+def main(ff_x_wm_tmux_toggle=tuple([True] * 4), ff_session_file=None, wm_territory_file=None, report=True, ff_lazy=False, ff_projected=False, ff_compact=False, x_protocol=False, x_clients_only=False, remap_dry_run=False, deadlines=None):
     """
     Return the Firefox session (from the recovery.jsonlz4 in sessionstore-backups),
     the X window tree (from `xwininfo -tree -root`), the window manager's
     workspace/window mapping (from `wmctrl -d` and `wmctrl -l` respectively),
-    and the current tmux server.
+    and the current tmux server, all collected concurrently (see `pyxsys.collect`).
+
+    If `ff_lazy` is True, the Firefox session's windows and tabs are only
+    instantiated when accessed. If `ff_projected` is True, only the keys of the
+    session JSON which are used by `BrowserSession` are parsed (the rest skipped).
+    If `ff_compact` is True, the session's tabs are stored in compact columns.
+    If `x_protocol` is True, the X window tree is read from the X server directly
+    (over the X11 protocol) rather than from the output of `xwininfo`. If
+    `x_clients_only` is True, only the client windows (and their frames) are kept
+    in the X window tree read from `xwininfo`. If `remap_dry_run` is True, the moves
+    to recover the workspace territory in `wm_territory_file` are only reported.
+
+    Each collector is cancelled if it overruns its deadline (see `deadlines` in
+    `pyxsys.collect⠶collect_async`), and any which timed out or failed are reported
+    and returned as None, rather than stopping the rest.
     """
     if report:
         print("--------------RUNNING pyxsys.cli⠶main()--------------")
-    ff_toggled, x_toggled, wm_toggled, tmux_toggled = ff_x_wm_tmux_toggle
-    if ff_toggled:
-        ff_session = read_ff_session(session_file=ff_session_file)
-    else:
-        ff_session = None
-    if x_toggled:
-        x_tree = read_xwin_tree()
-    else:
-        x_tree = None
-    if wm_toggled:
-        wm_territory = read_wm()
-    else:
-        wm_territory = None
-    if tmux_toggled:
-        tmux_server = read_tmux_server()
+    if ff_projected and ff_x_wm_tmux_toggle[0]:
+        from pyxsys.ff.session import SESSION_KEY_PATHS
+        from pyxsys.jsonscan import JsonProjection
+
+        ff_projection = JsonProjection(SESSION_KEY_PATHS)
     else:
-        tmux_server = None
-    if x_tree is not None and wm_territory is not None:
-        wm_territory.xref_x_session(x_tree)
+        ff_projection = None
+    # Run the toggled collectors concurrently, cross-referencing X and wmctrl
+    ff_session, x_tree, wm_territory, tmux_server, statuses = collect(
+        ff_x_wm_tmux_toggle,
+        ff_session_file=ff_session_file,
+        ff_lazy=ff_lazy,
+        ff_projection=ff_projection,
+        ff_compact=ff_compact,
+        x_protocol=x_protocol,
+        x_clients_only=x_clients_only,
+        deadlines=deadlines,
+    )
+    if report:
+        for status in statuses.values():
+            if status.state in ("timeout", "failed"):
+                print(status)
+    if report and ff_session is not None and ff_projection is not None:
+        print(f"Skipped {ff_projection.skipped_bytes} bytes of session JSON")
     if wm_territory_file is not None:
+        from pyxsys.recover.unpickling import unpickle_vars
+        from pyxsys.recover.remap import recover_territory_placement
+
         unpickle_vars(wm_territory_file, frame=sys_frame(0))
         rec_wmt = sys_frame(0).f_locals["wm_territory_recorded"]
-        wm_remap = recover_territory_placement(rec_wmt, wm_territory)
+        wm_remap = recover_territory_placement(
+            rec_wmt, wm_territory, dry_run=remap_dry_run
+        )
     else:
         wm_remap = None
     if report:
@@ -0,0 +1,85 @@
+"""
+A thin client for the pyx-sys daemon (see `pyxsys.daemon`), which only imports what it
+needs to send a request over the daemon's Unix socket, so it starts up quickly enough
+to call from hotkeys and shell hooks:
+
+    python -m pyxsys.client status
+    python -m pyxsys.client windows [--desktop N]
+    python -m pyxsys.client window_at --x 100 --y 200 [--desktop N]
+    python -m pyxsys.client snapshot [--path FILE]
+    python -m pyxsys.client restore --path FILE [--dry-run]
+"""
+import json
+import os
+import socket
+from pathlib import Path
+from sys import argv
+
+# The requests the daemon answers (see `pyxsys.daemon⠶SnapshotDaemon.handle_request`)
+DAEMON_COMMANDS = [
+    "status",
+    "windows",
+    "tmux",
+    "tabs",
+    "window_at",
+    "refresh",
+    "snapshot",
+    "restore",
+    "stop",
+]
+
+
+def default_socket_path():
+    """
+    The daemon's socket: `pyxsys.sock` in the user's runtime directory (which only
+    they can access) if `XDG_RUNTIME_DIR` is set, else a per-user path in `/tmp`.
+    """
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return Path(runtime_dir) / "pyxsys.sock"
+    return Path(f"/tmp/pyxsys-{os.getuid()}.sock")
+
+
+def query_daemon(command, socket_path=None, timeout=30.0, **params):
+    """
+    Send a request (the command and its parameters, as a line of JSON) to the daemon,
+    and return its response (a dict, with "ok" False and an "error" if it failed).
+    """
+    assert command in DAEMON_COMMANDS, ValueError(f"Unknown command {command!r}")
+    if socket_path is None:
+        socket_path = default_socket_path()
+    request = json.dumps({"command": command, **params}).encode() + b"\n"
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(str(socket_path))
+        sock.sendall(request)
+        with sock.makefile("rb") as reader:
+            line = reader.readline()
+    assert line, ConnectionError("The daemon closed the connection without replying")
+    response = json.loads(line)
+    return response
+
+
+def main(args=None):
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Query the pyx-sys daemon.")
+    parser.add_argument("command", choices=DAEMON_COMMANDS)
+    parser.add_argument("-s", "--socket", dest="socket_path")
+    parser.add_argument("--path", help="the pickle to snapshot to or restore from")
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--x", type=int)
+    parser.add_argument("--y", type=int)
+    parser.add_argument("--desktop", type=int, help="only list windows on this desktop")
+    arg_l = parser.parse_args(args)
+    params = {k: getattr(arg_l, k) for k in ("path", "x", "y", "desktop")}
+    params = {k: v for k, v in params.items() if v is not None}
+    if arg_l.dry_run:
+        params["dry_run"] = True
+    response = query_daemon(arg_l.command, arg_l.socket_path, **params)
+    print(json.dumps(response, indent=2))
+    return 0 if response.get("ok") else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(argv[1:]))
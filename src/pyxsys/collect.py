@@ -0,0 +1,408 @@
+import asyncio
+import os
+from asyncio.subprocess import PIPE
+from concurrent.futures import Executor, Future
+from contextvars import copy_context
+from functools import partial
+from queue import SimpleQueue
+from shutil import which
+from signal import SIGKILL
+from threading import Thread
+from time import monotonic
+from pyxsys.instrument import stage, count
+
+# Each collector imports its reader and object model when it runs, so only those of
+# the collectors toggled on are imported (see `benchmarks/bench_import.py`)
+
+# The collectors, in the order of their results (and of the toggle tuple)
+COLLECTOR_NAMES = ("firefox", "x", "wm", "tmux")
+
+# The seconds each collector may run for before it is cancelled (None for no limit)
+DEFAULT_DEADLINES = {"firefox": 30.0, "x": 10.0, "wm": 5.0, "tmux": 5.0}
+
+# The seconds to wait for a killed command to exit before giving up on it
+KILL_TIMEOUT = 1.0
+
+
+class DaemonThreadExecutor(Executor):
+    """
+    An executor which runs each call on a new daemon thread. Unlike the workers of a
+    ThreadPoolExecutor (which are joined when the interpreter exits), the threads are
+    not waited for at exit, so a call which overruns its collector's deadline (and
+    can't be cancelled, as it is on a thread) doesn't keep the process from exiting.
+    """
+
+    def __init__(self, thread_name_prefix="pyxsys-collect"):
+        self._thread_name_prefix = thread_name_prefix
+        self._n_threads = 0
+        return
+
+    def submit(self, fn, /, *args, **kwargs):
+        future = Future()
+        self._n_threads += 1
+        name = f"{self._thread_name_prefix}_{self._n_threads}"
+        thread = Thread(target=run_future, args=(future, fn, args, kwargs), name=name)
+        thread.daemon = True
+        thread.start()
+        return future
+
+
+def run_future(future, fn, args, kwargs):
+    """
+    Call `fn` and set the result of the `future` to what it returns (or raises),
+    unless the future was cancelled before the call started.
+    """
+    if not future.set_running_or_notify_cancel():
+        return
+    try:
+        result = fn(*args, **kwargs)
+    except BaseException as e:
+        future.set_exception(e)
+    else:
+        future.set_result(result)
+    return
+
+
+class CollectorStatus(object):
+    """
+    How a collector ended: its `state` is "done", "timeout" (if it overran its deadline
+    and was cancelled, killing its subprocesses), "failed" (if it raised the exception
+    `error`, e.g. a failed assertion that its command exited successfully), or
+    "skipped" (if not toggled on), after running for `elapsed` seconds.
+    """
+
+    def __init__(self, name, state, elapsed=0.0, error=None):
+        self._name = name
+        self._state = state
+        self._elapsed = elapsed
+        self._error = error
+        return
+
+    def __repr__(self):
+        repr_str = f"Collector {self.name} {self.state} after {self.elapsed:.3f}s"
+        if self.error is not None:
+            repr_str += f" ({type(self.error).__name__}: {self.error})"
+        return repr_str
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def state(self):
+        return self._state
+
+    @property
+    def elapsed(self):
+        return self._elapsed
+
+    @property
+    def error(self):
+        return self._error
+
+    @property
+    def done(self):
+        return self.state == "done"
+
+
+def collect(
+    ff_x_wm_tmux_toggle=tuple([True] * 4),
+    ff_session_file=None,
+    ff_lazy=False,
+    ff_projection=None,
+    ff_compact=False,
+    x_protocol=False,
+    x_clients_only=False,
+    deadlines=None,
+):
+    """
+    Collect the Firefox session, the X window tree, the window manager's workspace
+    territory, and the tmux server (those toggled on by `ff_x_wm_tmux_toggle`, the rest
+    are None) concurrently, and cross-reference the territory with the X window tree.
+    The parameters are as for `pyxsys.cli⠶main` (see `collect_async`).
+
+    A dict of the `CollectorStatus` of each collector (keyed by the names in
+    `COLLECTOR_NAMES`) follows the four results, any of which is None if its collector
+    didn't finish within its deadline (see `DEFAULT_DEADLINES`) or failed.
+    """
+    collected = asyncio.run(
+        collect_async(
+            ff_x_wm_tmux_toggle,
+            ff_session_file,
+            ff_lazy,
+            ff_projection,
+            ff_compact,
+            x_protocol,
+            x_clients_only,
+            deadlines,
+        )
+    )
+    return collected
+
+
+async def collect_async(
+    ff_x_wm_tmux_toggle=tuple([True] * 4),
+    ff_session_file=None,
+    ff_lazy=False,
+    ff_projection=None,
+    ff_compact=False,
+    x_protocol=False,
+    x_clients_only=False,
+    deadlines=None,
+):
+    """
+    Start every toggled collector at once, so that their subprocesses (`xwininfo`,
+    `wmctrl -d` and `wmctrl -l`, and `tmux list-sessions` and `tmux list-windows`)
+    all run at the same time, and the Firefox session is decompressed and parsed on a
+    thread meanwhile. The output of `xwininfo` is parsed on a thread as it is read,
+    that of the others as soon as they complete, and the territory is cross-referenced
+    with the X window tree once both are ready, so this takes about as long as the
+    slowest collector rather than all of them in turn.
+
+    Each collector is cancelled if it runs past its deadline (the seconds given for
+    its name in `deadlines`, by default those in `DEFAULT_DEADLINES`), killing its
+    subprocesses, and an error in one collector doesn't stop the others, so a hung
+    or failing program only loses its own results. Threads can't be cancelled, so a
+    collector on a thread which overruns is left to finish (or not) in the background,
+    on a daemon thread (see `DaemonThreadExecutor`) which doesn't hold up exiting.
+
+    Returns the Firefox session, X window tree, workspace territory, and tmux server
+    (None for any which weren't collected), and a dict of `CollectorStatus`.
+    """
+    deadlines = {**DEFAULT_DEADLINES, **(deadlines or {})}
+    # Not the event loop's default executor, which is waited for when the loop closes
+    executor = DaemonThreadExecutor()
+    collectors = [
+        collect_ff_session(
+            ff_session_file, ff_lazy, ff_projection, ff_compact, executor=executor
+        ),
+        collect_x_tree(x_protocol, x_clients_only, executor=executor),
+        collect_wm_territory(),
+        collect_tmux_server(),
+    ]
+    tasks = {}
+    for name, collector, toggled in zip(
+        COLLECTOR_NAMES, collectors, ff_x_wm_tmux_toggle
+    ):
+        if toggled:
+            run = run_collector(name, collector, deadlines[name])
+            tasks[name] = asyncio.create_task(run)
+        else:
+            collector.close()
+    xref = None
+    if "x" in tasks and "wm" in tasks:
+        xref = asyncio.create_task(xref_when_ready(tasks["x"], tasks["wm"]))
+    await asyncio.gather(*tasks.values(), *([xref] if xref else []))
+    results, statuses = [], {}
+    for name in COLLECTOR_NAMES:
+        if name in tasks:
+            result, statuses[name] = tasks[name].result()
+        else:
+            result, statuses[name] = None, CollectorStatus(name, "skipped")
+        results.append(result)
+    return (*results, statuses)
+
+
+async def run_collector(name, collector, deadline=None):
+    """
+    Await a collector (coroutine) for up to `deadline` seconds (or without limit, if
+    None), returning its result (None if it didn't finish) and its `CollectorStatus`.
+    """
+    start = monotonic()
+    try:
+        with stage(f"collect {name}"):
+            result = await asyncio.wait_for(collector, deadline)
+    except asyncio.TimeoutError:
+        return None, CollectorStatus(name, "timeout", monotonic() - start)
+    except Exception as e:
+        return None, CollectorStatus(name, "failed", monotonic() - start, e)
+    return result, CollectorStatus(name, "done", monotonic() - start)
+
+
+async def run_command(args):
+    """
+    Run a command (as a list of arguments) as a subprocess without blocking the event
+    loop, and return its output decoded as a string. The command is run in a session
+    (and so a process group) of its own, which is killed if this is cancelled, so that
+    no processes it started are left running (and holding its output pipes open).
+    """
+    with stage(f"run {' '.join(args[:2])}"):
+        proc = await start_command(args)
+        try:
+            out, err = await proc.communicate()
+        except asyncio.CancelledError:
+            await kill_command(proc)
+            raise
+        count("bytes_read", len(out))
+    assert proc.returncode == 0, f"`{' '.join(args)}` failed.\n{err}"
+    return out.decode()
+
+
+async def run_command_parsed(args, parse, executor=None):
+    """
+    Run a command as for `run_command`, but parse its output as it is read rather than
+    once the command has exited: `parse` is called on a thread of the `executor` with
+    an iterator of the output's lines (decoded), which are passed to it as they arrive,
+    and its result is returned. If the command fails, its error is reported rather
+    than that of the parse (of its partial output).
+    """
+    lines = SimpleQueue()
+    with stage(f"run {' '.join(args[:2])}"):
+        proc = await start_command(args)
+        parsed = asyncio.ensure_future(
+            run_in_thread(executor, parse, iter(lines.get, None))
+        )
+        err = asyncio.ensure_future(proc.stderr.read())
+        n_bytes = 0
+        try:
+            async for line in proc.stdout:
+                lines.put(line.decode())
+                n_bytes += len(line)
+            lines.put(None)
+            await proc.wait()
+            await asyncio.wait([parsed])
+        except asyncio.CancelledError:
+            # End the lines, so the parse doesn't wait on them for ever
+            lines.put(None)
+            for task in (parsed, err):
+                if not task.cancel():
+                    task.exception()  # Already done: its error is superseded
+            await kill_command(proc)
+            raise
+        count("bytes_read", n_bytes)
+    # Fetched first, so that a parse error isn't logged as never retrieved if the
+    # command's failure is reported instead
+    parse_error = parsed.exception()
+    assert proc.returncode == 0, f"`{' '.join(args)}` failed.\n{await err}"
+    if parse_error is not None:
+        raise parse_error
+    return parsed.result()
+
+
+async def start_command(args):
+    """
+    Start a command with its output piped, in a session of its own (see `run_command`).
+    """
+    proc = await asyncio.create_subprocess_exec(
+        *args, stdout=PIPE, stderr=PIPE, start_new_session=True
+    )
+    return proc
+
+
+async def kill_command(proc):
+    """
+    Kill a command's process group, so as not to leave it running (e.g. hung) when its
+    collector is cancelled, and wait for it (up to `KILL_TIMEOUT`).
+    """
+    try:
+        os.killpg(proc.pid, SIGKILL)
+    except ProcessLookupError:
+        pass
+    try:
+        # Exiting closes the group's ends of the pipes, which this also waits for, so
+        # only a process which has left the group could hold it up
+        await asyncio.wait_for(proc.wait(), KILL_TIMEOUT)
+    except asyncio.TimeoutError:
+        pass
+    return
+
+
+async def run_in_thread(executor, func, *args, **kwargs):
+    """
+    Call a function on a thread of the `executor` (or the event loop's default
+    executor, if None) without blocking the event loop, and return its result. It is
+    run in a copy of the current context (as `asyncio.to_thread` does), so that its
+    stages are profiled (see `pyxsys.instrument`) within the current stage.
+    """
+    loop = asyncio.get_running_loop()
+    call = partial(copy_context().run, func, *args, **kwargs)
+    result = await loop.run_in_executor(executor, call)
+    return result
+
+
+async def collect_ff_session(
+    session_file=None, lazy=False, projection=None, compact=False, executor=None
+):
+    """
+    Read the Firefox session (see `pyxsys.firefox⠶read_session`) on a thread.
+    """
+    from pyxsys.firefox import read_session as read_ff_session
+
+    ff_session = await run_in_thread(
+        executor,
+        read_ff_session,
+        session_file=session_file,
+        lazy=lazy,
+        projection=projection,
+        compact=compact,
+    )
+    return ff_session
+
+
+async def collect_x_tree(x_protocol=False, clients_only=False, executor=None):
+    """
+    Read the X window tree over the X11 protocol (on a thread) if `x_protocol` is True,
+    else from `xwininfo`, parsing its output on a thread line by line as it is read
+    (as `pyxsys.xwininfo⠶read_xwin_tree` does when streaming). If `clients_only` is
+    True, the client windows are read on that thread first, while `xwininfo` runs.
+    """
+    from pyxsys.xwininfo import XWININFO_TREE_ARGS, process_xwin_lines
+    from pyxsys.x11 import read_x11_tree, read_client_windows
+
+    if x_protocol:
+        assert not clients_only, ValueError("Client-only trees need xwininfo")
+        x_tree = await run_in_thread(executor, read_x11_tree)
+        return x_tree
+    assert which("xwininfo") is not None, "xwininfo not found, please install it"
+
+    def parse_xwin_lines(lines):
+        client_ids = read_client_windows() if clients_only else None
+        return process_xwin_lines(lines, client_ids)
+
+    x_tree = await run_command_parsed(XWININFO_TREE_ARGS, parse_xwin_lines, executor)
+    return x_tree
+
+
+async def collect_wm_territory():
+    """
+    Read the workspaces and windows from `wmctrl -d` and `wmctrl -l` (run at once) into
+    a WorkspaceTerritory (as `pyxsys.wmctrl⠶read_wmctrl_listings` does).
+    """
+    from pyxsys.wm.territory import WorkspaceTerritory
+
+    assert which("wmctrl") is not None, "wmctrl not found, please install it"
+    workspaces_str, windows_str = await asyncio.gather(
+        run_command(["wmctrl", "-d"]), run_command(["wmctrl", "-l"])
+    )
+    territory = WorkspaceTerritory(workspaces_str, windows_str)
+    return territory
+
+
+async def collect_tmux_server():
+    """
+    Read the tmux sessions and windows from `tmux list-sessions` and `tmux
+    list-windows` (run at once) into a TmuxServer (as `pyxsys.tmux⠶read_tmux_server`
+    does).
+    """
+    from pyxsys.tm.server import TmuxServer
+    from pyxsys.tm.session import list_sessions_args, parse_sessions
+    from pyxsys.tm.window import list_windows_args, parse_windows
+
+    assert which("tmux") is not None, "tmux not found, please install it"
+    sessions_str, windows_str = await asyncio.gather(
+        run_command(list_sessions_args()), run_command(list_windows_args())
+    )
+    sessions = parse_sessions(sessions_str, parse_windows(windows_str))
+    tmux_server = TmuxServer(sessions)
+    return tmux_server
+
+
+async def xref_when_ready(x_task, wm_task):
+    """
+    Cross-reference the workspace territory with the X window tree once both of the
+    collector tasks reading them have finished (if both were collected).
+    """
+    (x_tree, _), (wm_territory, _) = await asyncio.gather(x_task, wm_task)
+    if x_tree is not None and wm_territory is not None:
+        wm_territory.xref_x_session(x_tree)
+    return
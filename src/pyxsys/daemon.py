@@ -0,0 +1,524 @@
+"""
+A long-running pyx-sys daemon, which keeps the most recent Firefox session, X window
+tree, workspace territory, and tmux server in memory (refreshed on a schedule, and on
+change where that can be waited for) and answers requests for them over a Unix socket
+(see `pyxsys.client`), so a query doesn't pay for interpreter startup, imports, and a
+full collection each time:
+
+    python -m pyxsys.daemon [--interval SECONDS] [--x11-live] [-s SOCKET]
+"""
+import asyncio
+import json
+import os
+import pickle
+import signal
+import socket
+from datetime import datetime as dt
+from pathlib import Path
+from sys import argv
+from time import monotonic, time
+from pyxsys.client import default_socket_path
+from pyxsys.collect import COLLECTOR_NAMES, CollectorStatus
+from pyxsys.collect import collect_async, run_in_thread
+
+# The longest a thread waiting for a change blocks for, so it notices the daemon stop
+WATCH_TIMEOUT = 1.0
+
+
+class SnapshotDaemon(object):
+    """
+    Serve the results of the collectors (see `pyxsys.collect`) toggled on by
+    `ff_x_wm_tmux_toggle` over a Unix socket at `socket_path` (by default that of
+    `pyxsys.client⠶default_socket_path`, made accessible only to its owner).
+
+    All the collectors are run again every `interval` seconds (and on a "refresh"
+    request), each within its deadline (see `deadlines`). A collector which times out
+    or fails keeps its last result (its status records the failure). Two collectors are
+    refreshed on change instead of only on the schedule:
+
+      - the Firefox session is re-read (on a thread) whenever the session file is
+        rewritten, as waited for by a `pyxsys.ff.watch⠶SessionWatcher`
+        (unless `ff_watch` is False);
+      - if `x_live` is True, the X window tree is kept up to date from X events by a
+        `pyxsys.xw.live⠶LiveWindowTree`, and copied on each refresh rather than read
+        again from `xwininfo`.
+
+    Requests and responses are single lines of JSON (see `handle_request`).
+    """
+
+    def __init__(
+        self,
+        socket_path=None,
+        interval=60.0,
+        ff_x_wm_tmux_toggle=tuple([True] * 4),
+        ff_session_file=None,
+        ff_watch=True,
+        x_live=False,
+        deadlines=None,
+    ):
+        if socket_path is None:
+            socket_path = default_socket_path()
+        self._socket_path = Path(socket_path)
+        self.interval = interval
+        self._toggle = tuple(ff_x_wm_tmux_toggle)
+        self._ff_session_file = ff_session_file
+        self._ff_watch = ff_watch and self._toggle[0]
+        self._x_live = x_live and self._toggle[1]
+        self._deadlines = deadlines
+        self._results = dict.fromkeys(COLLECTOR_NAMES)
+        self._statuses = dict.fromkeys(COLLECTOR_NAMES)
+        self._updated = dict.fromkeys(COLLECTOR_NAMES)  # When each result was collected
+        self._spatial_indexes = {}  # By desktop number, built once per X window tree
+        self._watcher = None
+        self._live_tree = None
+        self._refreshes = 0
+        self._failed_refreshes = 0
+        self._refresh_error = None  # Of the last scheduled refresh, if it failed
+        self._started = None
+        # Created once the event loop is running (see `serve`)
+        self._refresh_lock = None
+        self._stopping = None
+        self._stop_requested = False
+        self._handlers = {
+            "status": self.status,
+            "windows": self.list_windows,
+            "tmux": self.list_tmux_windows,
+            "tabs": self.list_tabs,
+            "window_at": self.window_at,
+            "refresh": self.refresh_now,
+            "snapshot": self.snapshot,
+            "restore": self.restore,
+            "stop": self.stop,
+        }
+        return
+
+    def __repr__(self):
+        return f"SnapshotDaemon on {self.socket_path} (every {self.interval}s)"
+
+    @property
+    def socket_path(self):
+        return self._socket_path
+
+    @property
+    def ff_session(self):
+        return self._results["firefox"]
+
+    @property
+    def x_tree(self):
+        return self._results["x"]
+
+    @property
+    def wm_territory(self):
+        return self._results["wm"]
+
+    @property
+    def tmux_server(self):
+        return self._results["tmux"]
+
+    def run(self):
+        """
+        Serve until stopped (by a "stop" request, SIGINT, or SIGTERM).
+        """
+        asyncio.run(self.serve())
+        return
+
+    async def serve(self):
+        """
+        Listen on the socket, refreshing the results on schedule (and watching for
+        changes) meanwhile, until stopped. The socket is removed on exit.
+        """
+        self._refresh_lock = asyncio.Lock()
+        self._stopping = asyncio.Event()
+        self._started = time()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self._stopping.set)
+        await self.remove_stale_socket()
+        server = await asyncio.start_unix_server(
+            self.handle_client, sock=self.bind_socket()
+        )
+        tasks = [asyncio.create_task(self.refresh_periodically())]
+        if self._ff_watch:
+            tasks.append(asyncio.create_task(self.watch_ff_session()))
+        try:
+            async with server:
+                await self._stopping.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for watching in (self._watcher, self._live_tree):
+                if watching is not None:
+                    watching.close()
+            self.socket_path.unlink(missing_ok=True)
+        return
+
+    async def remove_stale_socket(self):
+        """
+        Remove a socket left behind by a daemon which didn't exit cleanly, unless a
+        daemon is still listening on it.
+        """
+        if not self.socket_path.exists():
+            return
+        try:
+            _, writer = await asyncio.open_unix_connection(str(self.socket_path))
+        except (ConnectionRefusedError, FileNotFoundError):
+            self.socket_path.unlink(missing_ok=True)
+            return
+        writer.close()
+        raise OSError(f"A daemon is already listening on {self.socket_path}")
+
+    def bind_socket(self):
+        """
+        Bind a Unix socket to the socket path, accessible only to its owner from the
+        moment it is created (by holding a umask around the bind, rather than changing
+        its mode afterwards, by when another user could already have connected).
+        """
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177)
+        try:
+            sock.bind(str(self.socket_path))
+        except OSError:
+            sock.close()
+            raise
+        finally:
+            os.umask(old_umask)
+        return sock
+
+    def set_result(self, name, result, status):
+        """
+        Record a collector's status, and its result if it completed (otherwise the
+        last result it completed with is kept).
+        """
+        self._statuses[name] = status
+        if status.done:
+            self._results[name] = result
+            self._updated[name] = time()
+            if name in ("x", "wm"):
+                self._spatial_indexes.clear()
+        return
+
+    async def refresh(self):
+        """
+        Run every collector toggled on (except those refreshed on change) concurrently,
+        then cross-reference the territory with the X window tree.
+        """
+        async with self._refresh_lock:
+            toggle = list(self._toggle)
+            toggle[0] = toggle[0] and not self._ff_watch
+            toggle[1] = toggle[1] and not self._x_live
+            *results, statuses = await collect_async(
+                toggle,
+                ff_session_file=self._ff_session_file,
+                deadlines=self._deadlines,
+            )
+            if self._x_live:
+                results[1], statuses["x"] = await self.copy_live_tree()
+            for name, result in zip(COLLECTOR_NAMES, results):
+                if not (name == "firefox" and self._ff_watch):
+                    self.set_result(name, result, statuses[name])
+            # Unless both were just collected together (and so already cross-referenced)
+            if not (toggle[1] and statuses["x"].done and statuses["wm"].done):
+                if self.x_tree is not None and self.wm_territory is not None:
+                    self.wm_territory.xref_x_session(self.x_tree)
+            self._refreshes += 1
+        return
+
+    async def refresh_periodically(self):
+        """
+        Refresh every `interval` seconds. An error which stops a refresh is recorded
+        (as reported by `status`) rather than ending the schedule.
+        """
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                self._refresh_error = e
+                self._failed_refreshes += 1
+            else:
+                self._refresh_error = None
+            await asyncio.sleep(self.interval)
+
+    async def copy_live_tree(self):
+        """
+        Copy the live X window tree (opening it the first time) once its pending events
+        are applied, on a thread, returning the copy and its `CollectorStatus`.
+        """
+        from pyxsys.xw.live import LiveWindowTree
+
+        start = monotonic()
+        try:
+            if self._live_tree is None:
+                self._live_tree = await run_in_thread(None, LiveWindowTree)
+            x_tree = await run_in_thread(None, self._live_tree.snapshot, compact=False)
+        except Exception as e:
+            return None, CollectorStatus("x", "failed", monotonic() - start, e)
+        return x_tree, CollectorStatus("x", "done", monotonic() - start)
+
+    async def watch_ff_session(self):
+        """
+        Read the Firefox session, then read it again each time the session file is
+        rewritten (waiting for each change on a thread, for up to `WATCH_TIMEOUT`).
+        """
+        from pyxsys.ff.watch import SessionWatcher
+
+        start = monotonic()
+        try:
+            self._watcher = await run_in_thread(
+                None, SessionWatcher, self._ff_session_file
+            )
+        except Exception as e:
+            status = CollectorStatus("firefox", "failed", monotonic() - start, e)
+            self.set_result("firefox", None, status)
+            return
+        status = CollectorStatus("firefox", "done", monotonic() - start)
+        self.set_result("firefox", self._watcher.session, status)
+        while True:
+            start = monotonic()
+            diff = await run_in_thread(None, self._watcher.wait, WATCH_TIMEOUT)
+            if diff is not None:
+                status = CollectorStatus("firefox", "done", monotonic() - start)
+                self.set_result("firefox", self._watcher.session, status)
+
+    async def handle_client(self, reader, writer):
+        """
+        Answer each line of a client's requests with a line of response, until it
+        disconnects.
+        """
+        try:
+            while line := await reader.readline():
+                response = await self.handle_request(line)
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            if self._stop_requested:
+                self._stopping.set()
+        return
+
+    async def handle_request(self, line):
+        """
+        Answer a request, a JSON object with a "command" (one of `DAEMON_COMMANDS` in
+        `pyxsys.client`) and the parameters of that command, with a JSON object whose
+        "ok" is True and whose "result" is that of the command, or whose "ok" is False
+        and whose "error" describes the error that stopped it.
+        """
+        try:
+            request = json.loads(line)
+            assert isinstance(request, dict), ValueError("Expected a JSON object")
+            command = request.pop("command", None)
+            handler = self._handlers.get(command)
+            assert handler is not None, ValueError(f"Unknown command {command!r}")
+            result = await handler(**request)
+        except Exception as e:
+            return {"ok": False, "error": error_str(e)}
+        return {"ok": True, "result": result}
+
+    async def status(self):
+        """
+        The state of each collector (with the age and repr of its result), and the
+        error of the last scheduled refresh if it failed.
+        """
+        now = time()
+        collectors = {}
+        for name in COLLECTOR_NAMES:
+            status, updated = self._statuses[name], self._updated[name]
+            collectors[name] = {
+                "state": "pending" if status is None else status.state,
+                "elapsed": None if status is None else status.elapsed,
+                "error": None if status is None else error_str(status.error),
+                "age": None if updated is None else now - updated,
+                "result": repr(self._results[name]),
+            }
+        status_dict = {
+            "pid": os.getpid(),
+            "uptime": now - self._started,
+            "refreshes": self._refreshes,
+            "failed_refreshes": self._failed_refreshes,
+            "refresh_error": error_str(self._refresh_error),
+            "collectors": collectors,
+        }
+        return status_dict
+
+    async def list_windows(self, desktop=None):
+        """
+        The workspace territory's windows (only those on `desktop`, if given).
+        """
+        assert self.wm_territory is not None, ValueError("No territory collected yet")
+        windows = [
+            {"win_id": w.win_id, "desktop": w.desktop_number, "title": w.title}
+            for w in self.wm_territory.windows
+            if desktop is None or w.desktop_number == desktop
+        ]
+        return windows
+
+    async def list_tmux_windows(self):
+        assert self.tmux_server is not None, ValueError("No tmux server collected yet")
+        windows = [
+            {
+                "session_id": w.session_id,
+                "win_id": w.win_id,
+                "index": w.index,
+                "name": w.name,
+                "n_panes": w.n_panes,
+                "active": w.is_active,
+            }
+            for w in self.tmux_server.windows
+        ]
+        return windows
+
+    async def list_tabs(self):
+        """
+        The URL and title of the current page of each tab of each Firefox window (both
+        None for a tab with no history).
+        """
+        assert self.ff_session is not None, ValueError("No session collected yet")
+        tabs = []
+        for w_i, w in enumerate(self.ff_session.windows):
+            for t_i, t in enumerate(w.tabs):
+                state = t.current_state
+                url, title = (None, None) if state is None else (state.url, state.title)
+                tabs.append({"window": w_i, "tab": t_i, "url": url, "title": title})
+        return tabs
+
+    async def window_at(self, x, y, desktop=None):
+        """
+        The X windows containing the point `(x, y)` (only those on `desktop`, if given),
+        from a spatial index of the X window tree which is kept until it is refreshed.
+        """
+        assert self.x_tree is not None, ValueError("No X window tree collected yet")
+        index = self._spatial_indexes.get(desktop)
+        if index is None:
+            index = self._spatial_indexes.setdefault(
+                desktop, self.x_tree.spatial_index(desktop)
+            )
+        windows = [
+            {"win_id": w.win_id, "name": w.name, "desktop": w.desktop_number}
+            for w in index.at_point(x, y)
+        ]
+        return windows
+
+    async def refresh_now(self):
+        """
+        Refresh the results now (see `refresh`), and return their status.
+        """
+        await self.refresh()
+        status_dict = await self.status()
+        return status_dict
+
+    async def snapshot(self, path=None):
+        """
+        Pickle the current results as `[ff_session, x_session, wm_territory,
+        tmux_server]` (as `pyxsys.record.pickling⠶pickle_vars` does) to `path` (by
+        default a timestamped path in `~/.pyx_store/`), and return the path.
+        """
+        from pyxsys.record.pickling import storage_timestamp
+
+        if path is None:
+            path = storage_timestamp(dt.now())
+        storables = [self._results[name] for name in COLLECTOR_NAMES]
+        # Held so that the X window tree isn't cross-referenced while it's pickled
+        async with self._refresh_lock:
+            await run_in_thread(None, dump_pickle, storables, path)
+        return str(path)
+
+    async def restore(self, path, dry_run=False):
+        """
+        Move the windows to the workspaces recorded in a pickled snapshot (see
+        `pyxsys.recover.remap⠶recover_territory_placement`, against the windows as
+        they are now rather than as last collected), then refresh the results. Return
+        the moves, and whether each was confirmed (None if it was a dry run).
+        """
+        from pyxsys.recover.remap import recover_territory_placement
+
+        storables = await run_in_thread(None, load_pickle, path)
+        recorded = storables[COLLECTOR_NAMES.index("wm")]
+        assert recorded is not None, ValueError(f"No territory was recorded in {path}")
+        plan = await run_in_thread(
+            None, recover_territory_placement, recorded, None, dry_run
+        )
+        if not dry_run:
+            await self.refresh()
+        moves = [
+            {"win_id": r.remap_win_id, "desktop": r.target_desktop, "ok": r.confirmed}
+            for r in plan.moves
+        ]
+        restored = {
+            "moves": moves,
+            "missing": [w.win_id for w in plan.missing_windows],
+            "unrecorded": [w.win_id for w in plan.unrecorded_windows],
+        }
+        return restored
+
+    async def stop(self):
+        """
+        Stop the daemon (once the response has been sent).
+        """
+        self._stop_requested = True
+        return None
+
+
+def error_str(error):
+    if error is None:
+        return None
+    return f"{type(error).__name__}: {error}"
+
+
+def dump_pickle(storables, path):
+    with open(path, "wb") as f:
+        pickle.dump(storables, file=f, protocol=-1)
+    return
+
+
+def load_pickle(path):
+    with open(path, "rb") as f:
+        storables = pickle.load(f)
+    return storables
+
+
+def main(args=None):
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Serve pyx-sys snapshots over a Unix socket.")
+    parser.add_argument("-s", "--socket", dest="socket_path")
+    parser.add_argument("-i", "--interval", type=float, default=60.0)
+    parser.add_argument("-j", "--jsonlz4", dest="ff_session_file")
+    parser.add_argument(
+        "--no-watch",
+        dest="ff_watch",
+        action="store_false",
+        help="read the Firefox session on schedule rather than when it is rewritten",
+    )
+    parser.add_argument(
+        "--x11-live",
+        dest="x_live",
+        action="store_true",
+        help="keep the X window tree up to date from X events rather than xwininfo",
+    )
+    target_group = parser.add_argument_group()
+    target_group.add_argument("-f", "--firefox-only", action="store_true")
+    target_group.add_argument("-x", "--x-win-only", action="store_true")
+    target_group.add_argument("-w", "--wmctrl-only", action="store_true")
+    target_group.add_argument("-t", "--tmux-only", action="store_true")
+    target_dests = [x.dest for x in target_group._group_actions]
+    arg_l = parser.parse_args(args)
+    toggled = tuple([arg_l.__dict__[x] for x in target_dests])
+    if not any(toggled):
+        toggled = tuple([True] * 4)
+    daemon = SnapshotDaemon(
+        socket_path=arg_l.socket_path,
+        interval=arg_l.interval,
+        ff_x_wm_tmux_toggle=toggled,
+        ff_session_file=arg_l.ff_session_file,
+        ff_watch=arg_l.ff_watch,
+        x_live=arg_l.x_live,
+    )
+    print(f"Serving on {daemon.socket_path}")
+    daemon.run()
+    return
+
+
+if __name__ == "__main__":
+    main(argv[1:])
@@ -0,0 +1,131 @@
+from collections import Counter
+
+
+class SessionDiff(object):
+    """
+    The tab-level changes between two BrowserSession objects: the windows added and
+    removed, the tabs opened and closed in each window (identified by the URL of their
+    current history entry), and the URLs added to or dropped from all tab histories.
+
+    Windows are matched between the sessions by the number of (current) tab URLs they
+    share, so closing a window doesn't show up as changes to every window after it.
+    Any windows left unmatched are paired up in order, and the rest are added/removed.
+    Added windows are given by their index in the new session, removed windows by their
+    index in the old session (and likewise for the window indices of tabs).
+    """
+
+    def __init__(self, old_session, new_session):
+        old_tabs = [Counter(map(current_url, w.tabs)) for w in old_session.windows]
+        new_tabs = [Counter(map(current_url, w.tabs)) for w in new_session.windows]
+        matches = match_windows(old_tabs, new_tabs)
+        matched_old = {i for i, _ in matches}
+        matched_new = {j for _, j in matches}
+        self._windows_added = [j for j in range(len(new_tabs)) if j not in matched_new]
+        self._windows_removed = [
+            i for i in range(len(old_tabs)) if i not in matched_old
+        ]
+        self._tabs_added = []
+        self._tabs_removed = []
+        for i, j in matches:
+            opened = new_tabs[j] - old_tabs[i]
+            closed = old_tabs[i] - new_tabs[j]
+            self._tabs_added.extend((j, url) for url in opened.elements())
+            self._tabs_removed.extend((i, url) for url in closed.elements())
+        for j in self.windows_added:
+            self._tabs_added.extend((j, url) for url in new_tabs[j].elements())
+        for i in self.windows_removed:
+            self._tabs_removed.extend((i, url) for url in old_tabs[i].elements())
+        old_urls = history_urls(old_session)
+        new_urls = history_urls(new_session)
+        self._urls_added = new_urls - old_urls
+        self._urls_removed = old_urls - new_urls
+        return
+
+    def __repr__(self):
+        lines = [f"+ window {j}" for j in self.windows_added]
+        lines.extend(f"- window {i}" for i in self.windows_removed)
+        lines.extend(f"+ tab [{j}] {url}" for j, url in self.tabs_added)
+        lines.extend(f"- tab [{i}] {url}" for i, url in self.tabs_removed)
+        lines.append(f"URLs: +{len(self.urls_added)} -{len(self.urls_removed)}")
+        return "\n".join(lines)
+
+    def __bool__(self):
+        """
+        Whether anything changed (a diff of two equivalent sessions is falsy).
+        """
+        return any(
+            [
+                self.windows_added,
+                self.windows_removed,
+                self.tabs_added,
+                self.tabs_removed,
+                self.urls_added,
+                self.urls_removed,
+            ]
+        )
+
+    @property
+    def windows_added(self):
+        return self._windows_added
+
+    @property
+    def windows_removed(self):
+        return self._windows_removed
+
+    @property
+    def tabs_added(self):
+        return self._tabs_added
+
+    @property
+    def tabs_removed(self):
+        return self._tabs_removed
+
+    @property
+    def urls_added(self):
+        return self._urls_added
+
+    @property
+    def urls_removed(self):
+        return self._urls_removed
+
+
+def current_url(tab):
+    """
+    The URL of the tab's current history entry (None if the tab has no history).
+    """
+    history = tab.history
+    if len(history) == 0:
+        return None
+    return history[min(tab.index, len(history) - 1)].url
+
+
+def history_urls(session):
+    return {state.url for w in session.windows for t in w.tabs for state in t.history}
+
+
+def match_windows(old_tabs, new_tabs):
+    """
+    Match up windows (given as Counters of their tabs' URLs) from two sessions, best
+    overlap first, returning a list of `(old_index, new_index)` pairs.
+    """
+    overlaps = sorted(
+        (
+            (-sum((o & n).values()), i, j)
+            for i, o in enumerate(old_tabs)
+            for j, n in enumerate(new_tabs)
+        )
+    )
+    matches = []
+    used_old, used_new = set(), set()
+    for neg_overlap, i, j in overlaps:
+        if neg_overlap == 0:
+            break
+        if i not in used_old and j not in used_new:
+            matches.append((i, j))
+            used_old.add(i)
+            used_new.add(j)
+    # Windows with no tabs in common (e.g. whose only tab navigated) pair up in order
+    unused_old = [i for i in range(len(old_tabs)) if i not in used_old]
+    unused_new = [j for j in range(len(new_tabs)) if j not in used_new]
+    matches.extend(zip(unused_old, unused_new))
+    return sorted(matches)
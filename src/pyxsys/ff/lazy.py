@@ -0,0 +1,107 @@
+from abc import ABCMeta, abstractmethod
+from sys import maxsize
+
+
+class LazyJsonList(list, metaclass=ABCMeta):
+    """
+    A list built from a list of JSON entries (dicts), where each entry is turned into
+    an object by the `build_item` method. If `lazy` is True, the JSON entries are kept
+    as they are and each is only built upon first access (by index or by iteration),
+    after which the built object replaces the JSON entry (i.e. it is cached).
+
+    Searching and comparing the list (`in`, `index`, `count`, `remove`, `pop`, `==`)
+    works on the built items, so builds the items it reaches. Pickling a lazy list
+    builds all of its items (as pickle iterates over it), and it stays lazy.
+    """
+
+    def __new__(cls, *args, **kwargs):
+        # `list.__new__` doesn't check for abstract methods as `object.__new__` does
+        abstract = ", ".join(sorted(cls.__abstractmethods__))
+        assert not abstract, TypeError(f"Can't instantiate {cls.__name__} ({abstract})")
+        return super().__new__(cls, *args, **kwargs)
+
+    def __init__(self, json_list, lazy=False):
+        self._lazy = lazy
+        if lazy:
+            self.extend(json_list)
+        else:
+            self.extend([self.build_item(j) for j in json_list])
+        return
+
+    @abstractmethod
+    def build_item(self, json):
+        """
+        Build the object for a JSON entry of the list.
+        """
+
+    @property
+    def lazy(self):
+        return self._lazy
+
+    @property
+    def n_built(self):
+        """
+        The number of items which have been built (i.e. no longer a JSON entry).
+        """
+        return sum(type(x) is not dict for x in list.__iter__(self))
+
+    def _built_item(self, i):
+        item = list.__getitem__(self, i)
+        if type(item) is dict:
+            item = self.build_item(item)
+            list.__setitem__(self, i, item)
+        return item
+
+    def __getitem__(self, i):
+        if not self._lazy:
+            return list.__getitem__(self, i)
+        if isinstance(i, slice):
+            return [self._built_item(j) for j in range(len(self))[i]]
+        return self._built_item(i)
+
+    def __iter__(self):
+        if not self._lazy:
+            return list.__iter__(self)
+        return (self._built_item(i) for i in range(len(self)))
+
+    def __reversed__(self):
+        if not self._lazy:
+            return list.__reversed__(self)
+        return (self._built_item(i) for i in reversed(range(len(self))))
+
+    def __contains__(self, x):
+        if not self._lazy:
+            return list.__contains__(self, x)
+        return any(item is x or item == x for item in self)
+
+    def index(self, x, start=0, stop=maxsize):
+        if not self._lazy:
+            return list.index(self, x, start, stop)
+        for i in range(len(self))[start:stop]:
+            item = self._built_item(i)
+            if item is x or item == x:
+                return i
+        raise ValueError(f"{x!r} is not in list")
+
+    def count(self, x):
+        if not self._lazy:
+            return list.count(self, x)
+        return sum(1 for item in self if item is x or item == x)
+
+    def remove(self, x):
+        del self[self.index(x)]
+        return
+
+    def pop(self, i=-1):
+        item = self[i]
+        list.pop(self, i)
+        return item
+
+    def __eq__(self, other):
+        if not isinstance(other, list):
+            return NotImplemented
+        return list(iter(self)) == list(iter(other))
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
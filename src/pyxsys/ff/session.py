@@ -1,12 +1,50 @@
 from datetime import datetime as dt
 from pyxsys.ff.window import Window
+from pyxsys.strings import StringTable
+from pyxsys.ff.lazy import LazyJsonList
+from pyxsys.instrument import profiled, count
 
+# The JSON keys read by BrowserSession, Window, Tab and TabState (keep these in sync)
+SESSION_KEY_PATHS = [
+    "selectedWindow",
+    "session.startTime",
+    "session.lastUpdate",
+    "windows.*.selected",
+    "windows.*.sizemode",
+    "windows.*.zIndex",
+    "windows.*.width",
+    "windows.*.height",
+    "windows.*.screenX",
+    "windows.*.screenY",
+    "windows.*.tabs.*.lastAccessed",
+    "windows.*.tabs.*.image",
+    "windows.*.tabs.*.index",
+    "windows.*.tabs.*.entries.*.url",
+    "windows.*.tabs.*.entries.*.title",
+]
 
 class BrowserSession(object):
-    def __init__(self, ss_json):
-        self._windows = WindowSet(ss_json["windows"])
+    """
+    A class representing a Firefox session recovery JSON file. If `lazy` is True, the
+    windows (and in turn their tabs and tab histories) are only instantiated from the
+    JSON when they are first accessed (see `pyxsys.ff.lazy⠶LazyJsonList`).
+
+    If `compact` is True, the tabs of each window are stored as columns of indices
+    into a session-wide StringTable (see `pyxsys.ff.tab⠶CompactTabSet`).
+    """
+
+    @profiled("build BrowserSession")
+    def __init__(self, ss_json, lazy=False, compact=False):
+        self._strings = StringTable() if compact else None
+        self._windows = WindowSet(ss_json["windows"], lazy=lazy, strings=self._strings)
         self._start_time = dt.fromtimestamp(ss_json["session"]["startTime"] / 1000)
         self._selected_window = ss_json["selectedWindow"] - 1
+        # When the session was last written (absent from some older session files)
+        last_update = ss_json["session"].get("lastUpdate")
+        if last_update is not None:
+            last_update = dt.fromtimestamp(last_update / 1000)
+        self._last_update = last_update
+        count("windows", len(self._windows))
         return
 
     def __repr__(self):
@@ -21,17 +59,59 @@ class BrowserSession(object):
     def start_time(self):
         return self._start_time
 
+    @property
+    def selected_window(self):
+        return self._selected_window
+
+    @property
+    def last_update(self):
+        return self._last_update
+
+    @property
+    def strings(self):
+        return self._strings
 
-class WindowSet(list):
+    def to_json(self, windows=None):
+        """
+        Return the session as a session restore JSON dict which Firefox can read back
+        in. If `windows` (a list of indices into `self.windows`) is given, only those
+        windows are included (e.g. the windows on one workspace), in the given order.
+        """
+        if windows is None:
+            windows = range(len(self.windows))
+        windows = list(windows)
+        if self.selected_window in windows:
+            selected = windows.index(self.selected_window) + 1
+        else:
+            selected = 1 if windows else 0
+        start_ms = int(self.start_time.timestamp() * 1000)
+        update = self.last_update
+        update_ms = start_ms if update is None else int(update.timestamp() * 1000)
+        json = {
+            "version": ["sessionrestore", 1],
+            "windows": [self.windows[i].to_json() for i in windows],
+            "selectedWindow": selected,
+            "_closedWindows": [],
+            "session": {"lastUpdate": update_ms, "startTime": start_ms},
+        }
+        return json
+
+
+class WindowSet(LazyJsonList):
     """
     A class which reads the 'windows' of a Firefox recovery JSON file, and
-    instantiates a set of Window classes for each of the listed entries.
+    instantiates a set of Window classes for each of the listed entries
+    (on first access if `lazy` is True).
     """
 
-    def __init__(self, json_list):
-        self.extend([Window(j) for j in json_list])
+    def __init__(self, json_list, lazy=False, strings=None):
+        self._strings = strings
+        super(WindowSet, self).__init__(json_list, lazy=lazy)
         return
 
+    def build_item(self, json):
+        return Window(json, lazy=self.lazy, strings=self._strings)
+
     def __repr__(self):
         n_win = len(self)
         window_reprs = "\n\n".join([str(w) for w in self])
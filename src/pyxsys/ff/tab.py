@@ -1,29 +1,34 @@
+from array import array
+from collections.abc import Sequence
 from datetime import datetime as dt
+from pyxsys.ff.lazy import LazyJsonList
+from pyxsys.strings import StringTable
 
 
-class TabSet(list):
+class TabSet(LazyJsonList):
     """
     A class representing a list of tabs inside a window.
     """
 
-    def __init__(self, json_list):
-        self.extend([Tab(j) for j in json_list])
-        return
+    def build_item(self, json):
+        return Tab(json, lazy=self.lazy)
 
     def __repr__(self):
         return "\n".join([f"{i} ⠶ {x}" for i, x in enumerate(self)])
 
 
 class Tab(object):
-    def __init__(self, json):
-        self._history = TabHistoryChain(json["entries"])
+    def __init__(self, json, lazy=False):
+        self._history = TabHistoryChain(json["entries"], lazy=lazy)
         self._last_accessed = dt.fromtimestamp(json["lastAccessed"] / 1000)
-        # TODO: FIX - Commented out as it was giving an error when reading in the file
-        # self._index = json["index"] - 1
+        # The (1-based) index of the current entry is absent for tabs with no history
+        self._index = json.get("index", len(json["entries"])) - 1
         self._icon = json["image"]
         return
 
     def __repr__(self):
+        if self.current_state is None:
+            return "Tab with no history"
         return f"{self.current_state} ({self.index + 1}/{len(self.history)})"
 
     @property
@@ -40,21 +45,34 @@ class Tab(object):
 
     @property
     def current_state(self):
+        """
+        The history entry the tab is on, or None if the tab has no history entries.
+        """
+        if len(self.history) == 0:
+            return None
         return self.history[self.index]
 
     @property
     def icon(self):
         return self._icon
 
+    def to_json(self):
+        json = {
+            "entries": [state.to_json() for state in self.history],
+            "lastAccessed": int(self.last_accessed.timestamp() * 1000),
+            "index": self.index + 1,
+            "image": self.icon,
+        }
+        return json
 
-class TabHistoryChain(list):
+
+class TabHistoryChain(LazyJsonList):
     """
     Stores the history of a given tab as a list of TabState objects (chronological).
     """
 
-    def __init__(self, json_list):
-        self.extend([TabState(j) for j in json_list])
-        return
+    def build_item(self, json):
+        return TabState(json)
 
 
 class TabState(object):
@@ -79,3 +97,150 @@ class TabState(object):
     @property
     def title(self):
         return self._title
+
+    def to_json(self):
+        # Entries need a triggering principal to load: this is the serialised system
+        # principal (as for URLs loaded from the browser UI) which Firefox writes
+        json = {
+            "url": self.url,
+            "title": self.title,
+            "triggeringPrincipal_base64": '{"3":{}}',
+        }
+        return json
+
+
+class CompactTabSet(Sequence):
+    """
+    A compact alternative to TabSet, storing its tabs' attributes as columns (arrays)
+    rather than as Tab objects: the last accessed times, the icons (as indices into
+    a StringTable), and the history entries of all tabs end to end (as indices of
+    their URLs and titles), with each tab's range given by `entry_offsets`.
+    Indexing returns a TabView onto these arrays (which has the API of a Tab).
+    """
+
+    def __init__(self, json_list, strings):
+        self._strings = strings
+        self._last_accessed = array("d", [j["lastAccessed"] for j in json_list])
+        self._icons = array("L", [strings.intern(j["image"]) for j in json_list])
+        self._indices = array(
+            "l", [j.get("index", len(j["entries"])) - 1 for j in json_list]
+        )
+        self._entry_offsets = array("L", [0])
+        self._urls = array("L")
+        self._titles = array("L")
+        for j in json_list:
+            self._urls.extend([strings.intern(e["url"]) for e in j["entries"]])
+            self._titles.extend([strings.intern(e["title"]) for e in j["entries"]])
+            self._entry_offsets.append(len(self._urls))
+        return
+
+    def __repr__(self):
+        return "\n".join([f"{i} ⠶ {x}" for i, x in enumerate(self)])
+
+    def __len__(self):
+        return len(self._last_accessed)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(len(self))[i]]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("tab index out of range")
+        return TabView(self, i)
+
+    @property
+    def strings(self):
+        return self._strings
+
+    @property
+    def n_entries(self):
+        return len(self._urls)
+
+
+class TabView(Tab):
+    """
+    A Tab whose attributes are read from the columns of a CompactTabSet (at the tab
+    index `tab_i`), rather than stored on it.
+    """
+
+    def __init__(self, tabset, tab_i):
+        self._tabset = tabset
+        self._tab_i = tab_i
+        return
+
+    @property
+    def history(self):
+        ts = self._tabset
+        start, stop = ts._entry_offsets[self._tab_i : self._tab_i + 2]
+        return CompactTabHistoryChain(ts.strings, ts._urls, ts._titles, start, stop)
+
+    @property
+    def last_accessed(self):
+        return dt.fromtimestamp(self._tabset._last_accessed[self._tab_i] / 1000)
+
+    @property
+    def index(self):
+        return self._tabset._indices[self._tab_i]
+
+    @property
+    def icon(self):
+        return self._tabset.strings[self._tabset._icons[self._tab_i]]
+
+
+class CompactTabHistoryChain(Sequence):
+    """
+    A compact alternative to TabHistoryChain: the range `start` to `stop` of a pair
+    of arrays of indices into a StringTable (of URLs and of titles), in place of a list
+    of TabState objects. Indexing returns a TabStateView onto these arrays.
+    """
+
+    def __init__(self, strings, urls, titles, start=0, stop=None):
+        self._strings = strings
+        self._urls = urls
+        self._titles = titles
+        self._start = start
+        self._stop = len(urls) if stop is None else stop
+        return
+
+    @classmethod
+    def from_json(cls, json_list, strings):
+        urls = array("L", [strings.intern(j["url"]) for j in json_list])
+        titles = array("L", [strings.intern(j["title"]) for j in json_list])
+        return cls(strings, urls, titles)
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def __len__(self):
+        return self._stop - self._start
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(len(self))[i]]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("history index out of range")
+        i += self._start
+        return TabStateView(self._strings, self._urls[i], self._titles[i])
+
+
+class TabStateView(TabState):
+    """
+    A TabState whose URL and title are read from a StringTable (by their indices).
+    """
+
+    def __init__(self, strings, url_i, title_i):
+        self._strings = strings
+        self._url_i = url_i
+        self._title_i = title_i
+        return
+
+    @property
+    def url(self):
+        return self._strings[self._url_i]
+
+    @property
+    def title(self):
+        return self._strings[self._title_i]
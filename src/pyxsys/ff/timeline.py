@@ -0,0 +1,157 @@
+from pathlib import Path
+
+
+class SessionTimeline(object):
+    """
+    A time-ordered record built from several BrowserSession objects (e.g. from each of
+    the files in a sessionstore-backups directory), given as `(path, session)` pairs.
+
+    The sessions are kept as a list of TimelineSnapshot (ordered by when each session
+    was last written, with any duplicates of the same write dropped), from which every
+    distinct tab (identified by the URLs of its history) is recorded once as a
+    TimelineTab, with the times of the first and last snapshots it was seen in.
+
+    Any session files which could not be read can be given as `failed`, a dict of the
+    exception raised for each path, and are kept (but not in the timeline) likewise.
+    """
+
+    def __init__(self, sources, failed=None):
+        self._failed = {} if failed is None else dict(failed)
+        snapshots = [TimelineSnapshot(path, session) for path, session in sources]
+        snapshots.sort(key=lambda snap: snap.time)
+        self._snapshots = []
+        for snap in snapshots:
+            if self._snapshots and self._snapshots[-1].time == snap.time:
+                # e.g. recovery.baklz4 when it is a copy of the last recovery.jsonlz4
+                continue
+            self._snapshots.append(snap)
+        tabs = {}  # Insertion order is the order in which the tabs were first seen
+        for snap in self.snapshots:
+            for w_i, window in enumerate(snap.session.windows):
+                for tab in window.tabs:
+                    urls = tuple(state.url for state in tab.history)
+                    if urls not in tabs:
+                        tabs[urls] = TimelineTab(urls, snap)
+                    tabs[urls].add_sighting(tab, w_i, snap)
+        self._tabs = list(tabs.values())
+        return
+
+    def __repr__(self):
+        n_snap = len(self.snapshots)
+        if n_snap == 0:
+            repr_str = "SessionTimeline of 0 snapshots"
+        else:
+            t0, t1 = self.snapshots[0].time, self.snapshots[-1].time
+            n_tabs = len(self.tabs)
+            repr_str = f"SessionTimeline of {n_snap} snapshots ({t0} to {t1})"
+            repr_str += f", {n_tabs} tabs"
+        if self.failed:
+            repr_str += f" ({len(self.failed)} files unreadable)"
+        return repr_str
+
+    @property
+    def snapshots(self):
+        return self._snapshots
+
+    @property
+    def tabs(self):
+        return self._tabs
+
+    @property
+    def failed(self):
+        return self._failed
+
+    def tabs_at(self, time):
+        """
+        The tabs which were open at `time`, as far as the snapshots show (i.e. seen in
+        a snapshot at or before it, and again in one at or after it).
+        """
+        return [t for t in self.tabs if t.first_seen <= time <= t.last_seen]
+
+
+class TimelineSnapshot(object):
+    """
+    A BrowserSession in a SessionTimeline, with the name of the file it was read from
+    and the time it was written (its last update time, or else its start time).
+    """
+
+    def __init__(self, path, session):
+        self._source = Path(path).name
+        self._session = session
+        last_update = getattr(session, "last_update", None)
+        self._time = session.start_time if last_update is None else last_update
+        return
+
+    def __repr__(self):
+        return f"{self.time} ⠶ {self.source} ({len(self.session.windows)} windows)"
+
+    @property
+    def source(self):
+        return self._source
+
+    @property
+    def session(self):
+        return self._session
+
+    @property
+    def time(self):
+        return self._time
+
+
+class TimelineTab(object):
+    """
+    A distinct tab in a SessionTimeline: its history URLs (the tuple identifying it)
+    and latest titles, the window it was last in, the files it was found in, and the
+    times of the first and last snapshots in which it was seen.
+    """
+
+    def __init__(self, urls, first_snapshot):
+        self._urls = urls
+        self._titles = ()
+        self._first_seen = first_snapshot.time
+        self._last_seen = first_snapshot.time
+        self._last_accessed = None
+        self._window_index = None
+        self._sources = set()
+        return
+
+    def __repr__(self):
+        current = self.urls[-1] if self.urls else None
+        return f"{current} ({self.first_seen} to {self.last_seen})"
+
+    def add_sighting(self, tab, window_index, snapshot):
+        self._titles = tuple(state.title for state in tab.history)
+        self._last_seen = snapshot.time
+        if self._last_accessed is None or tab.last_accessed > self._last_accessed:
+            self._last_accessed = tab.last_accessed
+        self._window_index = window_index
+        self._sources.add(snapshot.source)
+        return
+
+    @property
+    def urls(self):
+        return self._urls
+
+    @property
+    def titles(self):
+        return self._titles
+
+    @property
+    def first_seen(self):
+        return self._first_seen
+
+    @property
+    def last_seen(self):
+        return self._last_seen
+
+    @property
+    def last_accessed(self):
+        return self._last_accessed
+
+    @property
+    def window_index(self):
+        return self._window_index
+
+    @property
+    def sources(self):
+        return self._sources
@@ -0,0 +1,144 @@
+from pathlib import Path
+from time import monotonic, sleep
+from pyxsys.firefox import find_recovery_json, read_session
+from pyxsys.inotify import Inotify, IN_Q_OVERFLOW
+from pyxsys.ff.diff import SessionDiff
+
+
+class SessionWatcher(object):
+    """
+    Keep the latest BrowserSession read from a Firefox session file (by default the
+    recovery.jsonlz4 found by `find_recovery_json`, which is only located once), and
+    only decode it again when the file has actually changed.
+
+    Changes are waited for with inotify on the sessionstore-backups directory (Firefox
+    writes a temporary file and renames it over recovery.jsonlz4), so waiting costs no
+    CPU. If inotify is unavailable (or `use_inotify` is False), the file is polled
+    every `poll_interval` seconds instead. In both cases a re-decode only happens if
+    the file's inode, size, or modification time differs from when it was last read.
+
+    The `lazy`, `projection`, and `compact` parameters are passed to `read_session`.
+    """
+
+    def __init__(
+        self,
+        session_file=None,
+        lazy=False,
+        projection=None,
+        compact=False,
+        poll_interval=1.0,
+        use_inotify=True,
+    ):
+        if session_file is None:
+            session_file = find_recovery_json()
+        self._path = Path(session_file)
+        self._read_kwargs = dict(lazy=lazy, projection=projection, compact=compact)
+        self.poll_interval = poll_interval
+        # Start watching before the first read so that no rewrite can be missed
+        if use_inotify and Inotify.available():
+            self._inotify = Inotify(self._path.parent)
+        else:
+            self._inotify = None
+        self._signature = None
+        self._session = None
+        self.refresh()
+        assert self.session is not None, ValueError(f"Could not read {self.path}")
+        return
+
+    def __repr__(self):
+        if self.uses_inotify:
+            mode = "inotify"
+        else:
+            mode = f"polling every {self.poll_interval}s"
+        return f"SessionWatcher on {self.path} ({mode})"
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def session(self):
+        return self._session
+
+    @property
+    def uses_inotify(self):
+        return self._inotify is not None
+
+    def file_signature(self):
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            # Between Firefox moving the old file aside and renaming the new one in
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def refresh(self):
+        """
+        Decode the session file again if it has changed since it was last read, and
+        return the SessionDiff from the previous session (or None if the file has not
+        changed, could not be read, or this is the first read).
+        """
+        signature = self.file_signature()
+        if signature is None or signature == self._signature:
+            return None
+        try:
+            session = read_session(self.path, **self._read_kwargs)
+        except (OSError, ValueError, AssertionError):
+            # Leave the signature as it was so the read is retried on the next change
+            return None
+        self._signature = signature
+        previous, self._session = self._session, session
+        if previous is None:
+            return None
+        return SessionDiff(previous, session)
+
+    def wait(self, timeout=None):
+        """
+        Block until the session file has changed and been decoded again, and return
+        the SessionDiff (which may be empty, i.e. falsy, if only attributes other than
+        the windows, tabs, and URLs changed), or None if `timeout` seconds pass first.
+        """
+        deadline = None if timeout is None else monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(deadline - monotonic(), 0)
+            if self.uses_inotify:
+                events = self._inotify.read_events(remaining)
+                if any(
+                    name == self.path.name or mask & IN_Q_OVERFLOW
+                    for mask, name in events
+                ):
+                    diff = self.refresh()
+                else:
+                    diff = None
+            else:
+                if remaining is None:
+                    sleep(self.poll_interval)
+                else:
+                    sleep(min(self.poll_interval, remaining))
+                diff = self.refresh()
+            if diff is not None:
+                return diff
+            if deadline is not None and monotonic() >= deadline:
+                return None
+
+    def watch(self):
+        """
+        Yield a SessionDiff each time a change to the windows, tabs, or tab history
+        URLs of the session is written to the session file (runs indefinitely).
+        """
+        while True:
+            diff = self.wait()
+            if diff:
+                yield diff
+
+    def close(self):
+        if self._inotify is not None:
+            self._inotify.close()
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return
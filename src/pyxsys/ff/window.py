@@ -1,4 +1,4 @@
-from pyxsys.ff.tab import TabSet
+from pyxsys.ff.tab import TabSet, CompactTabSet
 
 
 class Window(object):
@@ -7,10 +7,16 @@ class Window(object):
     recovery JSON file. It contains a TabSet class and information about selected tab,
     whether the window is maximised, the z-index of the window, and a WindowGeom class
     (which describes the size of the window and its position on the screen).
+
+    If a StringTable is given as `strings`, the tabs are stored as a CompactTabSet,
+    with their URLs, titles, and icons interned in it.
     """
 
-    def __init__(self, json):
-        self._tabs = TabSet(json["tabs"])
+    def __init__(self, json, lazy=False, strings=None):
+        if strings is None:
+            self._tabs = TabSet(json["tabs"], lazy=lazy)
+        else:
+            self._tabs = CompactTabSet(json["tabs"], strings)
         self._selected_tab = json["selected"] - 1
         self._sizemode = json["sizemode"]
         self._z_index = json["zIndex"]
@@ -42,6 +48,20 @@ class Window(object):
     def geom(self):
         return self._geom
 
+    def to_json(self):
+        json = {
+            "tabs": [t.to_json() for t in self.tabs],
+            "selected": self.selected_tab + 1,
+            "_closedTabs": [],
+            "sizemode": self.sizemode,
+            "zIndex": self.z_index,
+            "width": self.geom.width,
+            "height": self.geom.height,
+            "screenX": self.geom.x,
+            "screenY": self.geom.y,
+        }
+        return json
+
 
 class WindowGeom(object):
     """
@@ -1,88 +1,249 @@
 from pathlib import Path
 from configparser import ConfigParser
-from lz4 import read_jsonlz4
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+from pyxsys.lz4 import read_jsonlz4, write_jsonlz4
 from pyxsys.ff.session import BrowserSession
+from pyxsys.ff.timeline import SessionTimeline
 
 
-def find_recovery_json():
+FF_DIR = Path("~/.mozilla/firefox/").expanduser()
+
+# The session files Firefox keeps in sessionstore-backups (the last with a build ID)
+SESSION_BACKUP_GLOBS = [
+    "recovery.jsonlz4",
+    "recovery.baklz4",
+    "previous.jsonlz4",
+    "upgrade.jsonlz4-*",
+]
+
+# The last resolution of installs to profiles, and the ini file signatures it is for
+_resolution_cache = {"signature": None, "installs": None}
+
+
+class FirefoxInstall(object):
     """
-    Return path to the JSONLZ4 backup of the Firefox profile associated with the
-    installation version of Firefox (this will error out if there are multiple
-    installations on the system). The returned path has been confirmed to exist.
+    An installation of Firefox (identified by the hash of its install directory, the
+    section names of `installs.ini`) and the profile it uses by default. The path to
+    its recovery JSONLZ4 is None if the profile has no session backups (yet), which is
+    checked each time it is accessed (so it appears once Firefox first writes it).
     """
-    # For more information on this see wiki ⠶ "Firefox profiles"
 
-    profiles_ini = Path("~/.mozilla/firefox/profiles.ini").expanduser()
-    installs_ini = Path("~/.mozilla/firefox/installs.ini").expanduser()
+    def __init__(self, install_hash, profile_dir):
+        self._install_hash = install_hash
+        self._profile_dir = profile_dir
+        return
+
+    def __repr__(self):
+        return f"Firefox install {self.install_hash} ⠶ {self.profile_dir}"
+
+    @property
+    def install_hash(self):
+        return self._install_hash
+
+    @property
+    def profile_dir(self):
+        return self._profile_dir
+
+    @property
+    def recovery_json(self):
+        ff_jsonlz4 = self.profile_dir / "sessionstore-backups" / "recovery.jsonlz4"
+        return ff_jsonlz4 if ff_jsonlz4.exists() else None
+
+
+def ini_signature(ini_path):
+    """
+    The inode number and modification time of an ini file (None if it doesn't exist),
+    which changes whenever Firefox rewrites it.
+    """
+    try:
+        st = ini_path.stat()
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns)
+
+
+def find_installs(ff_dir=FF_DIR):
+    """
+    Return a list of every Firefox installation (`FirefoxInstall`) with its default
+    profile directory. The result is cached until either of the `installs.ini` or
+    `profiles.ini` files change (by inode number or modification time), so repeat
+    calls only stat these two files (and the recovery JSONLZ4 when it is accessed).
+    """
+    # For more information on this see wiki ⠶ "Firefox profiles"
+    profiles_ini = ff_dir / "profiles.ini"
+    installs_ini = ff_dir / "installs.ini"
+    signature = (ff_dir, ini_signature(installs_ini), ini_signature(profiles_ini))
+    if _resolution_cache["signature"] == signature:
+        return list(_resolution_cache["installs"])
 
     assert installs_ini.exists(), "No Firefox installation file found"
 
     i_config = ConfigParser()
     i_config.read(installs_ini)
-
-    if len(i_config._sections) > 1:
-        # Perhaps there should be control flow related to the 'Locked' key value
-        raise ValueError(
-            f"{len(i_config._sections)} installations found, "
-            + f"expected 1 (sorry, make a PR/raise an issue with your installs.ini file"
-        )
-    elif len(i_config._sections) < 1:
+    if len(i_config.sections()) < 1:
         raise ValueError(f"No Firefox installations found in {installs_ini}")
 
-    install_hash = list(i_config._sections.keys())[0]
-    install_section = i_config[install_hash]
-    assert "Default" in install_section.keys(), "Nonstandard installation section"
-    install_path = install_section["Default"]
-
     # Match the installation path to profile, which indicates if it is relative/absolute
     p_conf = ConfigParser()
     p_conf.read(profiles_ini)
-
     profiles = [p for p in p_conf if p.startswith("Profile") and "Path" in p_conf[p]]
-    install_profile = [p for p in profiles if install_path == p_conf[p]["Path"]]
-    assert len(install_profile) == 1, f"Error: {len(install_profile)} FF profiles match"
-    install_profile = install_profile[0]
-
-    install_profile_config = p_conf[install_profile]
-    if "IsRelative" in install_profile_config:
-        rel_val = install_profile_config["IsRelative"]
-        assert rel_val in "01", f"Expected 'IsRelative' to be 0 or 1, got {rel_val}"
-        is_rel_path = bool(int(rel_val))
-    else:
-        # Assume that paths are relative unless stated otherwise
-        is_rel_path = True
-
-    # Only implemented for Linux, could add Mac/Windows given example locations
-    rel_ff_dir = Path("~/.mozilla/firefox/").expanduser()
-
-    if is_rel_path:
-        ss_dir = rel_ff_dir / install_path / "sessionstore-backups"
-    else:
-        # Try to guess what this looks like, raise error if this guess doesn't exist
-        ss_dir = install_path / "sessionstore-backups"
-    assert ss_dir.exists(), f"sessionstore-backups not found at {ss_dir}"
-
-    ff_jsonlz4 = ss_dir / "recovery.jsonlz4"
-    assert ff_jsonlz4.exists(), f"Firefox recovery JSONLZ4 file not found in {ss_dir}"
+
+    installs = []
+    for install_hash in i_config.sections():
+        install_section = i_config[install_hash]
+        assert "Default" in install_section.keys(), "Nonstandard installation section"
+        install_path = install_section["Default"]
+        install_profile = [p for p in profiles if install_path == p_conf[p]["Path"]]
+        n_matches = len(install_profile)
+        assert n_matches == 1, f"Error: {n_matches} FF profiles match {install_hash}"
+        install_profile_config = p_conf[install_profile[0]]
+        if "IsRelative" in install_profile_config:
+            rel_val = install_profile_config["IsRelative"]
+            assert rel_val in "01", f"Expected 'IsRelative' to be 0 or 1, got {rel_val}"
+            is_rel_path = bool(int(rel_val))
+        else:
+            # Assume that paths are relative unless stated otherwise
+            is_rel_path = True
+        # Only implemented for Linux, could add Mac/Windows given example locations
+        profile_dir = ff_dir / install_path if is_rel_path else Path(install_path)
+        installs.append(FirefoxInstall(install_hash, profile_dir))
+
+    _resolution_cache.update(signature=signature, installs=installs)
+    return list(installs)
+
+
+def find_recovery_json(install_hash=None):
+    """
+    Return path to the JSONLZ4 backup of the Firefox profile associated with the
+    installation version of Firefox (this will error out if there are multiple
+    installations on the system, unless one is chosen by its `install_hash`: see
+    `find_installs` to list them all). The returned path has been confirmed to exist.
+    """
+    installs = find_installs()
+    if install_hash is not None:
+        installs = [i for i in installs if i.install_hash == install_hash]
+        assert installs, ValueError(f"No Firefox installation {install_hash}")
+    elif len(installs) > 1:
+        raise ValueError(
+            f"{len(installs)} installations found, expected 1 (pass `install_hash` to "
+            + f"choose from {[i.install_hash for i in installs]}, or use find_installs)"
+        )
+    install = installs[0]
+    # Checks the file exists (the only stat made if the resolution was cached)
+    ff_jsonlz4 = install.recovery_json
+    assert ff_jsonlz4 is not None, (
+        f"Firefox recovery JSONLZ4 file not found in {install.profile_dir}"
+    )
     return ff_jsonlz4
 
 
-def read_recovery_json(jsonlz4_path=None):
+def read_recovery_json(jsonlz4_path=None, projection=None):
     """
     Decompress the recovery JSONLZ4 from Firefox's sessionstore-backups directory
-    and return the contents as JSON (parsed into a dict with Python's JSON library).
+    and return the contents as JSON (parsed into a dict with Python's JSON library,
+    or only the parts of it selected by a `pyxsys.jsonscan⠶JsonProjection`).
     """
     if jsonlz4_path is None:
         jsonlz4_path = find_recovery_json()
-    json = read_jsonlz4(jsonlz4_path)
+    json = read_jsonlz4(jsonlz4_path, projection=projection)
     return json
 
 
-def read_session(session_file=None):
+def read_session(session_file=None, lazy=False, projection=None, compact=False):
     """
     Decompress the session storage backup of either the default browser profile,
     or one specified by the session_file parameter (filetype must be JSONLZ4).
+    If `lazy` is True, windows, tabs, and tab history entries are only instantiated
+    upon first access. If a `projection` is given, only the JSON keys on its key
+    paths are read (`SESSION_KEY_PATHS` in `pyxsys.ff.session` are the keys which
+    `BrowserSession` needs), and the number of bytes skipped is recorded on it.
+    If `compact` is True, tabs are stored as columns of interned strings.
     """
-    session_json = read_recovery_json(session_file)
-    session = BrowserSession(session_json)
+    session_json = read_recovery_json(session_file, projection=projection)
+    session = BrowserSession(session_json, lazy=lazy, compact=compact)
     return session
+
+
+def write_session(session, session_file, windows=None, accelerated=True):
+    """
+    Serialise a `BrowserSession` (or only the windows at the indices in `windows`) to
+    a session restore JSONLZ4 file which Firefox can restore from (e.g. written to a
+    profile's `sessionstore-backups/recovery.jsonlz4` while Firefox is closed).
+    """
+    write_jsonlz4(session_file, session.to_json(windows), accelerated=accelerated)
+    return
+
+
+def read_all_sessions(lazy=False, projection=None, compact=False, max_workers=None):
+    """
+    Decompress the session storage backups of every Firefox installation's default
+    profile concurrently (on a thread pool), returning a dict of `BrowserSession`
+    keyed by install hash (installations with no session backup are left out). File
+    reads and the C LZ4 decoder (if installed) release the GIL, so they overlap.
+
+    The other parameters are as for `read_session`. A separate copy of a `projection`
+    is used for each profile (as it records the bytes skipped on itself), so the
+    `projection` itself is left unchanged.
+
+    A profile whose session can't be read (e.g. one truncated or corrupted) is left
+    out, without losing the others: the exception it raised is recorded in a second
+    dict (also keyed by install hash), which is returned after the sessions.
+    """
+    install_paths = [(i.install_hash, i.recovery_json) for i in find_installs()]
+    install_paths = [(h, path) for h, path in install_paths if path is not None]
+
+    def read_install_session(install_path):
+        p = None if projection is None else type(projection)(projection.key_paths)
+        return read_session(install_path, lazy, p, compact)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(read_install_session, p) for _, p in install_paths]
+    sessions, failed = {}, {}
+    for (install_hash, _), future in zip(install_paths, futures):
+        try:
+            sessions[install_hash] = future.result()
+        except Exception as e:
+            failed[install_hash] = e
+    return sessions, failed
+
+
+def find_session_backups(ss_dir=None):
+    """
+    Return the paths of all the session files in a sessionstore-backups directory (by
+    default that of `find_recovery_json`): the recovery file and its backup, the session
+    before the last restart, and the sessions from before each Firefox upgrade.
+    """
+    if ss_dir is None:
+        ss_dir = find_recovery_json().parent
+    ss_dir = Path(ss_dir)
+    backups = [p for g in SESSION_BACKUP_GLOBS for p in sorted(ss_dir.glob(g))]
+    return backups
+
+
+def read_session_timeline(
+    ss_dir=None, projection=None, compact=True, max_workers=None
+):
+    """
+    Decompress and parse every session file in a sessionstore-backups directory (see
+    `find_session_backups`) in parallel on a process pool (as decompression and JSON
+    parsing are CPU-bound, and hold the GIL), and merge them into a SessionTimeline.
+
+    The sessions are sent back from the worker processes pickled, which is quicker for
+    compact sessions (the default here). The `projection` is copied to each worker.
+
+    A file which can't be read (e.g. one truncated or corrupted) is left out of the
+    timeline, and the exception it raised is recorded in the timeline's `failed`.
+    """
+    backups = find_session_backups(ss_dir)
+    read = partial(read_session, projection=projection, compact=compact)
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(read, path) for path in backups]
+    sessions, failed = [], {}
+    for path, future in zip(backups, futures):
+        try:
+            sessions.append((path, future.result()))
+        except Exception as e:
+            failed[path] = e
+    timeline = SessionTimeline(sessions, failed)
+    return timeline
@@ -0,0 +1,104 @@
+import os
+from ctypes import CDLL, get_errno
+from ctypes.util import find_library
+from select import select
+from struct import Struct
+
+# Event flags (from `<sys/inotify.h>`)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o4000
+
+# The fixed part of `struct inotify_event`: wd, mask, cookie, len (then `len` bytes
+# of NUL-padded file name)
+EVENT_HEADER = Struct("iIII")
+
+
+def load_libc():
+    """
+    Return the C library (with the inotify functions) or None if it cannot be loaded
+    or has no inotify support (i.e. on a non-Linux system).
+    """
+    try:
+        libc = CDLL(find_library("c") or "libc.so.6", use_errno=True)
+    except OSError:
+        return None
+    return libc if hasattr(libc, "inotify_init1") else None
+
+
+libc = load_libc()
+
+
+class Inotify(object):
+    """
+    A minimal wrapper around a Linux inotify instance (through ctypes), watching a
+    single directory for files being written (closed after writing) or moved into it,
+    as Firefox does when it writes a new session file and renames it into place.
+
+    Check `Inotify.available()` before use: there is no inotify on non-Linux systems.
+    """
+
+    def __init__(self, dir_path, mask=IN_CLOSE_WRITE | IN_MOVED_TO):
+        assert self.available(), OSError("inotify is not available on this system")
+        self._fd = libc.inotify_init1(IN_CLOEXEC | IN_NONBLOCK)
+        if self._fd < 0:
+            raise OSError(get_errno(), os.strerror(get_errno()))
+        wd = libc.inotify_add_watch(self._fd, os.fsencode(dir_path), mask)
+        if wd < 0:
+            errno = get_errno()
+            os.close(self._fd)
+            raise OSError(errno, os.strerror(errno), str(dir_path))
+        self._dir_path = dir_path
+        return
+
+    def __repr__(self):
+        return f"Inotify watching {self.dir_path}"
+
+    @staticmethod
+    def available():
+        return libc is not None
+
+    @property
+    def dir_path(self):
+        return self._dir_path
+
+    def fileno(self):
+        return self._fd
+
+    def read_events(self, timeout=None):
+        """
+        Wait up to `timeout` seconds (or indefinitely if None) for events, and return
+        them as a list of `(mask, name)` tuples (empty if the timeout expired).
+        """
+        ready, _, _ = select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            buf = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        pos = 0
+        while pos < len(buf):
+            _, mask, _, name_len = EVENT_HEADER.unpack_from(buf, pos)
+            pos += EVENT_HEADER.size
+            name = os.fsdecode(buf[pos : pos + name_len].rstrip(b"\0"))
+            pos += name_len
+            events.append((mask, name))
+        return events
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return
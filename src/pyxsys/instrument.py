@@ -0,0 +1,248 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from time import perf_counter
+
+# The stage being timed in the current context (None when nothing is being profiled),
+# which asyncio tasks inherit from the context they are created in
+_current_stage = ContextVar("pyxsys_current_stage", default=None)
+
+# Whether the active Profiler traces memory allocations (`tracemalloc` is only imported
+# if so, as it is slow to import), and the running peak memory of each enclosing stage
+_tracing_memory = ContextVar("pyxsys_tracing_memory", default=False)
+_open_peaks = ContextVar("pyxsys_open_peaks", default=())
+
+
+class Stage(object):
+    """
+    A named stage of the snapshot pipeline: the total time spent in it over all of its
+    `calls` (a stage run repeatedly in the same enclosing stage, such as parsing each
+    tmux window layout, is recorded once), its counters (such as bytes read or objects
+    built), the peak memory allocated in it (if a `Profiler` is tracing memory), and
+    the stages nested in it.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._elapsed = 0.0
+        self._calls = 0
+        self._counters = {}
+        self._peak_memory = None
+        self._children = {}
+        return
+
+    def __repr__(self):
+        return f"Stage {self.name} ({self.calls} calls, {self.elapsed:.6f}s)"
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def elapsed(self):
+        return self._elapsed
+
+    @property
+    def calls(self):
+        return self._calls
+
+    @property
+    def counters(self):
+        return self._counters
+
+    @property
+    def peak_memory(self):
+        return self._peak_memory
+
+    @property
+    def children(self):
+        return list(self._children.values())
+
+    def child(self, name):
+        """
+        The stage nested in this one with the given name (created on first use).
+        """
+        child = self._children.get(name)
+        if child is None:
+            child = self._children.setdefault(name, Stage(name))
+        return child
+
+    def count(self, key, n=1):
+        self._counters[key] = self._counters.get(key, 0) + n
+        return
+
+    def add_call(self, elapsed, peak_memory=None):
+        self._elapsed += elapsed
+        self._calls += 1
+        if peak_memory is not None:
+            self._peak_memory = max(self._peak_memory or 0, peak_memory)
+        return
+
+    def iter_stages(self, depth=0):
+        """
+        Yield `(depth, stage)` for this stage and every stage nested in it, depth first.
+        """
+        yield depth, self
+        for child in self.children:
+            yield from child.iter_stages(depth + 1)
+
+    def to_dict(self):
+        stage_dict = {
+            "name": self.name,
+            "elapsed": self.elapsed,
+            "calls": self.calls,
+            "counters": dict(self.counters),
+            "peak_memory": self.peak_memory,
+            "children": [child.to_dict() for child in self.children],
+        }
+        return stage_dict
+
+
+class Profiler(object):
+    """
+    Record the stages of the snapshot pipeline (see `stage`) run while the profiler is
+    active (as a context manager), nested within a "total" stage, including stages
+    run in asyncio tasks and (via `pyxsys.collect⠶run_in_thread`) on threads.
+
+    If `trace_memory` is True, allocations are traced with `tracemalloc` and the peak
+    memory allocated in each stage is recorded too (which slows the pipeline down, and
+    is process-wide, so stages which run concurrently are counted in each other's).
+    """
+
+    def __init__(self, trace_memory=False):
+        self._root = Stage("total")
+        self._trace_memory = trace_memory
+        self._started_tracing = False
+        self._token = None
+        return
+
+    def __repr__(self):
+        return f"Profiler of {sum(1 for _ in self.root.iter_stages())} stages"
+
+    @property
+    def root(self):
+        return self._root
+
+    def __enter__(self):
+        if self._trace_memory:
+            import tracemalloc
+
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+        self._tracing_token = _tracing_memory.set(self._trace_memory)
+        self._token = _current_stage.set(self.root)
+        self._stage_context = run_stage(self.root)
+        self._stage_context.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stage_context.__exit__(*exc_info)
+        _current_stage.reset(self._token)
+        _tracing_memory.reset(self._tracing_token)
+        if self._started_tracing:
+            import tracemalloc
+
+            tracemalloc.stop()
+            self._started_tracing = False
+        return
+
+    def table(self):
+        """
+        The stages as a table (one line per stage, indented by nesting) of their calls,
+        total time, peak memory (if traced), and counters.
+        """
+        header = f"{'Stage':<40} {'Calls':>6} {'Time (ms)':>10} {'Peak (KiB)':>11}"
+        lines = [header + "  Counters"]
+        for depth, s in self.root.iter_stages():
+            label = "  " * depth + s.name
+            peak = "" if s.peak_memory is None else f"{s.peak_memory / 1024:.0f}"
+            counters = ", ".join(f"{k}={v}" for k, v in s.counters.items())
+            row = f"{label:<40} {s.calls:>6} {s.elapsed * 1000:>10.1f} {peak:>11}"
+            lines.append(f"{row}  {counters}".rstrip())
+        return "\n".join(lines)
+
+    def to_json(self):
+        from json import dumps
+
+        return dumps(self.root.to_dict(), indent=2)
+
+
+@contextmanager
+def run_stage(stage_obj):
+    """
+    Time a run of the stage (and, if memory is being traced, its peak allocation).
+    """
+    tracing = _tracing_memory.get()
+    if tracing:
+        import tracemalloc
+
+        start_memory, peak_before = tracemalloc.get_traced_memory()
+        enclosing_peaks = _open_peaks.get()
+        for peak_cell in enclosing_peaks:
+            peak_cell[0] = max(peak_cell[0], peak_before)
+        own_peak = [0]
+        peaks_token = _open_peaks.set(enclosing_peaks + (own_peak,))
+        tracemalloc.reset_peak()
+    start = perf_counter()
+    try:
+        yield stage_obj
+    finally:
+        elapsed = perf_counter() - start
+        if tracing:
+            _open_peaks.reset(peaks_token)
+            # Peaks reached in nested stages (before they reset the peak) count too
+            peak = max(tracemalloc.get_traced_memory()[1], own_peak[0])
+            for peak_cell in enclosing_peaks:
+                peak_cell[0] = max(peak_cell[0], peak)
+            stage_obj.add_call(elapsed, peak - start_memory)
+        else:
+            stage_obj.add_call(elapsed)
+
+
+@contextmanager
+def stage(name):
+    """
+    Time the code run in the context as a stage with the given name, nested in the
+    current stage (and the current stage while it runs), or do nothing if no
+    `Profiler` is active. Yields the Stage (or None) for counters to be added to.
+    """
+    parent = _current_stage.get()
+    if parent is None:
+        yield None
+        return
+    stage_obj = parent.child(name)
+    token = _current_stage.set(stage_obj)
+    try:
+        with run_stage(stage_obj):
+            yield stage_obj
+    finally:
+        _current_stage.reset(token)
+
+
+def count(key, n=1):
+    """
+    Add `n` to a counter of the current stage (if a `Profiler` is active).
+    """
+    current = _current_stage.get()
+    if current is not None:
+        current.count(key, n)
+    return
+
+
+def profiled(name):
+    """
+    Decorate a function to be timed as a stage with the given name (see `stage`).
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_stage.get() is None:
+                return func(*args, **kwargs)
+            with stage(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,191 @@
+import re
+from json import JSONDecoder
+
+SKIP = object()  # Marks keys which are not on any key path of a projection
+
+WHITESPACE_RE = re.compile(r"[ \t\n\r]*")
+SCALAR_RE = re.compile(r"[^ \t\n\r,\]}]+")
+# An object member's key (group 1), up to the start of its value
+KEY_RE = re.compile(r'[ \t\n\r]*"([^"\\]*(?:\\.[^"\\]*)*)"[ \t\n\r]*:[ \t\n\r]*')
+DELIMITER_RE = re.compile(r"[ \t\n\r]*([,}\]])[ \t\n\r]*")
+
+raw_decode = JSONDecoder().raw_decode
+
+
+class JsonProjection(object):
+    """
+    A JSON loader which only builds the values at the given key paths, skipping over
+    every other subtree in the input without creating any Python objects for it.
+
+    Key paths are dot-separated, with `*` matching every item of an array (or every
+    key of an object), e.g. `"windows.*.tabs.*.entries.*.url"`. The value at the end
+    of a key path is loaded in full. After each call to `loads`, the number of bytes
+    of input which were skipped is stored as `skipped_bytes`.
+
+    The kept values are decoded by the C JSON decoder (`raw_decode`). Objects are
+    parsed key by key wherever they are (including inside arrays, such as tab history
+    entries), so their unprojected values (such as each entry's
+    `triggeringPrincipal_base64`) are stepped over string by string with `str.find`,
+    and never decoded.
+    """
+
+    def __init__(self, key_paths):
+        self.key_paths = key_paths
+        self.tree = self.compile_key_paths(key_paths)
+        self.skipped_bytes = 0
+        self._is_ascii = True
+        return
+
+    def __repr__(self):
+        return f"JsonProjection of {len(self.key_paths)} key paths"
+
+    @staticmethod
+    def compile_key_paths(key_paths):
+        """
+        Nest the key paths into a dict of dicts (a 'projection tree'), in which a
+        value of `None` means that the value at that key is to be kept in full.
+        """
+        tree = {}
+        for key_path in key_paths:
+            *parent_keys, leaf_key = key_path.split(".")
+            node = tree
+            for k in parent_keys:
+                assert node.get(k, {}) is not None, f"{key_path} is below a leaf path"
+                node = node.setdefault(k, {})
+            node[leaf_key] = None
+        return tree
+
+    def loads(self, buf):
+        """
+        Parse the JSON in `buf` (a str, or bytes-like UTF-8), keeping only the values
+        on the key paths of this projection.
+        """
+        text = buf if isinstance(buf, str) else str(buf, "utf-8")
+        self._is_ascii = text.isascii()
+        self.skipped_bytes = 0
+        pos = WHITESPACE_RE.match(text, 0).end()
+        value, pos = self.parse_value(text, pos, self.tree)
+        pos = WHITESPACE_RE.match(text, pos).end()
+        assert pos == len(text), ValueError(f"Extra data at position {pos}")
+        return value
+
+    def count_skipped(self, text, start, end):
+        if self._is_ascii:
+            self.skipped_bytes += end - start
+        else:
+            self.skipped_bytes += len(text[start:end].encode())
+        return
+
+    def parse_value(self, text, pos, tree):
+        """
+        Parse the value at `pos` according to the projection `tree`, returning the
+        value and the position after it.
+        """
+        if tree is not None:
+            opener = text[pos]
+            if opener == "{":
+                return self.parse_object(text, pos, tree)
+            elif opener == "[" and "*" in tree:
+                return self.parse_array(text, pos, tree["*"])
+        return raw_decode(text, pos)
+
+    def parse_object(self, text, pos, tree):
+        obj = {}
+        delim_match = DELIMITER_RE.match(text, pos + 1)
+        if delim_match is not None and delim_match.group(1) == "}":
+            return obj, delim_match.end()
+        wildcard = tree.get("*", SKIP)
+        while True:
+            key_match = KEY_RE.match(text, pos + 1)
+            assert key_match is not None, ValueError(f"Expected a key at {pos + 1}")
+            key = key_match.group(1)
+            if "\\" in key:
+                key = raw_decode(f'"{key}"')[0]
+            subtree = tree.get(key, wildcard)
+            if subtree is SKIP:
+                end = skip_value(text, key_match.end())
+                self.count_skipped(text, pos + 1, end)
+            elif subtree is None:
+                # A leaf of the projection (e.g. a tab history entry's URL)
+                obj[key], end = raw_decode(text, key_match.end())
+            else:
+                obj[key], end = self.parse_value(text, key_match.end(), subtree)
+            delim_match = DELIMITER_RE.match(text, end)
+            assert delim_match is not None, ValueError(f"Expected ',' or '}}' at {end}")
+            if delim_match.group(1) == "}":
+                return obj, delim_match.end()
+            # Leave `pos` on the comma, as it was on the opening brace to begin with
+            pos = delim_match.start(1)
+
+    def parse_array(self, text, pos, item_tree):
+        arr = []
+        pos = WHITESPACE_RE.match(text, pos + 1).end()
+        if text[pos] == "]":
+            return arr, pos + 1
+        while True:
+            item, pos = self.parse_value(text, pos, item_tree)
+            arr.append(item)
+            delim_match = DELIMITER_RE.match(text, pos)
+            assert delim_match is not None, ValueError(f"Expected ',' or ']' at {pos}")
+            pos = delim_match.end()
+            if delim_match.group(1) == "]":
+                return arr, pos
+
+
+def skip_value(text, pos):
+    """
+    Return the position just after the JSON value beginning at `pos` in `text`,
+    without parsing it.
+    """
+    opener = text[pos]
+    if opener == '"':
+        return skip_string(text, pos)
+    elif opener == "{" or opener == "[":
+        return skip_container(text, pos)
+    scalar_match = SCALAR_RE.match(text, pos)
+    assert scalar_match is not None, ValueError(f"Expected a value at {pos}")
+    return scalar_match.end()
+
+
+def skip_string(text, pos):
+    """
+    Return the position just after the closing quote of the string whose opening
+    quote is at `pos`, jumping from quote to quote.
+    """
+    end = text.find('"', pos + 1)
+    while True:
+        assert end != -1, ValueError(f"Unterminated string at {pos}")
+        # The quote is escaped if it follows an odd number of backslashes
+        n_backslashes = 0
+        while text[end - 1 - n_backslashes] == "\\":
+            n_backslashes += 1
+        if n_backslashes % 2 == 0:
+            return end + 1
+        end = text.find('"', end + 1)
+
+
+def skip_container(text, pos):
+    """
+    Return the position just after the object or array opening at `pos`. The input
+    is split into the segments between strings, in which the brackets are counted
+    (the segment is only stepped through if the container could close within it).
+    """
+    depth = 0
+    while True:
+        quote = text.find('"', pos)
+        seg_end = len(text) if quote == -1 else quote
+        n_closes = text.count("}", pos, seg_end) + text.count("]", pos, seg_end)
+        if n_closes >= depth:
+            for i in range(pos, seg_end):
+                c = text[i]
+                if c == "{" or c == "[":
+                    depth += 1
+                elif c == "}" or c == "]":
+                    depth -= 1
+                    if depth == 0:
+                        return i + 1
+        else:
+            n_opens = text.count("{", pos, seg_end) + text.count("[", pos, seg_end)
+            depth += n_opens - n_closes
+        assert quote != -1, ValueError("Unexpected end of JSON input")
+        pos = skip_string(text, quote)
@@ -1,13 +1,73 @@
+import os
+import stat
 from pathlib import Path
 from subprocess import run
 from shutil import which
-from json import loads
+from json import loads, dumps
+from pyxsys.instrument import stage, count
 
+try:
+    # Optional C-accelerated block codec (the `lz4` package on PyPI)
+    from lz4.block import decompress as c_block_decompress
+    from lz4.block import compress as c_block_compress
+    from lz4.block import LZ4BlockError
+except ImportError:
+    c_block_decompress = None
+    c_block_compress = None
+    LZ4BlockError = None
 
-def read_jsonlz4(jsonlz4_path):
+MOZLZ4_MAGIC = b"mozLz40\0"
+
+# LZ4 block format limits: the last match must start at least 12 bytes before the
+# end of the block, and the last 5 bytes must be literals. Offsets fit in 2 bytes.
+LZ4_MFLIMIT = 12
+LZ4_LASTLITERALS = 5
+LZ4_MAX_OFFSET = 0xFFFF
+
+
+def read_jsonlz4(jsonlz4_path, projection=None):
+    """
+    Decompress the jsonlz4 file in-process (without spawning `dejsonlz4`), read the
+    JSON into a Python dict (using the json library) and return that.
+
+    If a `projection` (`pyxsys.jsonscan⠶JsonProjection`) is given, only the values on
+    its key paths are read into the dict (the rest of the JSON is skipped over).
+    """
+    with stage("read jsonlz4"):
+        data = read_regular_file(jsonlz4_path)
+        count("bytes_read", len(data))
+    with stage("decompress mozlz4"):
+        json_buf = decompress_mozlz4(data)
+        count("bytes_decompressed", len(json_buf))
+    with stage("parse JSON"):
+        if projection is not None:
+            return projection.loads(json_buf)
+        # The JSON parser accepts the decompressed buffer as-is (no copy to `bytes`)
+        json = loads(json_buf)
+    return json
+
+
+def read_regular_file(path):
+    """
+    Read the whole of a file, which must be a regular file. It is opened without
+    blocking and checked before it is read, so that a FIFO (or device) given in place
+    of a session file raises `ValueError` rather than blocking the read indefinitely.
+    """
+    fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+    with open(fd, "rb") as f:
+        if not stat.S_ISREG(os.fstat(fd).st_mode):
+            raise ValueError(f"Not a regular file: {path}")
+        data = f.read()
+    return data
+
+
+def read_jsonlz4_subprocess(jsonlz4_path):
     """
     Decompress the jsonlz4 file (over STDIN) using dejsonlz4 (assumed to be on PATH),
     read the JSON into a Python dict (using the json library) and return that.
+
+    This was the original implementation of `read_jsonlz4`, kept for comparison
+    (see `benchmarks/bench_lz4.py`).
     """
     assert which("dejsonlz4") is not None, "dejsonlz4 not found, please install it"
     result = run(["dejsonlz4", jsonlz4_path], capture_output=True)
@@ -17,3 +77,253 @@ def read_jsonlz4(jsonlz4_path):
     assert result.returncode == 0, f"dejsonlz4 call failed.\n{err}"
     json = loads(json_str)
     return json
+
+
+def decompress_mozlz4(data, accelerated=True):
+    """
+    Decompress the contents of a Mozilla LZ4 file, which consists of an 8 byte magic
+    number (`mozLz40\\0`), the decompressed size as a 4 byte little-endian integer,
+    and then a single LZ4 block. Uses the C decoder from the `lz4` package if it is
+    importable (and `accelerated` is True), otherwise `decompress_block`.
+    """
+    data = memoryview(data)
+    header_size = len(MOZLZ4_MAGIC) + 4
+    if len(data) < header_size:
+        raise ValueError("File too short for a mozLz4 header")
+    magic = bytes(data[: len(MOZLZ4_MAGIC)])
+    if magic != MOZLZ4_MAGIC:
+        raise ValueError(f"Not a mozLz4 file (magic: {magic})")
+    size = int.from_bytes(data[len(MOZLZ4_MAGIC) : header_size], "little")
+    if accelerated and c_block_decompress is not None:
+        try:
+            return c_block_decompress(data[header_size:], uncompressed_size=size)
+        except LZ4BlockError as e:
+            # As a ValueError, like `decompress_block`'s (which can also be pickled)
+            raise ValueError(f"Corrupt mozLz4 block: {e}") from None
+    return decompress_block(data[header_size:], size)
+
+
+def decompress_block(src, size):
+    """
+    Decode a raw LZ4 block (`src`, any bytes-like object) whose decompressed length
+    is known (`size`) into a single preallocated bytearray, which is returned.
+
+    Each sequence in the block is a token byte (high nibble: literal length, low
+    nibble: match length minus 4, with 15 meaning 'read more length bytes'), the
+    literals, then a 2 byte little-endian offset back into the output. The final
+    sequence of a block has literals only.
+
+    Raises `ValueError` if the block is truncated or corrupt (a match offset out of
+    range, or a length other than `size` decoded).
+    """
+    src = memoryview(src)
+    dst = bytearray(size)
+    n_src = len(src)
+    i = 0  # read position in src
+    o = 0  # write position in dst
+    try:
+        while i < n_src:
+            token = src[i]
+            i += 1
+            lit_len = token >> 4
+            if lit_len == 15:
+                extra = 255
+                while extra == 255:
+                    extra = src[i]
+                    i += 1
+                    lit_len += extra
+            if lit_len:
+                if i + lit_len > n_src:
+                    raise ValueError(f"Truncated LZ4 block ({n_src} bytes)")
+                dst[o : o + lit_len] = src[i : i + lit_len]
+                i += lit_len
+                o += lit_len
+            if i >= n_src:
+                # The last sequence ends after its literals (it has no match part)
+                break
+            offset = src[i] | (src[i + 1] << 8)
+            i += 2
+            match_len = (token & 15) + 4
+            if match_len == 19:
+                extra = 255
+                while extra == 255:
+                    extra = src[i]
+                    i += 1
+                    match_len += extra
+            start = o - offset
+            if not 0 < offset <= o:
+                raise ValueError(f"Invalid match offset {offset} at {o}")
+            if offset >= match_len:
+                dst[o : o + match_len] = dst[start : start + match_len]
+            else:
+                # Overlapping match: repeat the last `offset` bytes up to its length
+                n_reps, n_rem = divmod(match_len, offset)
+                repeat = dst[start:o]
+                dst[o : o + match_len] = repeat * n_reps + repeat[:n_rem]
+            o += match_len
+    except IndexError:
+        # A length or offset was cut off by the end of the block
+        raise ValueError(f"Truncated LZ4 block ({n_src} bytes)") from None
+    if o != size:
+        raise ValueError(f"Decompressed {o} bytes, header declared {size}")
+    return dst
+
+
+def write_jsonlz4(jsonlz4_path, json, accelerated=True):
+    """
+    Serialise `json` (compactly, as Firefox does) and write it to a jsonlz4 file. The
+    JSON is encoded piece by piece into a single buffer (see `iter_json_chunks`) which
+    is then compressed by `compress_mozlz4`.
+    """
+    json_buf = bytearray()
+    for chunk in iter_json_chunks(json):
+        json_buf += chunk.encode()
+    Path(jsonlz4_path).write_bytes(compress_mozlz4(json_buf, accelerated=accelerated))
+    return
+
+
+def iter_json_chunks(json, depth=3):
+    """
+    Yield the compact JSON serialisation of `json` in pieces: dicts and lists down to
+    `depth` levels deep are written member by member, and the values below that are
+    each serialised in one go by the (C) JSON encoder. For a Firefox session the
+    default depth yields each window's tabs as a chunk, so the entire session is
+    never held as a single string.
+    """
+    if depth > 0 and type(json) is dict:
+        yield "{"
+        for i, (k, v) in enumerate(json.items()):
+            yield f'{"," if i else ""}{dumps(k, ensure_ascii=False)}:'
+            yield from iter_json_chunks(v, depth - 1)
+        yield "}"
+    elif depth > 0 and type(json) is list:
+        yield "["
+        for i, v in enumerate(json):
+            if i:
+                yield ","
+            yield from iter_json_chunks(v, depth - 1)
+        yield "]"
+    else:
+        yield dumps(json, ensure_ascii=False, separators=(",", ":"))
+    return
+
+
+def compress_mozlz4(data, accelerated=True):
+    """
+    Compress `data` (any bytes-like object) into the contents of a Mozilla LZ4 file
+    (see `decompress_mozlz4` for the format). Uses the C compressor from the `lz4`
+    package if it is importable (and `accelerated` is True), else `compress_block`.
+    """
+    header = MOZLZ4_MAGIC + len(data).to_bytes(4, "little")
+    if accelerated and c_block_compress is not None:
+        return header + c_block_compress(data, store_size=False)
+    return header + compress_block(data)
+
+
+def compress_block(src, max_chain=16):
+    """
+    Encode `src` (any bytes-like object) as a raw LZ4 block (the inverse of
+    `decompress_block`), returned as a bytearray.
+
+    Matches are found with hash chains: `head` maps each 4 byte sequence to the last
+    position it was seen at, and `chain` maps each position to the previous position
+    with the same 4 bytes. Up to `max_chain` earlier positions are tried (newest
+    first) and the longest match wins, though a candidate is only measured if it
+    agrees at the byte just past the best match so far. Where no matches are found,
+    positions are skipped at an increasing rate (as in the reference LZ4 compressor)
+    to get through incompressible data quickly.
+    """
+    src = bytes(src)
+    n = len(src)
+    dst = bytearray()
+    head = {}
+    chain = {}
+    match_limit = n - LZ4_MFLIMIT
+    end_limit = n - LZ4_LASTLITERALS
+    anchor = 0  # start of the pending literals
+    i = 0
+    while i <= match_limit:
+        key = src[i : i + 4]
+        candidate = head.get(key)
+        head[key] = i
+        best_len = 0
+        if candidate is not None:
+            chain[i] = candidate
+            n_tries = max_chain
+            while candidate is not None and i - candidate <= LZ4_MAX_OFFSET:
+                # A candidate can only beat the best match if it agrees at its end
+                if src[candidate + best_len] == src[i + best_len]:
+                    m_len = match_length(src, candidate, i, end_limit)
+                    if m_len > best_len:
+                        best_len, best_pos = m_len, candidate
+                n_tries -= 1
+                if n_tries == 0:
+                    break
+                candidate = chain.get(candidate)
+        if best_len < 4:
+            # Skip ahead faster the longer it has been since the last match
+            i += 1 + ((i - anchor) >> 6)
+            continue
+        emit_sequence(dst, src[anchor:i], i - best_pos, best_len)
+        i += best_len
+        anchor = i
+        # Index a position near the end of the match, where the next one may start
+        if i - 2 <= match_limit:
+            key = src[i - 2 : i + 2]
+            if key in head:
+                chain[i - 2] = head[key]
+            head[key] = i - 2
+    emit_sequence(dst, src[anchor:], 0, 0)
+    return dst
+
+
+def match_length(src, j, i, limit):
+    """
+    Return the length of the common prefix of `src[j:]` and `src[i:]` (where `j < i`)
+    which ends before `limit`, comparing in slices of doubling size and then narrowing
+    down to the first differing byte by bisection (rather than byte by byte).
+    """
+    max_len = limit - i
+    if src[j : j + 4] != src[i : i + 4] or max_len < 4:
+        return 0
+    lo, step = 4, 8
+    while lo + step <= max_len:
+        if src[j + lo : j + lo + step] != src[i + lo : i + lo + step]:
+            break
+        lo += step
+        step = min(step * 2, 4096)
+    hi = min(lo + step, max_len + 1)  # the length at `hi` is known (or assumed) to fail
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if src[j + lo : j + mid] == src[i + lo : i + mid]:
+            lo = mid
+        else:
+            hi = mid
+    return lo
+
+
+def emit_sequence(dst, literals, offset, match_len):
+    """
+    Append an LZ4 sequence to `dst`: the token, literal length, literals, and (unless
+    `match_len` is 0, for the last sequence of the block) the offset and match length.
+    """
+    lit_len = len(literals)
+    m_code = match_len - 4 if match_len else 0
+    dst.append((min(lit_len, 15) << 4) | min(m_code, 15))
+    if lit_len >= 15:
+        dst += write_length(lit_len - 15)
+    dst += literals
+    if match_len:
+        dst += offset.to_bytes(2, "little")
+        if m_code >= 15:
+            dst += write_length(m_code - 15)
+    return
+
+
+def write_length(remainder):
+    """
+    The bytes which extend a length beyond its token nibble: a run of 255s then the
+    final remainder (as read back by the `extra == 255` loops in `decompress_block`).
+    """
+    n_max, last = divmod(remainder, 255)
+    return b"\xff" * n_max + bytes([last])
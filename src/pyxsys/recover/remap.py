@@ -1,23 +1,40 @@
 from pyxsys.wm.territory import WorkspaceTerritory as WsTerritory
 from pyxsys.wm.workspace import Workspace
-from pyxsys.wm.window import WorkspaceWindow as WsWindow
+from pyxsys.wm.window import WindowDesc
+from pyxsys.wmctrl import read_wmctrl_listings, read_wmctrl_windows
+from pyxsys.x11 import X11Connection, set_window_desktops
+from pyxsys.instrument import profiled, count
+from concurrent.futures import ThreadPoolExecutor
 from subprocess import run
 
-def recover_territory_placement(recorded, current=None):
+@profiled("recover territory placement")
+def recover_territory_placement(recorded, current=None, dry_run=False, display=None):
     """
-    Transform the `current` territory (which if not specified will not be examined)
-    into the `recorded` territory, so as to recover a stored representation of
-    window placements across workspaces.
+    Transform the `current` territory (which if not specified will be read from
+    `wmctrl`) into the `recorded` territory, so as to recover a stored representation
+    of window placements across workspaces.
 
     Both territories passed in should be `pyxsys.wm.territory⠶WorkspaceTerritory`.
 
-    This function instantiates a `WorkspaceTerritoryRemap` event from `remap.py`.
+    This function plans the moves needed as a `RemapPlan` and reports it, then (unless
+    `dry_run` is True) executes the moves and verifies them with one re-read of the
+    windows from `wmctrl -l`. Running it again after a partial failure only moves the
+    windows which are still not in place.
 
     #TODO: if not specified, prompt to select a pickle with curses.
     """
-    remapped = WorkspaceTerritoryRemap(recorded, current)
-    remapped.transform_to_remap()
-    return remapped
+    if current is None:
+        current = read_wmctrl_listings()
+    plan = RemapPlan(recorded, current)
+    plan.report()
+    if not dry_run:
+        plan.execute(display=display)
+        failed = plan.verify()
+        n_moved = len(plan.moves) - len(failed)
+        print(f"Verified {n_moved} of {len(plan.moves)} windows on their workspaces")
+        for r in failed:
+            print(f"Not moved: {r.remap_win_id} (to {r.target_desktop})")
+    return plan
 
 def temporary_territory_lookup(territory, d_num):
     """
@@ -36,6 +53,120 @@ def temporary_workspace_lookup(workspace, win_id):
     has_id = any(filter(lambda x: x.win_id == win_id, workspace.windows))
     return has_id
 
+class RemapPlan(object):
+    """
+    The moves needed to transform the `current` workspace territory into the `recorded`
+    one (both `pyxsys.wm.territory⠶WorkspaceTerritory`), found by a hash join of their
+    windows on window ID, without moving anything until `execute` is called.
+
+    Only the windows on a different desktop in the two territories are moved (as
+    `WorkspaceWindowRemap` events, in the `moves` attribute). The windows which are
+    recorded but not currently open (`missing_windows`) and which are open but were
+    not recorded (`unrecorded_windows`) are kept apart, to be reported.
+    """
+    def __init__(self, recorded, current):
+        for territory in (recorded, current):
+            t_type = type(territory)
+            assert t_type is WsTerritory, f"Not a WorkspaceTerritory ({t_type})"
+        self.current_desktops = {
+            int(w.win_id, 16): w.desktop_number for w in current.windows
+        }
+        recorded_ids = set()
+        self.moves = []
+        self.missing_windows = []
+        for w in recorded.windows:
+            win_id = int(w.win_id, 16)
+            recorded_ids.add(win_id)
+            if win_id not in self.current_desktops:
+                self.missing_windows.append(w)
+            elif self.current_desktops[win_id] != w.desktop_number:
+                self.moves.append(WorkspaceWindowRemap(w, w.desktop_number))
+        self.unrecorded_windows = [
+            w for w in current.windows if int(w.win_id, 16) not in recorded_ids
+        ]
+        return
+
+    def __repr__(self):
+        n_missing = len(self.missing_windows)
+        n_unrecorded = len(self.unrecorded_windows)
+        repr_str = f"RemapPlan of {len(self.moves)} moves ({n_missing} windows missing,"
+        repr_str += f" {n_unrecorded} unrecorded)"
+        return repr_str
+
+    def report(self):
+        """
+        Print the moves planned, and the windows which are missing or unrecorded.
+        """
+        print(self)
+        for r in self.moves:
+            from_d = self.current_desktops[int(r.remap_win_id, 16)]
+            print(f"Remapping window {r.remap_win_id}: {from_d} => {r.target_desktop}")
+        for w in self.missing_windows:
+            print(f"Missing window (recorded, not open): {w}")
+        for w in self.unrecorded_windows:
+            print(f"Unrecorded window (open, not recorded): {w}")
+        return
+
+    def execute(self, display=None):
+        """
+        Make all of the moves at once (see `execute_remaps`).
+        """
+        execute_remaps(self.moves, display=display)
+        return
+
+    @profiled("verify remaps")
+    def verify(self, windows=None):
+        """
+        Check which moves put their window on its target desktop, against a list of
+        windows (by default read from `wmctrl -l`, once for all the moves), setting
+        whether each move is `confirmed`. Return the moves which were not.
+        """
+        if windows is None:
+            windows = read_wmctrl_windows()
+        desktops = {int(w.win_id, 16): w.desktop_number for w in windows}
+        failed = []
+        for r in self.moves:
+            r.confirmed = desktops.get(int(r.remap_win_id, 16)) == r.target_desktop
+            if not r.confirmed:
+                failed.append(r)
+        return failed
+
+    @property
+    def current_desktops(self):
+        return self._current_desktops
+
+    @current_desktops.setter
+    def current_desktops(self, desktops):
+        self._current_desktops = desktops
+        return
+
+    @property
+    def moves(self):
+        return self._moves
+
+    @moves.setter
+    def moves(self, moves):
+        self._moves = moves
+        return
+
+    @property
+    def missing_windows(self):
+        return self._missing_windows
+
+    @missing_windows.setter
+    def missing_windows(self, windows):
+        self._missing_windows = windows
+        return
+
+    @property
+    def unrecorded_windows(self):
+        return self._unrecorded_windows
+
+    @unrecorded_windows.setter
+    def unrecorded_windows(self, windows):
+        self._unrecorded_windows = windows
+        return
+
 class WorkspaceTerritoryRemap(object):
     """
     A WorkspaceTerritoryRemap (consider it as a 'remap' event) is equipped with
@@ -58,9 +189,14 @@ class WorkspaceTerritoryRemap(object):
             assert type(src) is WsTerritory, f"Not a WorkspaceTerritory ({type(src)})"
         self.target_territory = dst
         self.source_territory = src
+        self.workspace_remaps = []
         return
 
-    def transform_to_remap(self):
+    def transform_to_remap(self, display=None):
+        """
+        Collect the window remappings of every workspace (as `WorkspaceRemap` events),
+        then move all of the windows at once (see `execute_remaps`).
+        """
         for target_ws in self.target_territory.workspaces:
             target_d = target_ws.number
             if self.source_territory is None:
@@ -68,6 +204,18 @@ class WorkspaceTerritoryRemap(object):
             else:
                 src_ws = temporary_territory_lookup(self.source_territory, target_d)
             ws_remap = WorkspaceRemap(target_ws, src_ws)
+            self.workspace_remaps.append(ws_remap)
+        remaps = [r for ws_remap in self.workspace_remaps for r in ws_remap.remaps]
+        execute_remaps(remaps, display=display)
+        return
+
+    @property
+    def workspace_remaps(self):
+        return self._workspace_remaps
+
+    @workspace_remaps.setter
+    def workspace_remaps(self, ws_remaps):
+        self._workspace_remaps = ws_remaps
         return
 
 class WorkspaceRemap(object):
@@ -78,14 +226,15 @@ class WorkspaceRemap(object):
 
         `src` may be `None`, otherwise it is the 'ground truth' source of the equivalent
         workspace (i.e. the one with matching desktop number to `target`). If it is not
-        `None` then we want to check if the windows here need moving before we make the
-        call to `wmctrl` (via the `move_wm_id_to_d` function) to avoid wasting calls.
+        `None` then we want to check if the windows here need moving before we store
+        a remapping for them, to avoid moving windows which are already in place.
 
         This class stores an attribute 'remaps', which is a list of window remappings
         (represented as `WorkspaceWindowRemap` events) which were sent to the given
         desktop (the attribute `target_d`), only intended to be used to check the
         status/existence of individual `WorkspaceWindowRemap` event objects in the
-        case it's unclear whether there was only partial remapping success.
+        case it's unclear whether there was only partial remapping success. The moves
+        are not made here, but together for all workspaces (see `execute_remaps`).
         """
         assert type(target) is Workspace, f"Target is not a Workspace ({type(target)})"
         if src is not None:
@@ -138,21 +287,34 @@ class WorkspaceRemap(object):
 
 class WorkspaceWindowRemap(object):
     """
-    Initiate a remap event given a Workspace (pyxsys.wm.workspace⠶Workspace) and
-    a desktop number. A remap event is a call to `wmctrl` to move the window
-    using its ID (this is handled by the function `move_wm_id_to_d`).
+    Initiate a remap event given a window (from a pyxsys.wm.workspace⠶Workspace, or a
+    sticky window) and a desktop number. A remap event is a move of the window using
+    its ID, which is made along with the other remap events' moves by `execute_remaps`
+    (or alone by calling `move`, which calls `wmctrl` via `move_wm_id_to_d`).
+
+    Once executed, `confirmed` is True if the window was seen to move to the target
+    desktop, False if it wasn't, and None if it's unknown (i.e. if moved by `wmctrl`).
     """
     def __init__(self, w, d_num):
-        assert type(w) is WsWindow, f"This is not a WorkspaceWindow ({type(w)})"
+        assert isinstance(w, WindowDesc), f"This is not a wmctrl window ({type(w)})"
         self.remap_win_id = w.win_id
         self.target_desktop = d_num
-        self.move()
+        self.confirmed = None
         return
 
     def move(self):
         move_wm_id_to_d(self.remap_win_id, self.target_desktop)
         return
 
+    @property
+    def confirmed(self):
+        return self._confirmed
+
+    @confirmed.setter
+    def confirmed(self, confirmed):
+        self._confirmed = confirmed
+        return
+
     @property
     def remap_win_id(self):
         return self._remap_win_id
@@ -184,3 +346,46 @@ def move_wm_id_to_d(wm_id, d_num):
     print(f"Moving {wm_id} to {d_num}")
     run(wmctrl_cmd)
     return
+
+def move_wm_ids_to_ds(moves, max_workers=8):
+    """
+    Given a list of `(wm_id, d_num)` pairs, move each window to its desktop with
+    `wmctrl` (see `move_wm_id_to_d`), running up to `max_workers` `wmctrl` processes
+    at a time rather than one after another.
+    """
+    wm_ids, d_nums = zip(*moves) if moves else ((), ())
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Consume the results so that any error in a `wmctrl` call is raised here
+        list(executor.map(move_wm_id_to_d, wm_ids, d_nums))
+    return
+
+@profiled("execute remaps")
+def execute_remaps(remaps, display=None, timeout=1.0, max_workers=8):
+    """
+    Move the windows of a list of `WorkspaceWindowRemap` events to their target
+    desktops all at once, by sending `_NET_WM_DESKTOP` client messages over a single
+    X connection (see `pyxsys.x11⠶set_window_desktops`, which waits up to `timeout`
+    seconds for the window manager to make the moves), and set whether each remap is
+    `confirmed` by the window's new desktop.
+
+    If the X server can't be connected to, fall back to calling `wmctrl` for each
+    window, up to `max_workers` at a time (see `move_wm_ids_to_ds`), in which case
+    the remaps are left unconfirmed (their `confirmed` attribute stays None).
+    """
+    if not remaps:
+        return
+    count("moves", len(remaps))
+    try:
+        conn = X11Connection(display)
+    except (OSError, AssertionError) as e:
+        print(f"Falling back to wmctrl, no X connection ({e})")
+        moves = [(r.remap_win_id, r.target_desktop) for r in remaps]
+        move_wm_ids_to_ds(moves, max_workers=max_workers)
+        return
+    desktops = {int(r.remap_win_id, 16): r.target_desktop for r in remaps}
+    with conn:
+        on_desktop = set_window_desktops(conn, desktops, timeout=timeout)
+    for r in remaps:
+        r.confirmed = int(r.remap_win_id, 16) in on_desktop
+    print(f"Moved {len(on_desktop)} of {len(desktops)} windows to their desktops")
+    return
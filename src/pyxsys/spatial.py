@@ -0,0 +1,138 @@
+from heapq import heappush, heappop
+from itertools import count
+from math import ceil, sqrt
+
+
+class SpatialIndex(object):
+    """
+    A static R-tree of rectangles (such as window geometries), each stored with an
+    item (such as the window), for point, rectangle intersection, and nearest item
+    queries which only visit the branches of the tree whose bounding boxes could
+    contain a result (logarithmic in the number of rectangles, for windows which
+    mostly don't overlap, rather than linear as for a scan).
+
+    The tree is bulk-loaded by Sort-Tile-Recursive packing: the rectangles are sorted
+    into vertical slices by the x coordinate of their centres, and each slice into
+    runs of `node_size` by the y coordinate, to make the leaf nodes (and likewise for
+    the nodes of each level above, until there is only one).
+
+    Entries are given as `(x, y, width, height, item)`, where `(x, y)` is the top left
+    corner, and rectangles are half-open (a 1x1 window at (0, 0) only contains the
+    point (0, 0)). It is built once, so build a new index when the windows change.
+    """
+
+    def __init__(self, entries, node_size=16):
+        assert node_size > 1, ValueError("Nodes must have more than one entry")
+        self._node_size = node_size
+        # Nodes (and entries) are (x0, y0, x1, y1, children) tuples
+        level = [(x, y, x + w, y + h, item) for x, y, w, h, item in entries]
+        self._len = len(level)
+        self._height = 0  # The number of levels of nodes above the entries
+        while len(level) > 1 or self._height == 0:
+            level = self.pack_level(level)
+            self._height += 1
+        self._root = level[0]
+        return
+
+    def __repr__(self):
+        return f"SpatialIndex of {len(self)} rectangles ({self._height} levels)"
+
+    def __len__(self):
+        return self._len
+
+    @classmethod
+    def from_items(cls, items, geom_of, node_size=16):
+        """
+        Index the items by the `(x, y, width, height)` returned by `geom_of(item)`,
+        skipping those for which it returns None.
+        """
+        entries = []
+        for item in items:
+            geom = geom_of(item)
+            if geom is not None:
+                entries.append((*geom, item))
+        return cls(entries, node_size)
+
+    def pack_level(self, level):
+        """
+        Group a level of nodes (or entries) into the level of nodes above it.
+        """
+        if not level:
+            return [(0, 0, 0, 0, [])]
+        size = self._node_size
+        n_nodes = ceil(len(level) / size)
+        n_slices = ceil(sqrt(n_nodes))
+        slice_len = n_slices * size
+        by_x = sorted(level, key=lambda r: r[0] + r[2])
+        packed = []
+        for start in range(0, len(by_x), slice_len):
+            by_y = sorted(by_x[start : start + slice_len], key=lambda r: r[1] + r[3])
+            for i in range(0, len(by_y), size):
+                children = by_y[i : i + size]
+                packed.append(
+                    (
+                        min(r[0] for r in children),
+                        min(r[1] for r in children),
+                        max(r[2] for r in children),
+                        max(r[3] for r in children),
+                        children,
+                    )
+                )
+        return packed
+
+    def search(self, x0, y0, x1, y1):
+        """
+        Iterate over the entries `(x0, y0, x1, y1, item)` which intersect the
+        (half-open) rectangle from `(x0, y0)` to `(x1, y1)`.
+        """
+        stack = [(self._root, self._height)]
+        while stack:
+            node, height = stack.pop()
+            for child in node[4]:
+                if child[0] < x1 and x0 < child[2] and child[1] < y1 and y0 < child[3]:
+                    if height == 1:
+                        yield child
+                    else:
+                        stack.append((child, height - 1))
+
+    def at_point(self, x, y):
+        """
+        Return the items whose rectangles contain the point `(x, y)`.
+        """
+        return [entry[4] for entry in self.search(x, y, x + 1, y + 1)]
+
+    def intersecting(self, x, y, width, height):
+        """
+        Return the items whose rectangles intersect the rectangle of the given size
+        whose top left corner is at `(x, y)`.
+        """
+        return [entry[4] for entry in self.search(x, y, x + width, y + height)]
+
+    def nearest(self, x, y, k=1):
+        """
+        Return the (up to) `k` items whose rectangles are nearest to the point `(x, y)`
+        (those containing it first, at a distance of 0), nearest first. The tree is
+        searched best first, so only nodes nearer than the k-th nearest are visited.
+        """
+        tie_break = count()
+        heap = [(0, next(tie_break), self._root, self._height)]
+        nearest = []
+        while heap and len(nearest) < k:
+            _, _, node, height = heappop(heap)
+            if height == 0:
+                nearest.append(node[4])
+                continue
+            for child in node[4]:
+                dist = rect_distance(child, x, y)
+                heappush(heap, (dist, next(tie_break), child, height - 1))
+        return nearest
+
+
+def rect_distance(rect, x, y):
+    """
+    The Euclidean distance from the point `(x, y)` to the rectangle `(x0, y0, x1, y1)`
+    (0 if the point is inside it).
+    """
+    dx = max(rect[0] - x, 0, x - (rect[2] - 1))
+    dy = max(rect[1] - y, 0, y - (rect[3] - 1))
+    return sqrt(dx * dx + dy * dy)
@@ -0,0 +1,39 @@
+class StringTable(object):
+    """
+    A table of interned strings (such as a session's URLs, titles, and tab icons, or
+    the names of windows in a CompactWindowTree), in which each distinct string is
+    stored once and referred to by its index in the table.
+    """
+
+    def __init__(self):
+        self._strings = []
+        self._lookup = {}
+        return
+
+    def __repr__(self):
+        return f"StringTable of {len(self)} strings"
+
+    def __len__(self):
+        return len(self._strings)
+
+    def __getitem__(self, i):
+        return self._strings[i]
+
+    def intern(self, s):
+        """
+        Return the index of the string `s` in the table (adding it if it is new).
+        """
+        i = self._lookup.get(s)
+        if i is None:
+            i = self._lookup[s] = len(self._strings)
+            self._strings.append(s)
+        return i
+
+    def __getstate__(self):
+        # Only the strings are pickled, the lookup is rebuilt from them on unpickling
+        return (self._strings,)
+
+    def __setstate__(self, state):
+        (self._strings,) = state
+        self._lookup = {s: i for i, s in enumerate(self._strings)}
+        return
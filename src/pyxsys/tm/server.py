@@ -5,10 +5,13 @@ class TmuxServer(object):
     """
     This class represents a tmux server with children that are sessions, containing
     windows (usually just 1), each with 1 or more panes.
+
+    The sessions are listed from tmux, unless a list of sessions already read (e.g.
+    by `pyxsys.collect⠶collect_tmux_server`) is given as `sessions`.
     """
 
-    def __init__(self):
-        self.sessions = list_sessions()
+    def __init__(self, sessions=None):
+        self.sessions = list_sessions() if sessions is None else sessions
         return
 
     def __repr__(self):
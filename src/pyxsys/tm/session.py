@@ -1,6 +1,7 @@
 from subprocess import run
 from datetime import datetime as dt
 from pyxsys.tm.window import list_windows
+from pyxsys.instrument import profiled
 
 
 def list_session_formats():
@@ -15,18 +16,39 @@ def list_session_formats():
     return session_formats
 
 
-def list_sessions(attached_only=True, numeric_id_sort=True):
+def list_sessions_args():
     """
-    Return a list of TmuxSession instances created by parsing the output of
-    `tmux list-sessions`.
+    The `tmux list-sessions` command (as a list of arguments) whose output is parsed
+    by `parse_sessions`.
     """
     pre_str = "#{"
     post_str = "}"
     s_formats = [f"{pre_str}{x}{post_str}" for x in list_session_formats()]
     format_string = "\t".join(s_formats)
-    result = run(["tmux", "list-sessions", "-F", format_string], capture_output=True)
+    return ["tmux", "list-sessions", "-F", format_string]
+
+
+def list_sessions(attached_only=True, numeric_id_sort=True):
+    """
+    Return a list of TmuxSession instances created by parsing the output of
+    `tmux list-sessions`.
+    """
+    result = run(list_sessions_args(), capture_output=True)
     assert result.returncode == 0, f"'tmux list-sessions' failed.\n{result.stderr}"
     session_str = result.stdout.decode()
+    window_list = list_windows()
+    session_list = parse_sessions(
+        session_str, window_list, attached_only, numeric_id_sort
+    )
+    return session_list
+
+
+@profiled("parse tmux sessions")
+def parse_sessions(session_str, window_list, attached_only=True, numeric_id_sort=True):
+    """
+    Parse the output of `tmux list-sessions` (see `list_sessions_args`) into a list of
+    TmuxSession instances, adding the windows in `window_list` to their sessions.
+    """
     session_list = []
     for line in session_str.split("\n"):
         if line == "":
@@ -38,7 +60,6 @@ def list_sessions(attached_only=True, numeric_id_sort=True):
         session_list.append(session)
     if numeric_id_sort:
         session_list = sorted(session_list, key=lambda x: int(x.session_id.lstrip("$")))
-    window_list = list_windows()
     for w in window_list:
         for s in session_list:
             if s.session_id == w.session_id:
@@ -1,5 +1,6 @@
 from subprocess import run
 from pyxsys.tm.pane import TmuxPane, PaneSplit
+from pyxsys.instrument import profiled
 
 
 def list_window_formats():
@@ -18,19 +19,37 @@ def list_window_formats():
     return window_formats
 
 
-def list_windows(attached_only=True, numeric_id_sort=True):
+def list_windows_args():
     """
-    Return a list of TmuxWindow instances created by parsing the output of
-    `tmux list-windows`.
+    The `tmux list-windows` command (as a list of arguments) whose output is parsed
+    by `parse_windows`.
     """
     pre_str = "#{"
     post_str = "}"
     s_formats = [f"{pre_str}{x}{post_str}" for x in list_window_formats()]
     format_string = "\t".join(s_formats)
-    tmux_args = ["tmux", "list-windows", "-a", "-F", format_string]
+    return ["tmux", "list-windows", "-a", "-F", format_string]
+
+
+def list_windows(attached_only=True, numeric_id_sort=True):
+    """
+    Return a list of TmuxWindow instances created by parsing the output of
+    `tmux list-windows`.
+    """
+    tmux_args = list_windows_args()
     result = run(tmux_args, capture_output=True)
     assert result.returncode == 0, f"`{' '.join(tmux_args)}'` failed.\n{result.stderr}"
     windows_str = result.stdout.decode()
+    window_list = parse_windows(windows_str, attached_only, numeric_id_sort)
+    return window_list
+
+
+@profiled("parse tmux windows")
+def parse_windows(windows_str, attached_only=True, numeric_id_sort=True):
+    """
+    Parse the output of `tmux list-windows` (see `list_windows_args`) into a list of
+    TmuxWindow instances.
+    """
     window_list = []
     for line in windows_str.split("\n"):
         if line == "":
@@ -125,6 +144,7 @@ class LayoutDesc(TmuxWindowLayout):
         return f"{self.id}::{pane_tree_repr}"
 
 
+@profiled("parse tmux pane layout")
 def parse_pane_geom_tree(panes_str):
     panes_str = panes_str.replace("{", "{{{").replace("}", "}}}")
     panes_str = panes_str.replace("[", "[[[").replace("]", "]]]")
@@ -1,8 +1,10 @@
 from subprocess import run
 from shutil import which
 from pyxsys.tm.server import TmuxServer
+from pyxsys.instrument import profiled
 
 
+@profiled("read tmux")
 def read_tmux_server():
     """
     Read all of the tmux server's windows and their panes into a single representation.
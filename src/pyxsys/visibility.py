@@ -0,0 +1,150 @@
+try:
+    # Optional, only needed to compute window visibility
+    import numpy as np
+except ImportError:
+    np = None
+
+# The fields of the array returned by `compute_visibility`, one row per top-level window
+VISIBILITY_DTYPE = [
+    ("win_id", "u4"),  # The ID of the top-level (i.e. frame) window
+    ("client_id", "u4"),  # The ID of the client window in it (0 if it has none)
+    ("desktop_number", "i4"),  # The workspace it is on (-1 if sticky or unknown)
+    ("stack_position", "i4"),  # Its position in the stacking order (0 is the top)
+    ("x", "i4"),
+    ("y", "i4"),
+    ("width", "i4"),
+    ("height", "i4"),
+    ("area", "i8"),  # The area of the window on screen
+    ("visible_area", "i8"),  # The area of the window on screen not covered by others
+    ("occlusion", "f8"),  # The fraction of the window which can't be seen (0 to 1)
+]
+
+
+def compute_visibility(x_session, wm_territory, screen=None):
+    """
+    Compute how much of each top-level window of the X window tree `x_session` (i.e.
+    each child of its source, which are the window manager's frames, in stacking order)
+    can be seen on the current workspace of `wm_territory`, returning a structured
+    array (see `VISIBILITY_DTYPE`) with one row per top-level window, top first.
+
+    Only the frames of the windows on the current workspace (and sticky windows) are
+    taken to be shown: the rest (windows on other workspaces, and frames with no
+    wmctrl-listed window in them, which are usually unmapped) have no visible area.
+    Each window's area is clipped to the `screen` rectangle `(x, y, width, height)`,
+    by default the desktop geometry of the current workspace.
+
+    The visible area and occlusion are also set as the `visible_area` and `occlusion`
+    attributes of each top-level window and its client window (see `visible_areas`).
+    """
+    assert np is not None, ImportError("Computing visibility requires numpy")
+    desktops = {int(w.win_id, 16): w.desktop_number for w in wm_territory.windows}
+    current = [ws for ws in wm_territory.workspaces if ws.is_current]
+    current_number = current[0].number if current else None
+    if screen is None:
+        assert current, ValueError("No current workspace to take the screen size from")
+        screen = (0, 0, current[0].geometry.width, current[0].geometry.height)
+    top_level = [w for w in x_session.source.children if w.geom is not None]
+    clients = [find_client(x_session, w, desktops) for w in top_level]
+    result = np.zeros(len(top_level), dtype=VISIBILITY_DTYPE)
+    result["win_id"] = [int(w.win_id, 16) for w in top_level]
+    result["client_id"] = [0 if c is None else int(c.win_id, 16) for c in clients]
+    result["desktop_number"] = [
+        -1 if c is None else desktops[int(c.win_id, 16)] for c in clients
+    ]
+    result["stack_position"] = np.arange(len(top_level))
+    rects = np.array(
+        [(w.geom.abs_x, w.geom.abs_y, w.geom.width, w.geom.height) for w in top_level],
+        dtype=np.int64,
+    ).reshape(-1, 4)
+    result["x"], result["y"], result["width"], result["height"] = rects.T
+    shown_desktops = [-1] if current_number is None else [-1, current_number]
+    shown = (result["client_id"] != 0) & np.isin(
+        result["desktop_number"], shown_desktops
+    )
+    area, visible_area = visible_areas(rects[shown], screen)
+    result["area"][shown] = area
+    result["visible_area"][shown] = visible_area
+    result["occlusion"] = 1 - np.divide(
+        result["visible_area"],
+        result["area"],
+        out=np.zeros(len(result)),
+        where=result["area"] > 0,
+    )
+    for window, client, row in zip(top_level, clients, result.tolist()):
+        visible, occlusion = row[-2:]
+        for w in (window, client):
+            if w is not None:
+                w.visible_area = visible
+                w.occlusion = occlusion
+    return result
+
+
+def find_client(x_session, top_level_window, desktops):
+    """
+    The first window (depth-first) from the top-level window down which is listed by
+    wmctrl (i.e. whose integer ID is a key of `desktops`), or None if there is none.
+    """
+    for _, window in x_session.iter_depth_first(top_level_window):
+        if int(window.win_id, 16) in desktops:
+            return window
+    return None
+
+
+def visible_areas(rects, screen):
+    """
+    For an array of rectangles (rows of `x, y, width, height`) in stacking order (top
+    first), return arrays of the area of each on the screen (a rectangle given as
+    `x, y, width, height`) and the area of each not covered by any rectangle above it.
+
+    The screen is divided into a grid of cells along the (distinct) edges of all of
+    the rectangles, so each cell is either wholly inside or wholly outside each of
+    them. Which rectangles cover each column and each row of cells are packed as bits
+    into 64 bit words (bit `k` of word `w` for rectangle `64 * w + k`), so ANDing the
+    words of a column and a row gives the rectangles covering that cell, and the
+    lowest set bit is the one on top. This is done for every cell at once, one word
+    (i.e. 64 rectangles) at a time, and the visible areas are the sums of the areas of
+    the cells each rectangle is on top at.
+    """
+    assert np is not None, ImportError("Computing visibility requires numpy")
+    n = len(rects)
+    sx, sy, sw, sh = screen
+    x0 = np.clip(rects[:, 0], sx, sx + sw)
+    x1 = np.clip(rects[:, 0] + rects[:, 2], sx, sx + sw)
+    y0 = np.clip(rects[:, 1], sy, sy + sh)
+    y1 = np.clip(rects[:, 1] + rects[:, 3], sy, sy + sh)
+    area = (x1 - x0) * (y1 - y0)
+    if n == 0:
+        return area, np.zeros(0, dtype=np.int64)
+    xs = np.unique(np.concatenate([x0, x1]))
+    ys = np.unique(np.concatenate([y0, y1]))
+    cover_x = pack_cover_bits(x0, x1, xs[:-1])
+    cover_y = pack_cover_bits(y0, y1, ys[:-1])
+    # The index of the top rectangle at each cell (n where no rectangle covers it)
+    on_top = np.full((len(xs) - 1, len(ys) - 1), n)
+    for w in range(cover_x.shape[1]):
+        covers = cover_x[:, w, None] & cover_y[None, :, w]
+        newly_covered = (on_top == n) & (covers != 0)
+        # The lowest set bit (a power of 2, exact as a float) is covers & -covers
+        lowest_bit = np.maximum(covers & (~covers + np.uint64(1)), np.uint64(1))
+        top_index = 64 * w + np.log2(lowest_bit).astype(np.int64)
+        on_top = np.where(newly_covered, top_index, on_top)
+        if not (on_top == n).any():
+            break  # Every cell is covered, so the rectangles below are all hidden
+    cell_area = np.diff(xs)[:, None] * np.diff(ys)[None, :]
+    visible_area = np.bincount(
+        on_top.ravel(), weights=cell_area.ravel(), minlength=n + 1
+    )[:n]
+    return area, visible_area.astype(np.int64)
+
+
+def pack_cover_bits(starts, stops, cells):
+    """
+    For each cell (given by its start coordinate), the rectangles (given by the start
+    and stop of each along the same axis) which cover it, as bits of 64 bit words.
+    """
+    covers = (starts[None, :] <= cells[:, None]) & (cells[:, None] < stops[None, :])
+    n_words = -(-len(starts) // 64)
+    padded = np.zeros((len(cells), 64 * n_words), dtype=bool)
+    padded[:, : len(starts)] = covers
+    packed = np.packbits(padded, axis=1, bitorder="little")
+    return packed.view("<u8")
@@ -1,5 +1,6 @@
 from pyxsys.wm.window import StickyWindow, WorkspaceWindow
 from pyxsys.wm.workspace import Workspace
+from pyxsys.instrument import profiled, count
 
 
 class WorkspaceTerritory(object):
@@ -30,6 +31,7 @@ class WorkspaceTerritory(object):
           for use in pyxsys.recover.remap⠶WorkspaceTerritoryRemap.transform_to_remap
     """
 
+    @profiled("build WorkspaceTerritory")
     def __init__(self, workspaces_str, windows_str):
         self.sticky_windows = []
         self.workspaces = [Workspace(w) for w in workspaces_str.split("\n") if w != ""]
@@ -99,17 +101,37 @@ class WorkspaceTerritory(object):
             target_ws = self.get_workspace(ws_n)
         return
 
+    def spatial_index(self, x_session, desktop_number):
+        """
+        Build a SpatialIndex of the windows on a workspace (including the sticky
+        windows, which are on every workspace) by the geometry of their X windows in
+        `x_session` (a WindowTree), so that the windows at a point, in a region, or
+        nearest a point can be found without checking every window.
+        """
+        # Imported here so that reading wmctrl doesn't import the X window tree model
+        from pyxsys.spatial import SpatialIndex
+        from pyxsys.xw.tree import window_geom_rect
+
+        ws_windows = list(self.sticky_windows)
+        if desktop_number >= 0:
+            ws_windows.extend(self.get_workspace(desktop_number).windows)
+
+        def geom_of(window):
+            x_window = x_session.get_window(window.win_id)
+            return None if x_window is None else window_geom_rect(x_window)
+
+        return SpatialIndex.from_items(ws_windows, geom_of)
+
+    @profiled("xref X session")
     def xref_x_session(self, x_session):
         """
-        Mark all windows with their workspace
+        Mark all windows with their workspace (a hash join of the wmctrl windows on the
+        X window tree's index of integer window IDs).
         """
         for tw in self.windows:
-            tw_id = int(tw.win_id, 16)
-            xw_list = [x for xs in x_session.walk() for x in xs]
-            for xw in xw_list:
-                xw_id = int(xw.win_id, 16)
-                if tw_id == xw_id:
-                    xw.desktop_number = tw.desktop_number
-                    tw.x_win_id = xw.win_id
-                    break
+            xw = x_session.get_window(tw.win_id)
+            if xw is not None:
+                xw.desktop_number = tw.desktop_number
+                tw.x_win_id = xw.win_id
+                count("windows_matched")
         return
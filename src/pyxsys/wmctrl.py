@@ -1,8 +1,11 @@
 from subprocess import run
 from shutil import which
 from pyxsys.wm.territory import WorkspaceTerritory
+from pyxsys.wm.window import WindowDesc
+from pyxsys.instrument import profiled
 
 
+@profiled("read wmctrl")
 def read_wmctrl_listings():
     """
     Read the workspaces and mapped windows from wmctrl into a single representation.
@@ -16,3 +19,17 @@ def read_wmctrl_listings():
     windows_str = result_l.stdout.decode()
     territory = WorkspaceTerritory(workspaces_str, windows_str)
     return territory
+
+
+@profiled("read wmctrl windows")
+def read_wmctrl_windows():
+    """
+    Read only the mapped windows from wmctrl (`wmctrl -l`), as a list of windows (not
+    placed in workspaces), e.g. to check the desktops of windows after moving them.
+    """
+    assert which("wmctrl") is not None, "wmctrl not found, please install it"
+    result_l = run(["wmctrl", "-l"], capture_output=True)
+    assert result_l.returncode == 0, f"'wmctrl -l' failed.\n{result_l.stderr}"
+    windows_str = result_l.stdout.decode()
+    windows = [WindowDesc(w) for w in windows_str.split("\n") if w != ""]
+    return windows
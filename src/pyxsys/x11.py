@@ -0,0 +1,656 @@
+import os
+import socket
+from pathlib import Path
+from select import select
+from struct import pack, unpack_from
+from time import monotonic
+from pyxsys.xw.tree import WindowTree, CompactWindowTree
+from pyxsys.xw.window import ChildWindow, WindowGeom
+from pyxsys.xw.window import SourceWindow, RootWindow, ParentWindow
+from pyxsys.instrument import profiled
+
+X11_TCP_PORT = 6000
+X11_UNIX_SOCKET = "/tmp/.X11-unix/X{}"
+
+# The seconds a read from (or write to) the X server may block for before it fails
+X11_TIMEOUT = 10.0
+
+# Core protocol request opcodes
+CHANGE_WINDOW_ATTRIBUTES = 2
+GET_GEOMETRY = 14
+QUERY_TREE = 15
+INTERN_ATOM = 16
+GET_PROPERTY = 20
+SEND_EVENT = 25
+TRANSLATE_COORDINATES = 40
+
+# Predefined atoms
+ATOM_ANY = 0
+ATOM_CARDINAL = 6
+ATOM_STRING = 31
+ATOM_WINDOW = 33
+ATOM_WM_NAME = 39
+
+# Event codes (the high bit of the code is set on events sent by other clients)
+CREATE_NOTIFY = 16
+DESTROY_NOTIFY = 17
+REPARENT_NOTIFY = 21
+CONFIGURE_NOTIFY = 22
+GRAVITY_NOTIFY = 24
+CIRCULATE_NOTIFY = 26
+PROPERTY_NOTIFY = 28
+CLIENT_MESSAGE = 33
+
+# Event masks, and the window attribute bit to set the event mask with
+SUBSTRUCTURE_NOTIFY_MASK = 1 << 19
+SUBSTRUCTURE_REDIRECT_MASK = 1 << 20
+PROPERTY_CHANGE_MASK = 1 << 22
+CW_EVENT_MASK = 1 << 11
+
+# The Xauthority address family which matches any host (X.Org's Xauth.h)
+FAMILY_WILD = 65535
+
+# The EWMH source indication for requests from pagers (and other direct user actions)
+SOURCE_PAGER = 2
+
+# Sequence numbers are 16 bit, so at most this many requests are sent before their
+# replies are read back (each reply is matched to its request by sequence number)
+MAX_PIPELINE = 16384
+
+
+def pad(n):
+    return -n % 4
+
+
+def parse_display(display=None):
+    """
+    Split an X display name (by default the `DISPLAY` environment variable) of the
+    form `[host]:display[.screen]` into its host, display number, and screen number.
+    """
+    if display is None:
+        display = os.environ.get("DISPLAY")
+    assert display, ValueError("No X display given and DISPLAY is not set")
+    host, sep, rest = display.rpartition(":")
+    assert sep, ValueError(f"Invalid X display name {display!r}")
+    d_num, _, screen = rest.partition(".")
+    return host, int(d_num), int(screen or 0)
+
+
+def open_x11_socket(host, d_num, timeout=X11_TIMEOUT):
+    """
+    Connect to the X server: over its Unix socket for a local display (trying the
+    Linux abstract socket namespace if the socket file is missing), else over TCP.
+    Reads and writes on the socket time out after `timeout` seconds, so that a hung
+    X server raises `TimeoutError` rather than blocking the caller indefinitely.
+    """
+    if host in ("", "unix"):
+        path = X11_UNIX_SOCKET.format(d_num)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            sock.connect("\0" + path)
+        return sock
+    sock = socket.create_connection((host, X11_TCP_PORT + d_num), timeout)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sock
+
+
+def read_xauthority(host, d_num):
+    """
+    Return the authorisation protocol name and data (e.g. `MIT-MAGIC-COOKIE-1` and its
+    cookie) from the Xauthority file for the display, or empty bytes if there are none.
+    """
+    xauth_path = os.environ.get("XAUTHORITY") or Path.home() / ".Xauthority"
+    try:
+        data = Path(xauth_path).read_bytes()
+    except OSError:
+        return b"", b""
+    hostname = (host if host not in ("", "unix") else socket.gethostname()).encode()
+    d_num_str = str(d_num).encode()
+    pos = 0
+    while pos + 2 <= len(data):
+        family = unpack_from(">H", data, pos)[0]
+        pos += 2
+        fields = []
+        for _ in range(4):
+            (n,) = unpack_from(">H", data, pos)
+            fields.append(data[pos + 2 : pos + 2 + n])
+            pos += 2 + n
+        address, number, name, cookie = fields
+        if number not in (d_num_str, b""):
+            continue
+        if family == FAMILY_WILD or address == hostname:
+            return name, cookie
+    return b"", b""
+
+
+class X11Connection(object):
+    """
+    A minimal X11 protocol client over a socket (no Xlib or xcb needed), which sends
+    requests in pipelined batches: every request in a batch is written to the socket
+    at once, then the replies are read back, so a batch costs one round trip to the
+    X server no matter how many requests it has (see `pipeline`).
+
+    Requests are given as `(request_bytes, decode)` pairs (see e.g. `query_tree`),
+    where `decode` turns the reply into a Python value.
+    """
+
+    def __init__(self, display=None):
+        host, d_num, screen = parse_display(display)
+        self._sock = open_x11_socket(host, d_num)
+        self._buf = bytearray()
+        self._pos = 0
+        self._seq = 0
+        self._events = []
+        self._atoms = {}
+        self.setup(*read_xauthority(host, d_num))
+        assert screen < len(self.roots), ValueError(f"No screen {screen} on display")
+        self._root = self.roots[screen]
+        return
+
+    def __repr__(self):
+        return f"X11Connection (root window {hex(self.root)})"
+
+    def setup(self, auth_name, auth_data):
+        """
+        Send the connection setup (as a little-endian client) and read the server's
+        resource ID allocation and screens (the root window of each screen).
+        """
+        n, d = len(auth_name), len(auth_data)
+        setup = pack("<BxHHHH2x", ord("l"), 11, 0, n, d)
+        setup += auth_name + bytes(pad(n)) + auth_data + bytes(pad(d))
+        self._sock.sendall(setup)
+        status, reason_len, _, _, length = unpack_from("<BBHHH", self.recv(8))
+        body = self.recv(length * 4)
+        if status != 1:
+            # The reason is padded, and only has its length given if the status is 0
+            reason = body[:reason_len] if status == 0 else body.rstrip(b"\0")
+            msg = f"X server refused connection: {reason.decode(errors='replace')}"
+            raise ConnectionRefusedError(msg)
+        self._resource_id_base, self._resource_id_mask = unpack_from("<4xII", body)
+        vendor_len, _, n_screens, n_formats = unpack_from("<16xHHBB", body)
+        pos = 32 + vendor_len + pad(vendor_len) + 8 * n_formats
+        self._roots = []
+        for _ in range(n_screens):
+            self._roots.append(unpack_from("<I", body, pos)[0])
+            n_depths = body[pos + 39]
+            pos += 40
+            for _ in range(n_depths):
+                n_visuals = unpack_from("<H", body, pos + 2)[0]
+                pos += 8 + 24 * n_visuals
+        return
+
+    @property
+    def root(self):
+        return self._root
+
+    @property
+    def roots(self):
+        return self._roots
+
+    @property
+    def events(self):
+        """
+        Events received while reading replies (as raw 32 byte packets), oldest first.
+        """
+        return self._events
+
+    def recv(self, n):
+        """
+        Read exactly `n` bytes from the socket (through a read buffer).
+        """
+        while len(self._buf) - self._pos < n:
+            if self._pos > 65536:
+                # Drop the bytes already read so the buffer doesn't grow without limit
+                del self._buf[: self._pos]
+                self._pos = 0
+            chunk = self._sock.recv(max(65536, n))
+            if not chunk:
+                raise ConnectionError("X server closed the connection")
+            self._buf += chunk
+        data = bytes(self._buf[self._pos : self._pos + n])
+        self._pos += n
+        return data
+
+    def read_packet(self):
+        """
+        Read one reply, error, or event from the server. Replies and generic events
+        (type 35) may be longer than 32 bytes, with the extra length in their header.
+        """
+        packet = self.recv(32)
+        if packet[0] == 1 or packet[0] & 0x7F == 35:
+            (extra,) = unpack_from("<I", packet, 4)
+            if extra:
+                packet += self.recv(extra * 4)
+        return packet
+
+    def pipeline(self, requests):
+        """
+        Send the requests (a list of `(request_bytes, decode)` pairs) and return their
+        decoded replies in order. Requests which fail (e.g. with BadWindow, for a window
+        destroyed since it was listed) give None, as do requests without a reply (whose
+        `decode` is None, e.g. `select_input`). Events arriving in between are kept in
+        `events`.
+        """
+        results = []
+        for start in range(0, len(requests), MAX_PIPELINE):
+            batch = requests[start : start + MAX_PIPELINE]
+            self._sock.sendall(b"".join([req for req, _ in batch]))
+            first_seq = (self._seq + 1) & 0xFFFF
+            self._seq += len(batch)
+            batch_results = [None] * len(batch)
+            n_pending = sum(1 for _, decode in batch if decode is not None)
+            while n_pending:
+                packet = self.read_packet()
+                kind = packet[0]
+                if kind > 1:
+                    self._events.append(packet)
+                    continue
+                i = (unpack_from("<H", packet, 2)[0] - first_seq) & 0xFFFF
+                if batch[i][1] is None:
+                    # An error for a request without a reply (which nothing waits for)
+                    continue
+                if kind == 1:
+                    batch_results[i] = batch[i][1](packet)
+                n_pending -= 1
+            results.extend(batch_results)
+        return results
+
+    def send(self, requests):
+        """
+        Send requests which have no reply (given as bytes), without waiting.
+        """
+        self._sock.sendall(b"".join(requests))
+        self._seq += len(requests)
+        return
+
+    def poll_events(self, timeout=0):
+        """
+        Return (and clear) the events received so far, oldest first, after reading any
+        more that have arrived from the server. If there are none, wait up to `timeout`
+        seconds (or indefinitely, if None) for one. Errors for requests sent without a
+        reply (see `send`) are dropped.
+        """
+        while True:
+            while len(self._buf) - self._pos >= 32:
+                packet = self.read_packet()
+                if packet[0] > 1:
+                    self._events.append(packet)
+            ready, _, _ = select([self._sock], [], [], 0 if self._events else timeout)
+            if not ready:
+                break
+            chunk = self._sock.recv(65536)
+            if not chunk:
+                raise ConnectionError("X server closed the connection")
+            del self._buf[: self._pos]
+            self._pos = 0
+            self._buf += chunk
+        events, self._events = self._events, []
+        return events
+
+    def intern_atoms(self, names):
+        """
+        Return the atoms for the given names (interning them if need be), caching
+        them on the connection.
+        """
+        missing = [n for n in names if n not in self._atoms]
+        atoms = self.pipeline([intern_atom(n) for n in missing])
+        self._atoms.update(zip(missing, atoms))
+        return [self._atoms[n] for n in names]
+
+    def close(self):
+        self._sock.close()
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return
+
+
+def select_input(window, event_mask):
+    """
+    A ChangeWindowAttributes request setting the events this client selects on the
+    window (which has no reply, so its `decode` is None).
+    """
+    req = pack(
+        "<BxHIII", CHANGE_WINDOW_ATTRIBUTES, 4, window, CW_EVENT_MASK, event_mask
+    )
+    return req, None
+
+
+def query_tree(window):
+    """
+    A QueryTree request, whose reply is decoded as `(root, parent, children)`, with the
+    children in bottom-to-top stacking order.
+    """
+    return pack("<BxHI", QUERY_TREE, 2, window), decode_query_tree
+
+
+def decode_query_tree(reply):
+    root, parent, n_children = unpack_from("<8xIIH", reply)
+    children = unpack_from(f"<{n_children}I", reply, 32)
+    return root, parent, children
+
+
+def get_geometry(window):
+    """
+    A GetGeometry request, decoded as `(x, y, width, height, border_width)` where `x`
+    and `y` are relative to the window's parent.
+    """
+    return pack("<BxHI", GET_GEOMETRY, 2, window), decode_get_geometry
+
+
+def decode_get_geometry(reply):
+    return unpack_from("<12xhhHHH", reply)
+
+
+def translate_coordinates(src_window, dst_window, x=0, y=0):
+    """
+    A TranslateCoordinates request, decoded as the `(x, y)` in `dst_window` of the
+    point `(x, y)` in `src_window`.
+    """
+    req = pack("<BxHIIhh", TRANSLATE_COORDINATES, 4, src_window, dst_window, x, y)
+    return req, decode_translate_coordinates
+
+
+def decode_translate_coordinates(reply):
+    return unpack_from("<12xhh", reply)
+
+
+def get_property(window, prop, prop_type=ATOM_ANY, long_length=1024):
+    """
+    A GetProperty request (for up to `long_length` 4 byte units of the value), decoded
+    as `(type, format, value)`, where the value is bytes for 8 bit formats and a tuple
+    of ints for 16 and 32 bit formats (or None if the window has no such property).
+    """
+    req = pack("<BBHIIIII", GET_PROPERTY, 0, 6, window, prop, prop_type, 0, long_length)
+    return req, decode_get_property
+
+
+def decode_get_property(reply):
+    fmt = reply[1]
+    prop_type, _, n_items = unpack_from("<8xIII", reply)
+    if fmt == 0:
+        return None
+    if fmt == 8:
+        return prop_type, fmt, reply[32 : 32 + n_items]
+    code = "H" if fmt == 16 else "I"
+    return prop_type, fmt, unpack_from(f"<{n_items}{code}", reply, 32)
+
+
+def intern_atom(name, only_if_exists=False):
+    """
+    An InternAtom request, decoded as the atom (0 if `only_if_exists` and it doesn't).
+    """
+    n = len(name)
+    length = 2 + (n + pad(n)) // 4
+    req = pack("<BBHH2x", INTERN_ATOM, only_if_exists, length, n)
+    return req + name.encode() + bytes(pad(n)), decode_intern_atom
+
+
+def decode_intern_atom(reply):
+    return unpack_from("<8xI", reply)[0]
+
+
+def client_message(destination, window, message_type, data, event_mask=None):
+    """
+    A SendEvent request sending a ClientMessage event (of format 32, with up to 5
+    integers of `data`) about `window` to the `destination` window, for the clients
+    selecting any of the `event_mask` events on it (by default SubstructureRedirect
+    and SubstructureNotify, i.e. the window manager, for messages sent to the root
+    window as EWMH requests are). It has no reply, so its `decode` is None.
+    """
+    if event_mask is None:
+        event_mask = SUBSTRUCTURE_REDIRECT_MASK | SUBSTRUCTURE_NOTIFY_MASK
+    values = [v & 0xFFFFFFFF for v in data] + [0] * (5 - len(data))
+    event = pack("<BBHII5I", CLIENT_MESSAGE, 32, 0, window, message_type, *values)
+    req = pack("<BBHII", SEND_EVENT, False, 11, destination, event_mask)
+    return req + event, None
+
+
+def decode_name(net_wm_name, wm_name, utf8_string):
+    """
+    A window's name from the replies to GetProperty for `_NET_WM_NAME` (UTF-8) or else
+    `WM_NAME` (Latin-1 for the STRING type, as in the ICCCM), or None if it has none.
+
+    `_NET_WM_NAME` is requested as the `utf8_string` type (atom), and is only used if
+    it has that type: for any other type the server replies with its actual type but
+    no value, so `WM_NAME` is used instead (as xwininfo does).
+    """
+    if net_wm_name is not None and net_wm_name[:2] == (utf8_string, 8):
+        return net_wm_name[2].decode("utf-8", errors="replace")
+    if wm_name is not None and wm_name[1] == 8:
+        encoding = "latin-1" if wm_name[0] == ATOM_STRING else "utf-8"
+        return wm_name[2].decode(encoding, errors="replace")
+    return None
+
+
+@profiled("read X11 tree")
+def read_x11_tree(display=None, window=None, compact=False):
+    """
+    Read the window tree from the X server (as `xwininfo -tree` does, from the root
+    unless another `window` ID is given) directly over the X11 protocol, into the
+    same WindowTree as `pyxsys.xwininfo⠶read_xwin_tree` gives (or CompactWindowTree,
+    if `compact` is True).
+    """
+    with X11Connection(display) as conn:
+        tree = build_x11_tree(conn, window)
+    if compact:
+        tree = CompactWindowTree(tree)
+    return tree
+
+
+@profiled("read X11 client windows")
+def read_client_windows(display=None):
+    """
+    Read the IDs of the client windows from the X server (see `find_client_windows`).
+    """
+    with X11Connection(display) as conn:
+        client_ids = find_client_windows(conn)
+    return client_ids
+
+
+def find_client_windows(conn):
+    """
+    Return the set of (integer) IDs of the client windows: those listed in the root
+    window's `_NET_CLIENT_LIST` (set by EWMH window managers) and those which have a
+    `WM_STATE` property (set by ICCCM window managers). The latter are found as `xprop`
+    finds a client window (XmuClientWindow): by searching down from each top-level
+    window until a window with `WM_STATE` is found, with one pipelined batch of
+    requests per level of the search.
+    """
+    root = conn.root
+    client_list, wm_state = conn.intern_atoms(["_NET_CLIENT_LIST", "WM_STATE"])
+    listed, root_tree = conn.pipeline(
+        [
+            get_property(root, client_list, ATOM_WINDOW, long_length=65536),
+            query_tree(root),
+        ]
+    )
+    client_ids = set() if listed is None else set(listed[2])
+    level = [] if root_tree is None else root_tree[2]
+    while level:
+        requests = [
+            req
+            for win in level
+            for req in (get_property(win, wm_state, long_length=0), query_tree(win))
+        ]
+        replies = conn.pipeline(requests)
+        next_level = []
+        for i, win in enumerate(level):
+            state, subtree = replies[2 * i : 2 * i + 2]
+            if state is not None:
+                client_ids.add(win)
+            elif subtree is not None:
+                next_level.extend(subtree[2])
+        level = next_level
+    return client_ids
+
+
+def set_window_desktops(conn, desktops, timeout=1.0):
+    """
+    Move windows to other desktops (workspaces), given as a dict of (integer) window
+    IDs to desktop numbers, and return the set of the IDs of the windows which are
+    then on their desktops.
+
+    A `_NET_WM_DESKTOP` client message is sent to the root window for each window
+    which isn't on its desktop already (as `wmctrl -t` sends for a single window),
+    all in one write, and the window manager's changes to the `_NET_WM_DESKTOP`
+    property of the windows are waited for (up to `timeout` seconds in all) as
+    PropertyNotify events, then checked. This takes three round trips to the X server
+    (to read the desktops beforehand, to wait for the changes, and to check them)
+    however many windows are moved.
+    """
+    (net_wm_desktop,) = conn.intern_atoms(["_NET_WM_DESKTOP"])
+    win_ids = list(desktops)
+    # Select PropertyChange before the current desktop is read, so no change is missed
+    requests = [
+        req
+        for win_id in win_ids
+        for req in (
+            select_input(win_id, PROPERTY_CHANGE_MASK),
+            get_property(win_id, net_wm_desktop, ATOM_CARDINAL, long_length=1),
+        )
+    ]
+    replies = conn.pipeline(requests)[1::2]
+    on_desktop = {
+        win_id
+        for win_id, reply in zip(win_ids, replies)
+        if reply is not None and reply[2] == (desktops[win_id] & 0xFFFFFFFF,)
+    }
+    pending = {win_id for win_id in win_ids if win_id not in on_desktop}
+    conn.send(
+        [
+            client_message(conn.root, w, net_wm_desktop, [desktops[w], SOURCE_PAGER])[0]
+            for w in pending
+        ]
+    )
+    deadline = monotonic() + timeout
+    changed = set()
+    while pending - changed:
+        remaining = deadline - monotonic()
+        if remaining <= 0:
+            break
+        for event in conn.poll_events(remaining):
+            if event[0] & 0x7F == PROPERTY_NOTIFY:
+                win_id, atom = unpack_from("<4xII", event)
+                if atom == net_wm_desktop:
+                    changed.add(win_id)
+    moved = list(pending)
+    requests = [get_property(w, net_wm_desktop, ATOM_CARDINAL, 1) for w in moved]
+    for win_id, reply in zip(moved, conn.pipeline(requests)):
+        if reply is not None and reply[2] == (desktops[win_id] & 0xFFFFFFFF,):
+            on_desktop.add(win_id)
+    return on_desktop
+
+
+def build_x11_tree(conn, window=None, event_mask=None, borders=None):
+    """
+    Build a WindowTree over an X11Connection one level at a time, with one pipelined
+    batch of requests per level: for every window on the level, its geometry, its
+    position on the root window, its name (`_NET_WM_NAME` and `WM_NAME`), and its list
+    of children (which make up the next level). So a tree of any number of windows
+    costs one round trip to the X server per level of depth (usually 4 or 5).
+
+    Children are listed in the order `xwininfo` prints them (top of the stacking order
+    first), and absolute positions are those of the outer edge of the border (as the
+    `+AX+AY` of `xwininfo`, i.e. offset by the border width).
+
+    If `event_mask` is given, those events are selected on every window (each before
+    its children are listed) and if `borders` is given, the border width of every
+    window is recorded in it by ID (see `pyxsys.xw.live⠶LiveWindowTree`).
+    """
+    root = conn.root
+    source_id = root if window is None else window
+    name_atoms = conn.intern_atoms(["_NET_WM_NAME", "UTF8_STRING"])
+    source_replies = conn.pipeline(
+        window_requests(source_id, root, name_atoms, event_mask)
+    )[-5:]
+    assert source_replies[0] is not None, ValueError(f"No window {hex(source_id)}")
+    source_name = decode_name(*source_replies[2:4], name_atoms[1])
+    _, parent_id, children = source_replies[4]
+    tree = WindowTree()
+    source = SourceWindow.from_fields(hex(source_id), source_name)
+    source.parent = ParentWindow.from_fields(hex(parent_id), None)
+    if source_id == root:
+        root_window = RootWindow.from_fields(hex(root), source_name)
+    else:
+        root_replies = conn.pipeline(window_requests(root, root, name_atoms)[2:4])
+        root_name = decode_name(*root_replies, name_atoms[1])
+        root_window = RootWindow.from_fields(hex(root), root_name)
+    tree.initialise_from_windows(source, root_window)
+    if borders is not None:
+        borders[source_id] = source_replies[0][4]
+    add_x11_subtrees(conn, tree, [(source, children)], event_mask, borders)
+    return tree
+
+
+def add_x11_subtrees(conn, tree, level_windows, event_mask=None, borders=None):
+    """
+    Add the windows below windows already in the tree (given as `(window, child_ids)`
+    pairs, with the child IDs in bottom-to-top stacking order as QueryTree lists them)
+    to the tree, one level at a time (see `build_x11_tree`, which takes the same
+    `event_mask` and `borders` arguments). Each window's children are appended to its
+    `children` (top of the stacking order first).
+    """
+    root = conn.root
+    name_atoms = conn.intern_atoms(["_NET_WM_NAME", "UTF8_STRING"])
+    n_reqs = 5 if event_mask is None else 6
+    id_index = tree.id_index
+    while level_windows:
+        # (parent, child level, child ID), with the top of each stacking order first
+        listed = [
+            (p, getattr(p, "level", 0) + 1, c)
+            for p, cs in level_windows
+            for c in reversed(cs)
+        ]
+        requests = [
+            req
+            for _, _, c in listed
+            for req in window_requests(c, root, name_atoms, event_mask)
+        ]
+        replies = conn.pipeline(requests)
+        level_windows = []
+        for i, (parent, level, win_id) in enumerate(listed):
+            geometry, abs_pos, net_name, wm_name, subtree = replies[
+                (i + 1) * n_reqs - 5 : (i + 1) * n_reqs
+            ]
+            if geometry is None or abs_pos is None or subtree is None:
+                # The window was destroyed after its parent's children were listed
+                continue
+            rel_x, rel_y, width, height, border = geometry
+            abs_x, abs_y = abs_pos[0] - border, abs_pos[1] - border
+            geom = WindowGeom.from_fields(width, height, abs_x, abs_y, rel_x, rel_y)
+            name = decode_name(net_name, wm_name, name_atoms[1])
+            child = ChildWindow.from_fields(hex(win_id), name, geom, level)
+            id_index[win_id] = child
+            if borders is not None:
+                borders[win_id] = border
+            parent.children.append(child)
+            if subtree[2]:
+                level_windows.append((child, subtree[2]))
+    return
+
+
+def window_requests(window, root, name_atoms, event_mask=None):
+    """
+    The requests `build_x11_tree` makes for each window: its geometry, its position
+    on the root window, its name (`name_atoms` are the `_NET_WM_NAME` and UTF8_STRING
+    atoms), and its children, preceded by a `select_input` if `event_mask` is given.
+    """
+    net_wm_name, utf8_string = name_atoms
+    requests = [
+        get_geometry(window),
+        translate_coordinates(window, root),
+        get_property(window, net_wm_name, utf8_string),
+        get_property(window, ATOM_WM_NAME),
+        query_tree(window),
+    ]
+    if event_mask is not None:
+        requests.insert(0, select_input(window, event_mask))
+    return requests
@@ -0,0 +1,292 @@
+from copy import deepcopy
+from struct import unpack_from
+from pyxsys.x11 import X11Connection, build_x11_tree, add_x11_subtrees
+from pyxsys.x11 import select_input, get_property, query_tree, decode_name
+from pyxsys.x11 import ATOM_WM_NAME, SUBSTRUCTURE_NOTIFY_MASK, PROPERTY_CHANGE_MASK
+from pyxsys.x11 import CREATE_NOTIFY, DESTROY_NOTIFY, REPARENT_NOTIFY
+from pyxsys.x11 import CONFIGURE_NOTIFY, GRAVITY_NOTIFY, CIRCULATE_NOTIFY
+from pyxsys.x11 import PROPERTY_NOTIFY
+from pyxsys.xw.tree import CompactWindowTree
+from pyxsys.xw.window import ChildWindow, WindowGeom
+
+LIVE_EVENT_MASK = SUBSTRUCTURE_NOTIFY_MASK | PROPERTY_CHANGE_MASK
+
+
+class LiveWindowTree(object):
+    """
+    Keep a WindowTree of the X server's root window up to date from X events, rather
+    than reading the whole tree again for each snapshot.
+
+    The tree is read once (see `pyxsys.x11⠶build_x11_tree`), selecting
+    SubstructureNotify and PropertyChange events on every window as it goes, and the
+    events are then applied to the tree as they arrive: windows are added, removed,
+    reparented, moved, resized, and restacked, and renamed when their `_NET_WM_NAME`
+    or `WM_NAME` changes.
+    Windows created later have events selected on them too (and their names and any
+    children they already have are read in one pipelined batch per refresh).
+
+    Events are only read from the X server on `refresh` (or `wait`), so the tree is as
+    of the last call to either.
+    """
+
+    def __init__(self, display=None):
+        self._conn = X11Connection(display)
+        self._borders = {}
+        self._tree = build_x11_tree(
+            self._conn, event_mask=LIVE_EVENT_MASK, borders=self._borders
+        )
+        self._name_atoms = self._conn.intern_atoms(["_NET_WM_NAME", "UTF8_STRING"])
+        self._parents = {}
+        for _, window in self.tree.iter_depth_first():
+            win_id = int(window.win_id, 16)
+            self._parents.update({int(c.win_id, 16): win_id for c in window.children})
+        self._new_windows = []
+        self._renamed_windows = set()
+        self.refresh()
+        return
+
+    def __repr__(self):
+        return f"LiveWindowTree of {len(self._parents) + 1} windows ({self._conn})"
+
+    @property
+    def tree(self):
+        return self._tree
+
+    def snapshot(self, compact=True):
+        """
+        Apply any pending events and return a copy of the tree as it now is, which is
+        not changed by later events (a CompactWindowTree unless `compact` is False).
+        """
+        self.refresh()
+        if compact:
+            return CompactWindowTree(self.tree)
+        return deepcopy(self.tree)
+
+    def refresh(self, timeout=0):
+        """
+        Apply the events received from the X server since the last refresh (waiting up
+        to `timeout` seconds, or indefinitely if None, if there are none yet), and
+        return the number of events applied.
+        """
+        n_applied = 0
+        events = self._conn.poll_events(timeout)
+        while events:
+            for event in events:
+                self.apply_event(event)
+            n_applied += len(events)
+            self.read_pending()
+            # Reading new windows and names may have received more events
+            events = self._conn.poll_events()
+        return n_applied
+
+    def wait(self, timeout=None):
+        """
+        Block until at least one event has been applied to the tree (or `timeout`
+        seconds have passed) and return the number of events applied.
+        """
+        return self.refresh(timeout)
+
+    def watch(self):
+        """
+        Yield the tree each time a batch of events has been applied to it (runs
+        indefinitely).
+        """
+        while True:
+            if self.wait():
+                yield self.tree
+
+    def apply_event(self, event):
+        """
+        Apply an event (a raw 32 byte packet) to the tree. Events for windows not in
+        the tree, and events which have already been applied (as ReparentNotify is
+        reported to both the old and the new parent), are ignored.
+        """
+        code = event[0] & 0x7F
+        if code == CREATE_NOTIFY:
+            parent_id, win_id, x, y, width, height, border = unpack_from(
+                "<4xIIhhHHH", event
+            )
+            self.add_window(parent_id, win_id, x, y, width, height, border)
+        elif code == DESTROY_NOTIFY:
+            _, win_id = unpack_from("<4xII", event)
+            self.remove_window(win_id)
+        elif code == REPARENT_NOTIFY:
+            _, win_id, parent_id, x, y = unpack_from("<4xIIIhh", event)
+            self.reparent_window(win_id, parent_id, x, y)
+        elif code == CONFIGURE_NOTIFY:
+            _, win_id, above_id, x, y, width, height, border = unpack_from(
+                "<4xIIIhhHHH", event
+            )
+            self.configure_window(win_id, x, y, width, height, border)
+            self.restack_window(win_id, above_id)
+        elif code == GRAVITY_NOTIFY:
+            _, win_id, x, y = unpack_from("<4xIIhh", event)
+            self.configure_window(win_id, x, y)
+        elif code == CIRCULATE_NOTIFY:
+            _, win_id, _, place = unpack_from("<4xIIIB", event)
+            self.restack_window(win_id, None, on_top=place == 0)
+        elif code == PROPERTY_NOTIFY:
+            win_id, atom = unpack_from("<4xII", event)
+            if atom in (ATOM_WM_NAME, self._name_atoms[0]):
+                self._renamed_windows.add(win_id)
+        return
+
+    def inner_origin(self, win_id):
+        """
+        The position on the root window of the inside of a window's border (which its
+        children's positions are relative to).
+        """
+        window = self.tree.get_window(win_id)
+        border = self._borders.get(win_id, 0)
+        if window.geom is None:
+            return border, border
+        return window.geom.abs_x + border, window.geom.abs_y + border
+
+    def add_window(self, parent_id, win_id, x, y, width, height, border):
+        parent = self.tree.get_window(parent_id)
+        if parent is None or self.tree.get_window(win_id) is not None:
+            return
+        origin_x, origin_y = self.inner_origin(parent_id)
+        abs_x, abs_y = origin_x + x, origin_y + y
+        geom = WindowGeom.from_fields(width, height, abs_x, abs_y, x, y)
+        level = getattr(parent, "level", 0) + 1
+        window = ChildWindow.from_fields(hex(win_id), None, geom, level)
+        # New windows go on top of their siblings' stacking order (listed first)
+        parent.children.insert(0, window)
+        self.tree.id_index[win_id] = window
+        self._parents[win_id] = parent_id
+        self._borders[win_id] = border
+        self._new_windows.append(win_id)
+        return
+
+    def remove_window(self, win_id):
+        window = self.tree.get_window(win_id)
+        if window is None or win_id not in self._parents:
+            return
+        parent = self.tree.get_window(self._parents[win_id])
+        parent.children.remove(window)
+        for _, w in self.tree.iter_depth_first(window):
+            w_id = int(w.win_id, 16)
+            del self.tree.id_index[w_id]
+            del self._parents[w_id]
+            self._borders.pop(w_id, None)
+            self._renamed_windows.discard(w_id)
+        return
+
+    def reparent_window(self, win_id, parent_id, x, y):
+        window = self.tree.get_window(win_id)
+        parent = self.tree.get_window(parent_id)
+        if window is None or parent is None or self._parents.get(win_id) == parent_id:
+            return
+        old_parent = self.tree.get_window(self._parents[win_id])
+        old_parent.children.remove(window)
+        parent.children.insert(0, window)
+        self._parents[win_id] = parent_id
+        level = getattr(parent, "level", 0) + 1
+        for depth, w in self.tree.iter_depth_first(window):
+            w.level = level + depth
+        self.configure_window(win_id, x, y)
+        return
+
+    def configure_window(self, win_id, x, y, width=None, height=None, border=None):
+        """
+        Move (and resize, if `width` and `height` are given) a window to `(x, y)` in
+        its parent, moving every window below it on the root window by as much.
+        """
+        window = self.tree.get_window(win_id)
+        if window is None or win_id not in self._parents:
+            return
+        geom = window.geom
+        old_x, old_y = self.inner_origin(win_id)
+        origin_x, origin_y = self.inner_origin(self._parents[win_id])
+        geom.rel_x, geom.rel_y = x, y
+        geom.abs_x, geom.abs_y = origin_x + x, origin_y + y
+        if width is not None:
+            geom.width, geom.height = width, height
+        if border is not None:
+            self._borders[win_id] = border
+        new_x, new_y = self.inner_origin(win_id)
+        dx, dy = new_x - old_x, new_y - old_y
+        if dx or dy:
+            for depth, w in self.tree.iter_depth_first(window):
+                if depth > 0:
+                    w.geom.abs_x += dx
+                    w.geom.abs_y += dy
+        return
+
+    def restack_window(self, win_id, above_id, on_top=False):
+        """
+        Move a window in its parent's children to directly above the sibling with ID
+        `above_id` (to the bottom if it is 0, or to the top if `on_top` is True).
+        """
+        window = self.tree.get_window(win_id)
+        if window is None or win_id not in self._parents:
+            return
+        siblings = self.tree.get_window(self._parents[win_id]).children
+        siblings.remove(window)
+        above = None if above_id is None else self.tree.get_window(above_id)
+        if on_top:
+            siblings.insert(0, window)
+        elif above is None or above not in siblings:
+            siblings.append(window)
+        else:
+            siblings.insert(siblings.index(above), window)
+        return
+
+    def read_pending(self):
+        """
+        In one pipelined batch, select events on the windows created since the last
+        call (and list any children they already have), and read the names of them and
+        the windows whose name properties have changed. Any children are then added
+        (see `pyxsys.x11⠶add_x11_subtrees`).
+        """
+        new_ids = [w for w in self._new_windows if self.tree.get_window(w) is not None]
+        renamed_ids = [w for w in self._renamed_windows if w not in new_ids]
+        self._new_windows, self._renamed_windows = [], set()
+        net_wm_name, utf8_string = self._name_atoms
+        requests = []
+        for win_id in new_ids:
+            requests.append(select_input(win_id, LIVE_EVENT_MASK))
+            requests.append(query_tree(win_id))
+        for win_id in new_ids + renamed_ids:
+            requests.append(get_property(win_id, net_wm_name, utf8_string))
+            requests.append(get_property(win_id, ATOM_WM_NAME))
+        if not requests:
+            return
+        replies = self._conn.pipeline(requests)
+        subtrees = replies[1 : 2 * len(new_ids) : 2]
+        names = replies[2 * len(new_ids) :]
+        level_windows = []
+        for win_id, subtree in zip(new_ids, subtrees):
+            window = self.tree.get_window(win_id)
+            if subtree is None or window is None:
+                continue
+            children = [c for c in subtree[2] if self.tree.get_window(c) is None]
+            if children:
+                level_windows.append((window, children))
+        for i, win_id in enumerate(new_ids + renamed_ids):
+            window = self.tree.get_window(win_id)
+            if window is not None:
+                window.name = decode_name(*names[2 * i : 2 * i + 2], utf8_string)
+        if level_windows:
+            add_x11_subtrees(
+                self._conn, self.tree, level_windows, LIVE_EVENT_MASK, self._borders
+            )
+            for parent, _ in level_windows:
+                for _, window in self.tree.iter_depth_first(parent):
+                    parent_id = int(window.win_id, 16)
+                    self._parents.update(
+                        {int(c.win_id, 16): parent_id for c in window.children}
+                    )
+        return
+
+    def close(self):
+        self._conn.close()
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return
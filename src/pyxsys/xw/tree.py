@@ -1,8 +1,15 @@
-from pyxsys.xw.window import ChildWindow, RootWindow, SourceWindow
-from colours import colour_str
+from array import array
+from bisect import bisect_left
+from collections import deque
+from pyxsys.xw.window import ChildWindow, RootWindow, SourceWindow, WindowView
+from pyxsys.strings import StringTable
+from pyxsys.spatial import SpatialIndex
+from pyxsys.colours import colour_str
 
 
 class WindowTree(object):
+    _id_index = None  # Also the value for trees restored from older pickles
+
     def __init__(self):
         """
         Each call to `xwininfo -tree` will return:
@@ -26,6 +33,7 @@ class WindowTree(object):
         self._open_path = None
         self._deepest_open_level = None
         self._indent_step_size = 3
+        self._id_index = {}
         return
 
     def __repr__(self):
@@ -49,6 +57,40 @@ class WindowTree(object):
         self._source = source_node
         return
 
+    @property
+    def id_index(self):
+        """
+        A dict of every window in the tree (from the source down) keyed by its integer
+        window ID, which is filled in as the tree is built (or built on first access,
+        for trees unpickled from before it existed).
+        """
+        if self._id_index is None:
+            self._id_index = {int(self.source.win_id, 16): self.source}
+            for children in self.walk():
+                self._id_index.update({int(w.win_id, 16): w for w in children})
+        return self._id_index
+
+    def get_window(self, win_id):
+        """
+        Look up a window in the tree by its ID, given as an integer or a hexadecimal
+        string (which may be zero-padded, as by wmctrl), returning None if absent.
+        """
+        if isinstance(win_id, str):
+            win_id = int(win_id, 16)
+        return self.id_index.get(win_id)
+
+    def spatial_index(self, desktop_number=None, start_node=None):
+        """
+        Build a SpatialIndex of the windows below the start node (by default the source)
+        by their absolute geometry, for point, region, and nearest window queries. If
+        `desktop_number` is given, only the windows marked as on that workspace (see
+        `pyxsys.wm.territory⠶WorkspaceTerritory.xref_x_session`) are indexed.
+        """
+        windows = (w for _, w in self.iter_depth_first(start_node))
+        if desktop_number is not None:
+            windows = (w for w in windows if w.desktop_number == desktop_number)
+        return SpatialIndex.from_items(windows, window_geom_rect)
+
     @property
     def source_initialised(self):
         return self._source_initialised
@@ -56,7 +98,8 @@ class WindowTree(object):
     def initialise_source(self, source_line):
         self.source = SourceWindow(source_line)
         assert self.open_path is None, "Expected no open path on uninitialised tree"
-        self.open_path = TreePath([self.source])
+        self.id_index[int(self.source.win_id, 16)] = self.source
+        self.open_path = TreePath([self.source], self.id_index)
         self._source_initialised = True
         return
 
@@ -71,6 +114,20 @@ class WindowTree(object):
         self._root_initialised = True
         return
 
+    def initialise_from_windows(self, source, root):
+        """
+        Initialise the source and root of the tree from windows read from the X server
+        directly (see `pyxsys.x11⠶build_x11_tree`), instead of from xwininfo output.
+        """
+        assert self.open_path is None, "Expected no open path on uninitialised tree"
+        self.source = source
+        self.id_index[int(self.source.win_id, 16)] = self.source
+        self.open_path = TreePath([self.source], self.id_index)
+        self._source_initialised = True
+        self.root = root
+        self._root_initialised = True
+        return
+
     @property
     def root_indent_offset(self):
         return self._root_indent_offset
@@ -102,11 +159,13 @@ class WindowTree(object):
     def indent_step_size(self):
         return self._indent_step_size
 
-    def show_outline(self):
+    def show_outline(self, file=None):
         """
-        Print the outline view.
+        Print the outline view, one line at a time as it is rendered (to `file`, which
+        is by default `sys.stdout`).
         """
-        print(self.outline)
+        for line in self.iter_outline_lines():
+            print(line, file=file)
         return
 
     @property
@@ -116,18 +175,56 @@ class WindowTree(object):
         Unlike the __repr__, just show the hierarchy of windows and IDs,
         as in a file viewer. Printable using the function show_outline.
         """
-        dot_dash_outline = self.dot_dash_outline(self.source)
-        box_outline = self.parse_dot_dash_outline_to_box_outline(dot_dash_outline)
-        return box_outline
+        return "\n".join(self.iter_outline_lines())
+
+    def iter_outline_lines(self, start_node=None):
+        """
+        Generate the lines of the box outline view below the start node (by default the
+        source), in a single depth-first pass that draws each line's box characters as
+        it goes, rather than via `dot_dash_outline`. Only the child lists of the windows
+        on the current branch are held (with the prefix drawn for each level).
+        """
+        if start_node is None:
+            start_node = self.source
+        yield self.outline_label(start_node)
+        stack = [(start_node.children, 0, "")]
+        while stack:
+            children, i, prefix = stack[-1]
+            if i == len(children):
+                stack.pop()
+                continue
+            stack[-1] = (children, i + 1, prefix)
+            child = children[i]
+            is_last = i == len(children) - 1
+            connector = "┗━" if is_last else "┣━"
+            yield f"{prefix}{connector}{self.outline_label(child)}"
+            grandchildren = child.children
+            if grandchildren:
+                sub_prefix = prefix + ("  " if is_last else "┃ ")
+                stack.append((grandchildren, 0, sub_prefix))
+
+    @staticmethod
+    def outline_label(window):
+        name = window.name
+        if name is None:
+            name = "(unnamed)"
+        if window.desktop_number is not None:
+            name += colour_str("green", f" ⠶ workspace {window.desktop_number}")
+        return name
 
     @staticmethod
     def show_numbered_hierarchy(root, indent="0"):
-        root_name = root.name
-        if root_name is None:
-            root_name = "(unnamed)"
-        print(" ".join([indent, root_name]))
-        for i, c in enumerate(root.children, 0):
-            WindowTree.show_numbered_hierarchy(c, "".join((" ", indent, ".", str(i))))
+        stack = [(root, indent)]
+        while stack:
+            node, node_indent = stack.pop()
+            node_name = node.name
+            if node_name is None:
+                node_name = "(unnamed)"
+            print(" ".join([node_indent, node_name]))
+            stack.extend(
+                (c, "".join((" ", node_indent, ".", str(i))))
+                for i, c in reversed(list(enumerate(node.children, 0)))
+            )
         return
 
     @staticmethod
@@ -138,20 +235,14 @@ class WindowTree(object):
         by an underscore or a dash (respectively).
         """
         outline = []
-        root_name = root.name
-        if root_name is None:
-            root_name = "(unnamed)"
-        if root.desktop_number is not None:
-            d_num_coloured = colour_str("green", f" ⠶ workspace {root.desktop_number}")
-            root_name += d_num_coloured
-        outline.append(" ".join([indent, root_name]))
-        for i, child in enumerate(root.children, 0):
-            if i == len(root.children) - 1:
-                joiner = "-"
-            else:
-                joiner = "_"
-            sub_indent = "".join((joiner, indent, ".", str("")))
-            outline.append(WindowTree.dot_dash_outline(child, sub_indent))
+        stack = [(root, indent)]
+        while stack:
+            node, node_indent = stack.pop()
+            outline.append(" ".join([node_indent, WindowTree.outline_label(node)]))
+            children = node.children
+            for i in reversed(range(len(children))):
+                joiner = "-" if i == len(children) - 1 else "_"
+                stack.append((children[i], "".join((joiner, node_indent, "."))))
         return "\n".join(outline)
 
     @staticmethod
@@ -219,14 +310,187 @@ class WindowTree(object):
 
     def walk(self, start_node=None):
         """
-        Recursive walk from the start_node (by default, the source node) by iterating
-        through the 'children' attribute at each step [depth-first not breadth-first].
+        Walk from the start_node (by default, the source node) yielding the 'children'
+        attribute of each node in turn [depth-first not breadth-first].
+        """
+        if start_node is None:
+            start_node = self.source
+        stack = [start_node]
+        while stack:
+            children = stack.pop().children
+            yield children
+            stack.extend(reversed(children))
+
+    def iter_depth_first(self, start_node=None, descend=None):
+        """
+        Iterate depth-first over `(depth, window)` for the start node (by default, the
+        source node, at depth 0) and every window below it, in the order of the outline.
+        If `descend` is given, a window's children are only visited if `descend(window)`
+        is True.
+        """
+        if start_node is None:
+            start_node = self.source
+        stack = [(0, start_node)]
+        while stack:
+            depth, window = stack.pop()
+            yield depth, window
+            if descend is None or descend(window):
+                stack.extend((depth + 1, c) for c in reversed(window.children))
+
+    def iter_breadth_first(self, start_node=None, descend=None):
+        """
+        Iterate breadth-first (level by level) over `(depth, window)` for the start node
+        (by default, the source node, at depth 0) and every window below it. If
+        `descend` is given, a window's children are only visited if `descend(window)`
+        is True.
         """
         if start_node is None:
             start_node = self.source
-        yield start_node.children
-        for c in start_node.children:
-            yield from self.walk(start_node=c)
+        queue = deque([(0, start_node)])
+        while queue:
+            depth, window = queue.popleft()
+            yield depth, window
+            if descend is None or descend(window):
+                queue.extend((depth + 1, c) for c in window.children)
+
+    def iter_filtered(
+        self, predicate, start_node=None, breadth_first=False, descend=None
+    ):
+        """
+        Iterate over the windows for which `predicate(window)` is True, from the start
+        node down (depth-first unless `breadth_first` is True, and only below windows
+        for which `descend(window)` is True, if given).
+        """
+        if breadth_first:
+            traversal = self.iter_breadth_first(start_node, descend)
+        else:
+            traversal = self.iter_depth_first(start_node, descend)
+        for _, window in traversal:
+            if predicate(window):
+                yield window
+
+
+def window_geom_rect(window):
+    """
+    The `(x, y, width, height)` of a window on the root window (None if it has no
+    geometry, as for the source of the tree).
+    """
+    g = window.geom
+    if g is None:
+        return None
+    return g.abs_x, g.abs_y, g.width, g.height
+
+
+class CompactWindowTree(WindowTree):
+    """
+    A compact, read-only copy of a WindowTree, storing its windows as columns (arrays)
+    in depth-first order rather than as Window objects: the integer window IDs, the
+    index of each window's parent, first child, and next sibling, its level, its name
+    (as an index into a StringTable), and its geometry (six ints per window, with a
+    width of -1 for no geometry). The source is at index 0, and windows are accessed
+    as WindowView objects (which have the API of a Window).
+
+    A StringTable can be shared between many trees (e.g. a history of the same X
+    session), so that each window name is stored once for all of them.
+    """
+
+    def __init__(self, tree, strings=None):
+        super(CompactWindowTree, self).__init__()
+        self._id_index = None
+        self._strings = StringTable() if strings is None else strings
+        self._ids = array("I")
+        self._parents = array("i")
+        self._first_child = array("i")
+        self._next_sibling = array("i")
+        self._levels = array("H")
+        self._names = array("i")
+        self._geoms = array("i")
+        self._desktop_numbers = {}  # Sparse: only set once cross-referenced with wmctrl
+        self.root = tree.root
+        self._source_parent = getattr(tree.source, "parent", None)
+        last_child = {}  # The index of the last child added so far to each parent
+        stack = [(tree.source, -1)]
+        while stack:
+            window, parent_i = stack.pop()
+            i = self.add_window(window, parent_i)
+            if parent_i >= 0:
+                prev_i = last_child.get(parent_i)
+                if prev_i is None:
+                    self._first_child[parent_i] = i
+                else:
+                    self._next_sibling[prev_i] = i
+                last_child[parent_i] = i
+            stack.extend((child, i) for child in reversed(window.children))
+        # Node indices sorted by window ID, to look windows up by bisection
+        self._id_order = array("i", sorted(range(len(self)), key=self._ids.__getitem__))
+        self._sorted_ids = array("I", [self._ids[i] for i in self._id_order])
+        self._source_initialised = self._root_initialised = True
+        return
+
+    def __repr__(self):
+        return f"CompactWindowTree of {len(self)} windows (rooted at {self.root})"
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add_window(self, window, parent_i):
+        i = len(self._ids)
+        self._ids.append(int(window.win_id, 16))
+        self._parents.append(parent_i)
+        self._first_child.append(-1)
+        self._next_sibling.append(-1)
+        self._levels.append(0 if parent_i < 0 else self._levels[parent_i] + 1)
+        name = window.name
+        self._names.append(-1 if name is None else self.strings.intern(name))
+        g = window.geom
+        if g is None:
+            self._geoms.extend((-1, -1, 0, 0, 0, 0))
+        else:
+            self._geoms.extend((g.width, g.height, g.abs_x, g.abs_y, g.rel_x, g.rel_y))
+        if window.desktop_number is not None:
+            self._desktop_numbers[i] = window.desktop_number
+        return i
+
+    @property
+    def strings(self):
+        return self._strings
+
+    @property
+    def source(self):
+        return WindowView(self, 0)
+
+    @property
+    def source_parent(self):
+        return self._source_parent
+
+    def __getstate__(self):
+        # The ID index is made again when needed rather than stored in pickles
+        return {**self.__dict__, "_id_index": None}
+
+    @property
+    def id_index(self):
+        """
+        A dict of views of every window in the tree keyed by its integer window ID,
+        made on first access and kept (as the tree is read-only, it never goes out of
+        date). Use `get_window` for single lookups, which doesn't need it.
+        """
+        if self._id_index is None:
+            self._id_index = {
+                win_id: WindowView(self, i) for i, win_id in enumerate(self._ids)
+            }
+        return self._id_index
+
+    def get_window(self, win_id):
+        """
+        Look up a window in the tree by its ID, given as an integer or a hexadecimal
+        string (which may be zero-padded, as by wmctrl), returning None if absent.
+        """
+        if isinstance(win_id, str):
+            win_id = int(win_id, 16)
+        pos = bisect_left(self._sorted_ids, win_id)
+        if pos == len(self._sorted_ids) or self._sorted_ids[pos] != win_id:
+            return None
+        return WindowView(self, self._id_order[pos])
 
 
 class TreePath(list):
@@ -234,10 +498,14 @@ class TreePath(list):
     Class listing the levels down a particular branch of a tree, to be used to keep
     track of which 'path' has been 'opened' when adding descendants from a source node.
     For conciseness, store only the ID of each window on the branch, given as a list.
+
+    If an `id_index` (the `WindowTree.id_index` dict) is given, each window added to
+    the path is also added to it (keyed by its integer window ID).
     """
 
-    def __init__(self, window_list):
+    def __init__(self, window_list, id_index=None):
         assert len(window_list) > 0, "Cannot create TreePath from empty window list"
+        self._id_index = id_index
         self.extend(window_list)
         self._deepest_level = len(self) - 1
         self._deepest_node = self[-1]
@@ -310,6 +578,7 @@ class TreePath(list):
         # assert Window in type(extension_window).mro(), "TreePath.deepen takes a Window"
         self.deepest_node.add_children([extension_window])
         self.extend([extension_window])
+        self.index_window(extension_window)
         return
 
     def continue_level(self, sibling_window_line):
@@ -326,6 +595,12 @@ class TreePath(list):
         self.deepest_parent.add_children([extension_window])
         self.pop()
         self.extend([extension_window])
+        self.index_window(extension_window)
+        return
+
+    def index_window(self, window):
+        if self._id_index is not None:
+            self._id_index[int(window.win_id, 16)] = window
         return
 
     def retract_levels(self, n_levels):
@@ -1,4 +1,8 @@
 class Window(object):
+    # Set by `pyxsys.visibility⠶compute_visibility` (None until it is run)
+    _visible_area = None
+    _occlusion = None
+
     def __init__(self, win_id, name, geom=None, d_num=None):
         self.win_id = win_id
         self.name = name
@@ -37,6 +41,20 @@ class Window(object):
             d_num_r += f", desktop {self.desktop_number}"
         return f"{type(self).__name__}{id_r}{name_r}{level_r}{child_r}{d_num_r}"
 
+    @classmethod
+    def from_fields(cls, win_id, name, geom=None, d_num=None):
+        """
+        Create a window of this class from already-parsed fields (rather than a line of
+        xwininfo output), skipping the window ID check in the property setter.
+        """
+        win = cls.__new__(cls)
+        win._win_id = win_id
+        win._name = name
+        win._geom = geom
+        win._children = []
+        win._desktop_number = d_num
+        return win
+
     @staticmethod
     def check_id(win_id):
         assert win_id.startswith("0x"), "Window ID is not a hexadecimal"
@@ -97,12 +115,33 @@ class Window(object):
         self._desktop_number = d_num
         return
 
+    @property
+    def visible_area(self):
+        return self._visible_area
+
+    @visible_area.setter
+    def visible_area(self, area):
+        self._visible_area = area
+        return
+
+    @property
+    def occlusion(self):
+        return self._occlusion
+
+    @occlusion.setter
+    def occlusion(self, fraction):
+        self._occlusion = fraction
+        return
+
 
 class WindowGeom(object):
     """
     TODO: structure this class to represent window geometry (for now it only applies
     to the SubnodeDesc class, which is given on the lines of xwininfo output which
     describe the children of another node, so no need to add to base Window class).
+
+    The absolute position is relative to the root window, and the relative position
+    is relative to the window's parent (all values are integers).
     """
 
     def __init__(self, width, height, abs_x, abs_y, rel_x, rel_y):
@@ -114,6 +153,33 @@ class WindowGeom(object):
         self.rel_y = rel_y
         return
 
+    def __repr__(self):
+        return f"{self.width}x{self.height} at ({self.abs_x}, {self.abs_y})"
+
+    @classmethod
+    def from_fields(cls, width, height, abs_x, abs_y, rel_x, rel_y):
+        """
+        Create a WindowGeom without going through the property setters.
+        """
+        geom = cls.__new__(cls)
+        geom._width = width
+        geom._height = height
+        geom._abs_x = abs_x
+        geom._abs_y = abs_y
+        geom._rel_x = rel_x
+        geom._rel_y = rel_y
+        return geom
+
+    def __setstate__(self, state):
+        # Trees pickled before geometry was parsed to integers hold xwininfo's strings,
+        # with the parent-relative position stored as absolute and vice versa
+        if isinstance(state.get("_width"), str):
+            state = {k: int(v) for k, v in state.items()}
+            state["_abs_x"], state["_rel_x"] = state["_rel_x"], state["_abs_x"]
+            state["_abs_y"], state["_rel_y"] = state["_rel_y"], state["_abs_y"]
+        self.__dict__.update(state)
+        return
+
     @property
     def width(self):
         return self._width
@@ -253,11 +319,16 @@ class SubnodeDesc(Window):
 
     @staticmethod
     def parse_geomline(line):
-        w_h_abs, rel = line.lstrip().split()
-        width = w_h_abs.split("x")[0]
-        height, abs_x, abs_y = w_h_abs.split("x")[1].split("+")
-        rel_x, rel_y = rel.split("+")[-2:]
-        return width, height, abs_x, abs_y, rel_x, rel_y
+        """
+        The geometry is given as `WxH+X+Y  +AX+AY`, where X and Y are relative to the
+        parent window and AX and AY are absolute (i.e. relative to the root window).
+        """
+        w_h_rel, abs_pos = line.lstrip().split()
+        width = w_h_rel.split("x")[0]
+        height, rel_x, rel_y = w_h_rel.split("x")[1].split("+")
+        abs_x, abs_y = abs_pos.split("+")[-2:]
+        geom = map(int, (width, height, abs_x, abs_y, rel_x, rel_y))
+        return tuple(geom)
 
 
 class ChildWindow(SubnodeDesc):
@@ -266,3 +337,82 @@ class ChildWindow(SubnodeDesc):
         self.level = level
         super(ChildWindow, self).__init__(line)
         return
+
+    @classmethod
+    def from_fields(cls, win_id, name, geom, level):
+        win = super(ChildWindow, cls).from_fields(win_id, name, geom)
+        win.level = level
+        return win
+
+
+class WindowView(Window):
+    """
+    A Window whose attributes are read from the columns of a CompactWindowTree (at the
+    node index `node_i`), rather than stored on it. Views are made on access, so two
+    views of the same window compare equal but are not the same object.
+    """
+
+    def __init__(self, tree, node_i):
+        self._tree = tree
+        self._node_i = node_i
+        if node_i > 0:
+            self.level = tree._levels[node_i]
+        return
+
+    def __eq__(self, other):
+        if not isinstance(other, WindowView):
+            return NotImplemented
+        return self._tree is other._tree and self._node_i == other._node_i
+
+    def __hash__(self):
+        return hash((id(self._tree), self._node_i))
+
+    @property
+    def win_id(self):
+        return hex(self._tree._ids[self._node_i])
+
+    @property
+    def name(self):
+        name_i = self._tree._names[self._node_i]
+        return None if name_i < 0 else self._tree.strings[name_i]
+
+    @property
+    def geom(self):
+        i = 6 * self._node_i
+        width, height, abs_x, abs_y, rel_x, rel_y = self._tree._geoms[i : i + 6]
+        if width < 0:
+            return None
+        return WindowGeom.from_fields(width, height, abs_x, abs_y, rel_x, rel_y)
+
+    @property
+    def children(self):
+        tree = self._tree
+        children = []
+        child_i = tree._first_child[self._node_i]
+        while child_i >= 0:
+            children.append(WindowView(tree, child_i))
+            child_i = tree._next_sibling[child_i]
+        return children
+
+    @property
+    def parent(self):
+        """
+        The parent window (for the tree's source this is the ParentWindow it was read
+        with, which is not itself in the tree).
+        """
+        parent_i = self._tree._parents[self._node_i]
+        if parent_i < 0:
+            return self._tree.source_parent
+        return WindowView(self._tree, parent_i)
+
+    @property
+    def desktop_number(self):
+        return self._tree._desktop_numbers.get(self._node_i)
+
+    @desktop_number.setter
+    def desktop_number(self, d_num):
+        if d_num is None:
+            self._tree._desktop_numbers.pop(self._node_i, None)
+        else:
+            self._tree._desktop_numbers[self._node_i] = d_num
+        return
@@ -1,23 +1,230 @@
-from subprocess import run
+import re
+from subprocess import run, Popen, PIPE
 from shutil import which
-from pyxsys.xw.tree import WindowTree
+from pyxsys.xw.tree import WindowTree, CompactWindowTree, TreePath
+from pyxsys.xw.window import ChildWindow, WindowGeom
+from pyxsys.x11 import read_client_windows
+from pyxsys.instrument import profiled, stage, count
 
+XWININFO_TREE_ARGS = ["xwininfo", "-tree", "-root"]
 
-def read_xwin_tree():
+# The header lines: the source window, then the root and parent windows (indented)
+HEADER_RE = re.compile(
+    r"\n*(xwininfo: .*)\n+( +Root window .*)\n( +Parent window .*)\n"
+)
+# A line of the tree, after its indent: either the count of a window's children (which
+# precedes its child lines), or a child window line: ID, name (unless it has none),
+# class hint in brackets, `WxH+X+Y` (relative to the parent), `+AX+AY` (absolute)
+TREE_LINE_RE = re.compile(
+    r"^( *)(?:\d+ child(?:ren)?:|(0x[0-9a-fA-F]+) "
+    r'(?:"(.*)"|\(has no name\)): \(.*\)'
+    r" +(\d+)x(\d+)\+(-?\d+)\+(-?\d+) +\+(-?\d+)\+(-?\d+))$\n?",
+    re.MULTILINE,
+)
+
+
+@profiled("read xwininfo")
+def read_xwin_tree(stream=True, compact=False, clients_only=False):
     """
-    Read the root tree from xwininfo into a Python dict.
+    Read the root tree from xwininfo into a WindowTree. If `stream` is True, the output
+    is parsed line by line as it is read from the pipe (while xwininfo is still making
+    its X requests), rather than read in full first, so the whole output is never held
+    in memory. Otherwise the output is parsed once xwininfo has exited.
+
+    If `compact` is True, the tree is returned as a CompactWindowTree. If `clients_only`
+    is True, only the client windows (see `pyxsys.x11⠶find_client_windows`) and the
+    windows on the path down to each of them (usually their window manager frames) are
+    kept, rather than every decoration, frame, and helper window.
     """
     assert which("xwininfo") is not None, "xwininfo not found, please install it"
-    result = run(["xwininfo", "-tree", "-root"], capture_output=True)
-    assert result.returncode == 0, f"xwininfo call failed.\n{result.stderr}"
-    tree = process_xwin_tree(result.stdout.decode())
+    client_ids = read_client_windows() if clients_only else None
+    if not stream:
+        with stage("run xwininfo"):
+            result = run(XWININFO_TREE_ARGS, capture_output=True)
+            count("bytes_read", len(result.stdout))
+        assert result.returncode == 0, f"xwininfo call failed.\n{result.stderr}"
+        tree = process_xwin_tree(result.stdout.decode(), client_ids)
+        if compact:
+            tree = CompactWindowTree(tree)
+        return tree
+    with Popen(XWININFO_TREE_ARGS, stdout=PIPE, stderr=PIPE, encoding="utf-8") as proc:
+        try:
+            tree = process_xwin_lines(proc.stdout, client_ids)
+        finally:
+            # Let xwininfo finish whether or not the parse succeeded, and report its
+            # error rather than the parse error (of its partial output) if it failed
+            proc.stdout.read()
+            err = proc.stderr.read()
+            proc.wait()
+            assert proc.returncode == 0, f"xwininfo call failed.\n{err}"
+    if compact:
+        tree = CompactWindowTree(tree)
     return tree
 
 
-def process_xwin_tree(tree_str):
+@profiled("parse xwininfo")
+def process_xwin_tree(tree_str, client_ids=None):
+    """
+    Structure the string output from xwininfo into a WindowTree in a single pass: the
+    header lines (the source, root, and parent windows) are matched by one compiled
+    pattern, then the lines of the tree by another, iterated over the whole string.
+    Child window fields come from the match groups, and their level from the indent.
+    Lines counting a window's children are skipped, and the tree ends at the first
+    line that doesn't match (a blank or unindented line).
+
+    If `client_ids` (a set of integer window IDs) is given, only those windows and the
+    windows on the path to each of them are added (see `add_client_tree_lines`).
+    """
+    header_match = HEADER_RE.match(tree_str)
+    assert header_match is not None, ValueError("Expected xwininfo tree header lines")
+    tree = init_xwin_tree(*header_match.groups())
+    line_matches = match_tree_lines(tree_str, header_match.end())
+    if client_ids is None:
+        add_tree_lines(tree, line_matches)
+    else:
+        add_client_tree_lines(tree, line_matches, client_ids)
+    count("windows", len(tree.id_index))
+    return tree
+
+
+@profiled("parse xwininfo lines")
+def process_xwin_lines(lines, client_ids=None):
+    """
+    Structure the output from xwininfo into a WindowTree as for `process_xwin_tree`,
+    but from an iterable of lines (such as a pipe opened in text mode) which are
+    consumed as they are parsed, stopping after the last line of the tree.
+    """
+    header_lines = []
+    for line in lines:
+        if line.strip():
+            header_lines.append(line.rstrip("\n"))
+            if len(header_lines) == 3:
+                break
+    assert len(header_lines) == 3, ValueError("Expected xwininfo tree header lines")
+    tree = init_xwin_tree(*header_lines)
+    line_matches = match_streamed_tree_lines(lines)
+    if client_ids is None:
+        add_tree_lines(tree, line_matches)
+    else:
+        add_client_tree_lines(tree, line_matches, client_ids)
+    count("windows", len(tree.id_index))
+    return tree
+
+
+def init_xwin_tree(source_line, root_line, parent_line):
+    """
+    Create a WindowTree from the header lines of xwininfo's output.
+    """
+    tree = WindowTree()
+    tree.initialise_source(source_line)
+    tree.initialise_root(root_line, len(root_line) - len(root_line.lstrip(" ")))
+    tree.source.assign_parent(parent_line)
+    return tree
+
+
+def match_tree_lines(tree_str, pos):
+    """
+    Match the lines of the tree from `pos` in the xwininfo output `tree_str` until the
+    first line which isn't a tree line (which must be a blank or unindented line).
+    """
+    for line_match in TREE_LINE_RE.finditer(tree_str, pos):
+        if line_match.start() != pos:
+            break
+        pos = line_match.end()
+        yield line_match
+    unparsed = tree_str[pos : pos + 80]
+    assert not unparsed.startswith(" "), ValueError(f"Unrecognised line: {unparsed}")
+    return
+
+
+def match_streamed_tree_lines(lines):
+    """
+    Match each line of the tree from an iterable of lines, as for `match_tree_lines`.
+    """
+    for line in lines:
+        line_match = TREE_LINE_RE.match(line)
+        if line_match is None:
+            assert not line.startswith(" "), ValueError(f"Unrecognised line: {line}")
+            return
+        yield line_match
+    return
+
+
+def add_tree_lines(tree, line_matches):
+    """
+    Add the child windows on the matched lines of the tree (the matches of
+    `TREE_LINE_RE`, in order) to the WindowTree. The open path of the tree is kept
+    as a list of windows indexed by level, so each child is added to its parent by
+    indexing rather than comparing levels. Each window is added to the tree's ID index.
+    """
+    offset = tree.root_indent_offset
+    step = tree.indent_step_size
+    id_index = tree.id_index
+    path = [tree.source]  # the open path, indexed by level
+    for line_match in line_matches:
+        indent, win_id, name, w, h, rel_x, rel_y, abs_x, abs_y = line_match.groups()
+        if win_id is None:
+            continue
+        level = (len(indent) - offset) // step
+        assert 0 < level <= len(path), ValueError(f"Unexpected indent at {win_id}")
+        geom = WindowGeom.from_fields(
+            int(w), int(h), int(abs_x), int(abs_y), int(rel_x), int(rel_y)
+        )
+        window = ChildWindow.from_fields(win_id, name, geom, level)
+        id_index[int(win_id, 16)] = window
+        path[level - 1].children.append(window)
+        del path[level:]
+        path.append(window)
+    tree.open_path = TreePath(path, id_index)
+    return
+
+
+def add_client_tree_lines(tree, line_matches, client_ids):
+    """
+    Add only the client windows (those whose integer IDs are in `client_ids`) on the
+    matched lines of the tree, and the windows on the path from the source to each of
+    them, to the WindowTree (as for `add_tree_lines`). The match groups of the windows
+    on the current branch are kept by level, and only turned into windows once a client
+    is found below them, so no window is created for any line with no client below it
+    (the children of clients are skipped too).
+    """
+    offset = tree.root_indent_offset
+    step = tree.indent_step_size
+    id_index = tree.id_index
+    branch = []  # the match groups of the current branch, indexed by level - 1
+    path = [tree.source]  # the windows created on the current branch, by level
+    for line_match in line_matches:
+        groups = line_match.groups()
+        indent, win_id = groups[:2]
+        if win_id is None:
+            continue
+        level = (len(indent) - offset) // step
+        valid_level = 0 < level <= len(branch) + 1
+        assert valid_level, ValueError(f"Unexpected indent at {win_id}")
+        del branch[level - 1 :]
+        branch.append(groups)
+        del path[level:]
+        if int(win_id, 16) not in client_ids:
+            continue
+        for _, b_id, name, w, h, rel_x, rel_y, abs_x, abs_y in branch[len(path) - 1 :]:
+            geom = WindowGeom.from_fields(
+                int(w), int(h), int(abs_x), int(abs_y), int(rel_x), int(rel_y)
+            )
+            window = ChildWindow.from_fields(b_id, name, geom, len(path))
+            id_index[int(b_id, 16)] = window
+            path[-1].children.append(window)
+            path.append(window)
+    tree.open_path = TreePath(path, id_index)
+    return
+
+
+def process_xwin_tree_linewise(tree_str):
     """
     Structure the string output from xwininfo such that indented lines (representing
     child nodes) become nested in OrderedDict collections.
+
+    This was the original implementation of `process_xwin_tree`, kept for comparison
+    (see `benchmarks/bench_xwininfo.py`).
     """
     tree_lines = tree_str.split("\n")
     tree = WindowTree()
@@ -0,0 +1,154 @@
+import os
+import socket
+import sys
+import threading
+from pathlib import Path
+from struct import pack
+
+import pytest
+
+# The package isn't installed, so import it from the source tree (as the benchmarks do)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+
+class CannedXServer(object):
+    """
+    The server end of a socket pair, which an X11Connection reads replies and events
+    from as if from an X server. Replies are written ahead of the requests they answer
+    (the requests themselves are never read), numbered by counting requests as an X
+    server does, so every request (with a reply or not) must be accounted for in order.
+    """
+
+    def __init__(self, sock):
+        self._sock = sock
+        self._seq = 0
+        return
+
+    @property
+    def seq(self):
+        return self._seq
+
+    @seq.setter
+    def seq(self, seq):
+        self._seq = seq
+        return
+
+    def write(self, data):
+        self._sock.sendall(data)
+        return
+
+    def setup(self, root, resource_id_base=0x400000, vendor=b"Canned"):
+        # Release, resource IDs, motion buffer size, vendor length, maximum request
+        # length, one screen, no formats, byte and bit orders, scanlines, keycodes
+        n = len(vendor)
+        body = pack("<IIIIHHBB10x", 0, resource_id_base, 0x1FFFFF, 0, n, 65535, 1, 0)
+        body += vendor + bytes(-n % 4)
+        # A screen with only its root window given (and no allowed depths)
+        body += pack("<I35xB", root, 0)
+        self.write(pack("<BxHHH", 1, 11, 0, len(body) // 4) + body)
+        return
+
+    def skip(self, n=1):
+        """
+        Account for `n` requests without a reply (e.g. `select_input`).
+        """
+        self._seq += n
+        return
+
+    def reply(self, data=1, fields=b"", extra=b""):
+        """
+        Write the reply to the next request: `data` is its second byte, `fields` the
+        rest of its first 32 bytes (after the header), `extra` its variable length part.
+        """
+        self._seq += 1
+        extra += bytes(-len(extra) % 4)
+        header = pack("<BBHI", 1, data, self._seq & 0xFFFF, len(extra) // 4)
+        self.write(header + fields.ljust(24, b"\0") + extra)
+        return
+
+    def reply_to_next_requests(self, write_replies):
+        """
+        Call `write_replies` (which writes replies with this server) on a thread once
+        the client sends its next requests, and return the thread. This is for replies
+        to requests sent after events are read, as replies written before then would be
+        read (and dropped) along with the events.
+        """
+        self._sock.setblocking(False)
+        try:
+            while self._sock.recv(65536):
+                # Discard the requests sent so far
+                pass
+        except BlockingIOError:
+            pass
+        self._sock.setblocking(True)
+
+        def reply_on_request():
+            self._sock.recv(65536)
+            write_replies()
+            return
+
+        thread = threading.Thread(target=reply_on_request, daemon=True)
+        thread.start()
+        return thread
+
+    def error(self, code=3):
+        """
+        Write an error (by default BadWindow) for the next request.
+        """
+        self._seq += 1
+        self.write(pack("<BBH28x", 0, code, self._seq & 0xFFFF))
+        return
+
+    def event(self, event):
+        self.write(event)
+        return
+
+    def query_tree(self, root, parent, children):
+        # Children are listed bottom-to-top, as the X server lists them
+        fields = pack("<IIH", root, parent, len(children))
+        self.reply(fields=fields, extra=pack(f"<{len(children)}I", *children))
+        return
+
+    def get_geometry(self, root, x, y, width, height, border=0):
+        self.reply(24, pack("<IhhHHH", root, x, y, width, height, border))
+        return
+
+    def translate_coordinates(self, x, y, child=0):
+        self.reply(1, pack("<Ihh", child, x, y))
+        return
+
+    def get_property(self, prop_type=None, fmt=8, value=b""):
+        """
+        Reply to GetProperty with a value of the type (or with no such property, if
+        `prop_type` is None), given as bytes for format 8 or a tuple of ints otherwise.
+        """
+        if prop_type is None:
+            self.reply(0, pack("<III", 0, 0, 0))
+            return
+        if fmt == 8:
+            n_items, extra = len(value), value
+        else:
+            code = "H" if fmt == 16 else "I"
+            n_items, extra = len(value), pack(f"<{len(value)}{code}", *value)
+        self.reply(fmt, pack("<III", prop_type, 0, n_items), extra)
+        return
+
+    def intern_atom(self, atom):
+        self.reply(fields=pack("<I", atom))
+        return
+
+
+@pytest.fixture
+def canned_x(monkeypatch):
+    """
+    Connect X11Connection to a CannedXServer (in place of the display's socket, and
+    without an Xauthority file), and return the server.
+    """
+    client_sock, server_sock = socket.socketpair()
+    client_sock.settimeout(5)
+    monkeypatch.setattr("pyxsys.x11.open_x11_socket", lambda *args: client_sock)
+    monkeypatch.setenv("XAUTHORITY", os.devnull)
+    yield CannedXServer(server_sock)
+    client_sock.close()
+    server_sock.close()
+    return
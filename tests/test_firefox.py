@@ -0,0 +1,44 @@
+"""
+Tests of reading the session files of Firefox profiles (`pyxsys.firefox`), written to
+a temporary directory rather than read from `~/.mozilla/firefox`.
+"""
+import pyxsys.firefox
+from pyxsys.firefox import FirefoxInstall, read_all_sessions
+from pyxsys.lz4 import write_jsonlz4
+
+SESSION_JSON = {
+    "version": ["sessionrestore", 1],
+    "windows": [],
+    "selectedWindow": 0,
+    "session": {"lastUpdate": 1600000000000, "startTime": 1600000000000},
+}
+
+
+def make_install(tmp_path, install_hash, session_bytes=None):
+    """
+    A FirefoxInstall whose profile has a recovery file of `session_bytes` (by default
+    `SESSION_JSON` as written by Firefox), or none if `session_bytes` is False.
+    """
+    profile_dir = tmp_path / install_hash
+    backups_dir = profile_dir / "sessionstore-backups"
+    backups_dir.mkdir(parents=True)
+    recovery_path = backups_dir / "recovery.jsonlz4"
+    if session_bytes is None:
+        write_jsonlz4(recovery_path, SESSION_JSON)
+    elif session_bytes is not False:
+        recovery_path.write_bytes(session_bytes)
+    return FirefoxInstall(install_hash, profile_dir)
+
+
+def test_read_all_sessions_records_failed_profiles(tmp_path, monkeypatch):
+    installs = [
+        make_install(tmp_path, "GOOD"),
+        make_install(tmp_path, "CORRUPT", b"mozLz40\0" + bytes(4) + b"\xff"),
+        make_install(tmp_path, "NO_SESSION", False),
+        make_install(tmp_path, "ALSO_GOOD"),
+    ]
+    monkeypatch.setattr(pyxsys.firefox, "find_installs", lambda: installs)
+    sessions, failed = read_all_sessions()
+    assert sorted(sessions) == ["ALSO_GOOD", "GOOD"]
+    assert list(failed) == ["CORRUPT"]
+    assert isinstance(failed["CORRUPT"], ValueError)
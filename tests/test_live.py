@@ -0,0 +1,196 @@
+"""
+Tests of applying X events to a live window tree (`pyxsys.xw.live`), using events
+packed by hand: applied directly, or replayed over a connection by a CannedXServer
+(see `conftest`) rather than received from an X server.
+"""
+from struct import pack
+
+import pytest
+
+from pyxsys.x11 import ATOM_STRING, ATOM_WM_NAME
+from pyxsys.x11 import CREATE_NOTIFY, DESTROY_NOTIFY, REPARENT_NOTIFY
+from pyxsys.x11 import CONFIGURE_NOTIFY, CIRCULATE_NOTIFY, PROPERTY_NOTIFY
+from pyxsys.xw.live import LiveWindowTree
+from pyxsys.xwininfo import process_xwin_tree
+
+UTF8_STRING = 300  # Arbitrary atoms standing in for those interned by a connection
+NET_WM_NAME = 301
+
+# Three top-level windows, listed (as xwininfo lists children) from the top down
+XWININFO_TREE = """
+xwininfo: Window id: 0x6c9 (the root window) (has no name)
+
+  Root window id: 0x6c9 (the root window) (has no name)
+  Parent window id: 0x0 (none)
+     3 children:
+     0x1000000 "top": ()  100x100+0+0  +0+0
+     0x1000001 "middle": ()  100x100+10+10  +10+10
+     0x1000002 "bottom": ()  100x100+20+20  +20+20
+"""
+ROOT, TOP, MIDDLE, BOTTOM = 0x6C9, 0x1000000, 0x1000001, 0x1000002
+NEW = 0x1000003
+
+PLACE_ON_TOP = 0
+PLACE_ON_BOTTOM = 1
+
+
+@pytest.fixture
+def live_tree():
+    """
+    A LiveWindowTree of the windows in `XWININFO_TREE`, without a connection (so only
+    events applied with `apply_event` change it).
+    """
+    live = LiveWindowTree.__new__(LiveWindowTree)
+    live._tree = process_xwin_tree(XWININFO_TREE)
+    live._borders = {}
+    live._name_atoms = [NET_WM_NAME, UTF8_STRING]
+    live._parents = {w_id: ROOT for w_id in (TOP, MIDDLE, BOTTOM)}
+    live._new_windows = []
+    live._renamed_windows = set()
+    return live
+
+
+def create_notify(parent_id, win_id, x, y, width, height, border=0):
+    # Code, sequence number, parent, window, geometry, then override-redirect
+    fields = (parent_id, win_id, x, y, width, height, border, 0)
+    return pack("<BxHIIhhHHHB9x", CREATE_NOTIFY, 1, *fields)
+
+
+def destroy_notify(win_id, event_id=ROOT):
+    return pack("<BxHII20x", DESTROY_NOTIFY, 1, event_id, win_id)
+
+
+def reparent_notify(win_id, parent_id, x, y, event_id=ROOT):
+    # Code, sequence number, event window, window, parent, position, override-redirect
+    fields = (event_id, win_id, parent_id, x, y, 0)
+    return pack("<BxHIIIhhB11x", REPARENT_NOTIFY, 1, *fields)
+
+
+def configure_notify(win_id, above_id, x, y, width, height, border=0, event_id=ROOT):
+    # Code, sequence number, event window, window, sibling above, geometry, then
+    # override-redirect
+    fields = (event_id, win_id, above_id, x, y, width, height, border, 0)
+    return pack("<BxHIIIhhHHHB5x", CONFIGURE_NOTIFY, 1, *fields)
+
+
+def circulate_notify(win_id, place, event_id=ROOT):
+    # Code, sequence number, event window, window, an unused field, then the place
+    return pack("<BxHIIIB15x", CIRCULATE_NOTIFY, 1, event_id, win_id, 0, place)
+
+
+def property_notify(win_id, atom):
+    # Code, sequence number, window, atom, time, then the state (0 for a new value)
+    return pack("<BxHIIIB15x", PROPERTY_NOTIFY, 1, win_id, atom, 0, 0)
+
+
+def stacking_order(live):
+    return [int(w.win_id, 16) for w in live.tree.get_window(ROOT).children]
+
+
+def test_circulate_notify_place_on_bottom(live_tree):
+    live_tree.apply_event(circulate_notify(TOP, PLACE_ON_BOTTOM))
+    assert stacking_order(live_tree) == [MIDDLE, BOTTOM, TOP]
+
+
+def test_circulate_notify_place_on_top(live_tree):
+    live_tree.apply_event(circulate_notify(BOTTOM, PLACE_ON_TOP))
+    assert stacking_order(live_tree) == [BOTTOM, TOP, MIDDLE]
+
+
+def test_create_notify(live_tree):
+    live_tree.apply_event(create_notify(MIDDLE, NEW, 5, 6, 20, 30, border=1))
+    new = live_tree.tree.get_window(NEW)
+    assert new.level == 2
+    assert (new.geom.rel_x, new.geom.rel_y) == (5, 6)
+    assert (new.geom.abs_x, new.geom.abs_y) == (10 + 5, 10 + 6)
+    assert live_tree.tree.get_window(MIDDLE).children == [new]
+    assert live_tree._new_windows == [NEW]
+
+
+def test_destroy_notify(live_tree):
+    live_tree.apply_event(create_notify(MIDDLE, NEW, 5, 6, 20, 30))
+    live_tree.apply_event(destroy_notify(MIDDLE))
+    assert live_tree.tree.get_window(MIDDLE) is None
+    assert live_tree.tree.get_window(NEW) is None
+    assert stacking_order(live_tree) == [TOP, BOTTOM]
+
+
+def test_reparent_notify(live_tree):
+    live_tree.apply_event(reparent_notify(TOP, BOTTOM, 1, 2))
+    top = live_tree.tree.get_window(TOP)
+    assert live_tree.tree.get_window(BOTTOM).children == [top]
+    assert (top.level, top.geom.abs_x, top.geom.abs_y) == (2, 20 + 1, 20 + 2)
+    assert stacking_order(live_tree) == [MIDDLE, BOTTOM]
+
+
+def test_configure_notify_moves_and_restacks(live_tree):
+    live_tree.apply_event(create_notify(TOP, NEW, 5, 6, 20, 30))
+    # Move the top window by (+50, +60), and restack it directly above the bottom
+    live_tree.apply_event(configure_notify(TOP, BOTTOM, 50, 60, 80, 90))
+    top = live_tree.tree.get_window(TOP)
+    new = live_tree.tree.get_window(NEW)
+    assert (top.geom.abs_x, top.geom.abs_y, top.geom.width) == (50, 60, 80)
+    assert (new.geom.abs_x, new.geom.abs_y) == (55, 66)
+    assert stacking_order(live_tree) == [MIDDLE, TOP, BOTTOM]
+
+
+def test_property_notify_renames(live_tree):
+    live_tree.apply_event(property_notify(TOP, ATOM_WM_NAME))
+    live_tree.apply_event(property_notify(MIDDLE, NET_WM_NAME))
+    live_tree.apply_event(property_notify(BOTTOM, ATOM_STRING))
+    assert live_tree._renamed_windows == {TOP, MIDDLE}
+
+
+@pytest.fixture
+def canned_live_tree(canned_x):
+    """
+    A LiveWindowTree connected to a CannedXServer, read from the replies for a root
+    window with the two children `TOP` and `BOTTOM`.
+    """
+    canned_x.setup(ROOT)
+    canned_x.intern_atom(NET_WM_NAME)
+    canned_x.intern_atom(UTF8_STRING)
+    for win_id, parent_id, x, children in [
+        (ROOT, 0, 0, [BOTTOM, TOP]),
+        (TOP, ROOT, 0, []),
+        (BOTTOM, ROOT, 20, []),
+    ]:
+        canned_x.skip()  # Selecting events on the window
+        canned_x.get_geometry(ROOT, x, x, 100, 100)
+        canned_x.translate_coordinates(x, x)
+        canned_x.get_property()
+        canned_x.get_property(ATOM_STRING, 8, hex(win_id).encode())
+        canned_x.query_tree(ROOT, parent_id, children)
+    with LiveWindowTree(":0") as live:
+        yield live
+    return
+
+
+def test_refresh_applies_events(canned_x, canned_live_tree):
+    assert stacking_order(canned_live_tree) == [TOP, BOTTOM]
+    canned_x.event(circulate_notify(BOTTOM, PLACE_ON_TOP))
+    canned_x.event(configure_notify(TOP, 0, 30, 40, 100, 100))
+    assert canned_live_tree.refresh(timeout=1) == 2
+    assert stacking_order(canned_live_tree) == [BOTTOM, TOP]
+    top = canned_live_tree.tree.get_window(TOP)
+    assert (top.geom.abs_x, top.geom.abs_y) == (30, 40)
+    canned_x.event(destroy_notify(TOP))
+    assert canned_live_tree.refresh(timeout=1) == 1
+    assert stacking_order(canned_live_tree) == [BOTTOM]
+
+
+def test_refresh_reads_new_windows(canned_x, canned_live_tree):
+    def write_replies():
+        canned_x.skip()  # Selecting events on the new window
+        canned_x.query_tree(ROOT, ROOT, [])
+        canned_x.get_property(UTF8_STRING, 8, "Nouvelle fenêtre".encode())
+        canned_x.get_property(ATOM_STRING, 8, b"new")
+        return
+
+    canned_x.event(create_notify(ROOT, NEW, 5, 5, 50, 50))
+    replying = canned_x.reply_to_next_requests(write_replies)
+    assert canned_live_tree.refresh(timeout=1) == 1
+    replying.join()
+    new = canned_live_tree.tree.get_window(NEW)
+    assert new.name == "Nouvelle fenêtre"
+    assert stacking_order(canned_live_tree) == [NEW, TOP, BOTTOM]
@@ -0,0 +1,57 @@
+"""
+Tests of the mozLz4 codec (`pyxsys.lz4`), with both the pure Python block decoder and
+(if the `lz4` package is installed) the C one.
+"""
+import pytest
+
+from pyxsys.lz4 import MOZLZ4_MAGIC, c_block_decompress
+from pyxsys.lz4 import compress_mozlz4, decompress_mozlz4
+
+TAB = b'{"url": "https://example.com/"},'
+JSON = b'{"windows": [{"tabs": [' + TAB * 200 + b"{}]}]}"
+
+needs_c_lz4 = pytest.mark.skipif(c_block_decompress is None, reason="needs lz4")
+decoders = [
+    pytest.param(False, id="python"),
+    pytest.param(True, id="c", marks=needs_c_lz4),
+]
+
+
+@pytest.mark.parametrize("accelerated", decoders)
+def test_round_trip(accelerated):
+    data = compress_mozlz4(JSON, accelerated=False)
+    assert bytes(decompress_mozlz4(data, accelerated=accelerated)) == JSON
+
+
+@pytest.mark.parametrize("accelerated", decoders)
+@pytest.mark.parametrize("cut", [1, 2, 3, 40])
+def test_truncated_file(tmp_path, accelerated, cut):
+    data = compress_mozlz4(JSON, accelerated=False)
+    path = tmp_path / "recovery.jsonlz4"
+    path.write_bytes(data[:-cut])
+    with pytest.raises(ValueError):
+        decompress_mozlz4(path.read_bytes(), accelerated=accelerated)
+
+
+@pytest.mark.parametrize("accelerated", decoders)
+def test_invalid_header(accelerated):
+    with pytest.raises(ValueError, match="too short"):
+        decompress_mozlz4(MOZLZ4_MAGIC[:5], accelerated=accelerated)
+    with pytest.raises(ValueError, match="Not a mozLz4 file"):
+        decompress_mozlz4(b"mozLz4X\0" + bytes(8), accelerated=accelerated)
+
+
+def test_wrong_declared_size():
+    data = bytearray(compress_mozlz4(JSON, accelerated=False))
+    data[len(MOZLZ4_MAGIC)] ^= 1
+    with pytest.raises(ValueError, match="header declared"):
+        decompress_mozlz4(data, accelerated=False)
+
+
+def test_invalid_match_offset():
+    # A sequence of 4 literals, then a match reaching 8 bytes back (before the start)
+    block = bytes([0x40]) + b"abcd" + (8).to_bytes(2, "little")
+    data = MOZLZ4_MAGIC + (8).to_bytes(4, "little") + block
+    with pytest.raises(ValueError, match="offset"):
+        decompress_mozlz4(data, accelerated=False)
+
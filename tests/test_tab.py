@@ -0,0 +1,40 @@
+"""
+Tests of Firefox session tabs (`pyxsys.ff.tab`), as read into Tab objects and into the
+columns of a CompactTabSet.
+"""
+import pytest
+
+from pyxsys.ff.tab import Tab, CompactTabSet
+from pyxsys.strings import StringTable
+
+ENTRIES = [
+    {"url": "https://example.com/", "title": "Example"},
+    {"url": "https://example.com/next", "title": "Next"},
+]
+TAB_JSON = {"entries": ENTRIES, "lastAccessed": 1600000000000, "index": 1, "image": ""}
+# Firefox leaves out the index of a tab with no history entries
+EMPTY_TAB_JSON = {"entries": [], "lastAccessed": 1600000000000, "image": ""}
+
+
+@pytest.fixture(params=["tab", "compact"])
+def make_tab(request):
+    if request.param == "tab":
+        return Tab
+    return lambda json: CompactTabSet([json], StringTable())[0]
+
+
+def test_current_state(make_tab):
+    tab = make_tab(TAB_JSON)
+    assert tab.current_state.url == "https://example.com/"
+    assert repr(tab).endswith("(1/2)")
+
+
+def test_current_state_defaults_to_last_entry(make_tab):
+    tab = make_tab({k: v for k, v in TAB_JSON.items() if k != "index"})
+    assert tab.current_state.title == "Next"
+
+
+def test_tab_with_no_history(make_tab):
+    tab = make_tab(EMPTY_TAB_JSON)
+    assert tab.current_state is None
+    assert repr(tab) == "Tab with no history"
@@ -0,0 +1,48 @@
+"""
+Tests of the compact window tree (`pyxsys.xw.tree⠶CompactWindowTree`), copied from a
+WindowTree parsed from xwininfo's output.
+"""
+import pickle
+
+import pytest
+
+from pyxsys.xw.tree import CompactWindowTree
+from pyxsys.xwininfo import process_xwin_tree
+
+XWININFO_TREE = """
+xwininfo: Window id: 0x6c9 (the root window) (has no name)
+
+  Root window id: 0x6c9 (the root window) (has no name)
+  Parent window id: 0x0 (none)
+     2 children:
+     0x1000000 "top": ()  100x100+0+0  +0+0
+        1 child:
+        0x1000002 "inner": ()  10x10+5+5  +5+5
+     0x1000001 "bottom": ()  100x100+20+20  +20+20
+"""
+ROOT, TOP, BOTTOM, INNER = 0x6C9, 0x1000000, 0x1000001, 0x1000002
+
+
+@pytest.fixture
+def compact_tree():
+    return CompactWindowTree(process_xwin_tree(XWININFO_TREE))
+
+
+def test_id_index(compact_tree):
+    id_index = compact_tree.id_index
+    assert sorted(id_index) == [ROOT, TOP, BOTTOM, INNER]
+    assert id_index[INNER] == compact_tree.get_window(INNER)
+    assert id_index[INNER].name == "inner"
+    assert compact_tree.id_index is id_index
+
+
+def test_get_window(compact_tree):
+    assert compact_tree.get_window("0x01000001").name == "bottom"
+    assert compact_tree.get_window(0x1000003) is None
+
+
+def test_pickle_leaves_out_id_index(compact_tree):
+    compact_tree.id_index
+    restored = pickle.loads(pickle.dumps(compact_tree))
+    assert restored._id_index is None
+    assert restored.id_index[TOP].name == "top"
@@ -0,0 +1,316 @@
+"""
+Tests of the X11 protocol client (`pyxsys.x11`). Most replay canned replies and events
+(see `conftest⠶CannedXServer`), and those comparing a window tree with xwininfo's run
+against a fresh Xvfb server, skipped unless `Xvfb` and `xwininfo` are installed.
+"""
+import os
+import subprocess
+from shutil import which
+from struct import pack
+
+import pytest
+
+from pyxsys import x11
+from pyxsys.x11 import X11Connection, ATOM_STRING, ATOM_WINDOW, ATOM_WM_NAME, pad
+from pyxsys.x11 import PROPERTY_NOTIFY, PROPERTY_CHANGE_MASK
+from pyxsys.x11 import decode_name, get_geometry, read_x11_tree, build_x11_tree
+from pyxsys.x11 import query_tree, translate_coordinates, get_property, intern_atom
+from pyxsys.x11 import select_input
+from pyxsys.xwininfo import read_xwin_tree
+
+UTF8_STRING = 300  # Arbitrary atoms standing in for those interned by a connection
+NET_WM_NAME = 301
+
+# Window IDs for canned replies
+ROOT, FRAME, INNER, GONE = 0x6C9, 0x1000000, 0x1000001, 0x1000002
+
+# Request opcodes used to make windows to read back (not needed by pyxsys itself)
+CREATE_WINDOW = 1
+MAP_WINDOW = 8
+CHANGE_PROPERTY = 18
+
+
+def test_decode_name_prefers_utf8_net_wm_name():
+    net_wm_name = (UTF8_STRING, 8, "Façade ✓".encode())
+    wm_name = (ATOM_STRING, 8, b"plain")
+    assert decode_name(net_wm_name, wm_name, UTF8_STRING) == "Façade ✓"
+
+
+def test_decode_name_falls_back_on_wrongly_typed_net_wm_name():
+    # For a property of another type, the server replies with that type and no value
+    net_wm_name = (ATOM_STRING, 8, b"")
+    wm_name = (ATOM_STRING, 8, "caf\xe9".encode("latin-1"))
+    assert decode_name(net_wm_name, wm_name, UTF8_STRING) == "caf\xe9"
+
+
+def test_decode_name_of_unnamed_window():
+    assert decode_name(None, None, UTF8_STRING) is None
+
+
+@pytest.fixture(scope="module")
+def xvfb_display():
+    """
+    Start an Xvfb server (on the first free display, without an Xauthority file) and
+    return its display name, with `DISPLAY` set to it for the tests in the module.
+    """
+    if which("Xvfb") is None or which("xwininfo") is None:
+        pytest.skip("Xvfb and xwininfo are needed to read window trees")
+    read_fd, write_fd = os.pipe()
+    args = ["Xvfb", "-displayfd", str(write_fd), "-nolisten", "tcp"]
+    args += ["-screen", "0", "1024x768x24"]
+    proc = subprocess.Popen(args, pass_fds=[write_fd], stderr=subprocess.DEVNULL)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as displayfd:
+        d_num = displayfd.readline().strip()
+    if not d_num:
+        proc.kill()
+        proc.wait()
+        pytest.skip("Xvfb failed to start")
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("DISPLAY", f":{d_num}")
+        mp.setenv("XAUTHORITY", os.devnull)
+        yield f":{d_num}"
+    proc.terminate()
+    proc.wait()
+    return
+
+
+def create_window(wid, parent, x, y, width, height, border=0):
+    # An InputOutput window of the parent's depth and visual, with no attributes set
+    fields = (wid, parent, x, y, width, height, border, 1, 0, 0)
+    return pack("<BBHIIhhHHHHII", CREATE_WINDOW, 0, 8, *fields)
+
+
+def change_property(wid, prop, prop_type, value):
+    n = len(value)
+    length = 6 + (n + pad(n)) // 4
+    req = pack("<BBHIIIB3xI", CHANGE_PROPERTY, 0, length, wid, prop, prop_type, 8, n)
+    return req + value + bytes(pad(n))
+
+
+def map_window(wid):
+    return pack("<BxHI", MAP_WINDOW, 2, wid)
+
+
+@pytest.fixture(scope="module")
+def x_windows(xvfb_display):
+    """
+    Make some windows on the Xvfb server (mapped and unmapped, nested, with borders,
+    and named in each of the ways `decode_name` handles), kept until the tests end.
+    """
+    conn = X11Connection(xvfb_display)
+    net_wm_name, utf8_string = conn.intern_atoms(["_NET_WM_NAME", "UTF8_STRING"])
+    base = conn._resource_id_base
+    frame, inner, wrongly_typed, unnamed = base + 1, base + 2, base + 3, base + 4
+    conn.send(
+        [
+            create_window(frame, conn.root, 10, 20, 300, 200, border=2),
+            change_property(frame, net_wm_name, utf8_string, "Façade ✓".encode()),
+            create_window(inner, frame, 5, 6, 50, 40),
+            change_property(inner, ATOM_WM_NAME, ATOM_STRING, b"plain"),
+            create_window(wrongly_typed, conn.root, 400, 300, 80, 60, border=1),
+            change_property(wrongly_typed, net_wm_name, ATOM_STRING, b"wrong type"),
+            change_property(wrongly_typed, ATOM_WM_NAME, ATOM_STRING, b"fallback"),
+            create_window(unnamed, conn.root, 0, 0, 10, 10),
+            map_window(frame),
+            map_window(inner),
+            map_window(wrongly_typed),
+        ]
+    )
+    # A round trip, so that the server has made the windows before they are read
+    conn.pipeline([get_geometry(unnamed)])
+    yield {"frame": frame, "inner": inner, "wrongly_typed": wrongly_typed}
+    conn.close()
+    return
+
+
+def tree_rows(tree):
+    """
+    Every window of a WindowTree as a comparable tuple, in the order of its outline.
+    The source window's name and geometry (from the header of xwininfo's output) are
+    left out, as only its child windows' are read the same way by both.
+    """
+    rows = []
+    for depth, w in tree.iter_depth_first():
+        name, fields = None, None
+        if depth > 0:
+            g = w.geom
+            name = w.name
+            fields = (g.width, g.height, g.abs_x, g.abs_y, g.rel_x, g.rel_y)
+        children = [int(c.win_id, 16) for c in w.children]
+        rows.append((depth, int(w.win_id, 16), name, fields, children))
+    return rows
+
+
+def test_read_x11_tree_matches_xwininfo(x_windows):
+    x11_tree = read_x11_tree()
+    xwin_tree = read_xwin_tree()
+    assert tree_rows(x11_tree) == tree_rows(xwin_tree)
+    assert int(x11_tree.root.win_id, 16) == int(xwin_tree.root.win_id, 16)
+
+
+def test_read_x11_tree_window_names(x_windows):
+    tree = read_x11_tree()
+    assert tree.get_window(x_windows["frame"]).name == "Façade ✓"
+    assert tree.get_window(x_windows["inner"]).name == "plain"
+    assert tree.get_window(x_windows["wrongly_typed"]).name == "fallback"
+
+
+def test_read_x11_tree_geometry(x_windows):
+    inner = read_x11_tree().get_window(x_windows["inner"])
+    # Absolute positions are of the outer edge of the border, as xwininfo gives them
+    assert (inner.geom.rel_x, inner.geom.rel_y) == (5, 6)
+    assert (inner.geom.abs_x, inner.geom.abs_y) == (10 + 2 + 5, 20 + 2 + 6)
+
+
+@pytest.fixture
+def conn(canned_x):
+    """
+    An X11Connection to a CannedXServer with one screen (whose root window is `ROOT`).
+    """
+    canned_x.setup(ROOT)
+    with X11Connection(":0") as conn:
+        yield conn
+    return
+
+
+def property_notify(win_id, atom):
+    # Code, sequence number, window, atom, time, then the state (0 for a new value)
+    return pack("<BxHIIIB15x", PROPERTY_NOTIFY, 0, win_id, atom, 0, 0)
+
+
+def test_setup_reads_root_window(conn):
+    assert conn.root == ROOT
+    assert conn.roots == [ROOT]
+    assert conn._resource_id_base == 0x400000
+
+
+def test_setup_refused(canned_x):
+    reason = b"No protocol specified"
+    body = reason + bytes(pad(len(reason)))
+    canned_x.write(pack("<BBHHH", 0, len(reason), 11, 0, len(body) // 4) + body)
+    with pytest.raises(ConnectionRefusedError, match="No protocol specified"):
+        X11Connection(":0")
+
+
+def test_pipeline_decodes_replies(canned_x, conn):
+    canned_x.query_tree(ROOT, 0, [INNER, FRAME])
+    canned_x.get_geometry(ROOT, -5, 6, 300, 200, border=2)
+    canned_x.translate_coordinates(10, 20)
+    canned_x.get_property(UTF8_STRING, 8, "Façade ✓".encode())
+    canned_x.get_property(ATOM_WINDOW, 32, (FRAME, INNER))
+    canned_x.get_property()
+    canned_x.intern_atom(UTF8_STRING)
+    replies = conn.pipeline(
+        [
+            query_tree(ROOT),
+            get_geometry(FRAME),
+            translate_coordinates(FRAME, ROOT),
+            get_property(FRAME, NET_WM_NAME, UTF8_STRING),
+            get_property(ROOT, 302, ATOM_WINDOW),
+            get_property(FRAME, ATOM_WM_NAME),
+            intern_atom("UTF8_STRING"),
+        ]
+    )
+    assert replies == [
+        (ROOT, 0, (INNER, FRAME)),
+        (-5, 6, 300, 200, 2),
+        (10, 20),
+        (UTF8_STRING, 8, "Façade ✓".encode()),
+        (ATOM_WINDOW, 32, (FRAME, INNER)),
+        None,
+        UTF8_STRING,
+    ]
+
+
+def test_pipeline_errors_and_events(canned_x, conn):
+    event = property_notify(FRAME, ATOM_WM_NAME)
+    canned_x.error()  # For the select_input, which nothing waits for
+    canned_x.event(event)
+    canned_x.error()
+    canned_x.query_tree(ROOT, 0, [])
+    replies = conn.pipeline(
+        [
+            select_input(GONE, PROPERTY_CHANGE_MASK),
+            get_geometry(GONE),
+            query_tree(ROOT),
+        ]
+    )
+    assert replies == [None, None, (ROOT, 0, ())]
+    assert conn.events == [event]
+    assert conn.poll_events() == [event]
+    assert conn.poll_events() == []
+
+
+def test_pipeline_across_sequence_number_wrap(canned_x, conn):
+    conn._seq = canned_x.seq = 0xFFFE
+    for atom in (400, 401, 402):
+        canned_x.intern_atom(atom)
+    assert conn.pipeline([intern_atom(n) for n in "ABC"]) == [400, 401, 402]
+
+
+def test_pipeline_in_batches(canned_x, conn, monkeypatch):
+    monkeypatch.setattr(x11, "MAX_PIPELINE", 2)
+    requests = [get_geometry(FRAME), select_input(FRAME, 0), get_geometry(INNER)]
+    canned_x.get_geometry(ROOT, 1, 2, 3, 4)
+    canned_x.skip()
+    canned_x.get_geometry(ROOT, 5, 6, 7, 8)
+    assert conn.pipeline(requests) == [(1, 2, 3, 4, 0), None, (5, 6, 7, 8, 0)]
+
+
+def test_pipeline_reads_long_replies(canned_x, conn):
+    # Longer than a single read from the socket
+    children = list(range(FRAME, FRAME + 20000))
+    canned_x.query_tree(ROOT, 0, children)
+    canned_x.intern_atom(UTF8_STRING)
+    replies = conn.pipeline([query_tree(ROOT), intern_atom("UTF8_STRING")])
+    assert replies == [(ROOT, 0, tuple(children)), UTF8_STRING]
+
+
+def test_intern_atoms_cached(canned_x, conn):
+    canned_x.intern_atom(NET_WM_NAME)
+    canned_x.intern_atom(UTF8_STRING)
+    assert conn.intern_atoms(["_NET_WM_NAME", "UTF8_STRING"]) == [301, 300]
+    canned_x.intern_atom(302)
+    atoms = conn.intern_atoms(["UTF8_STRING", "WM_STATE", "_NET_WM_NAME"])
+    assert atoms == [300, 302, 301]
+
+
+def test_poll_events_drops_errors(canned_x, conn):
+    events = [property_notify(w, ATOM_WM_NAME) for w in (FRAME, INNER)]
+    canned_x.event(events[0])
+    canned_x.error()  # For a request sent without waiting for a reply
+    canned_x.event(events[1])
+    assert conn.poll_events(timeout=1) == events
+
+
+def test_build_x11_tree(canned_x, conn):
+    canned_x.intern_atom(NET_WM_NAME)
+    canned_x.intern_atom(UTF8_STRING)
+    # The root window, whose children are listed bottom-to-top
+    canned_x.get_geometry(ROOT, 0, 0, 1024, 768)
+    canned_x.translate_coordinates(0, 0)
+    canned_x.get_property()
+    canned_x.get_property(ATOM_STRING, 8, b"root")
+    canned_x.query_tree(ROOT, 0, [GONE, FRAME])
+    # The top-level windows, top of the stacking order first
+    canned_x.get_geometry(ROOT, 10, 20, 300, 200, border=2)
+    canned_x.translate_coordinates(12, 22)
+    canned_x.get_property(UTF8_STRING, 8, "Façade ✓".encode())
+    canned_x.get_property(ATOM_STRING, 8, b"frame")
+    canned_x.query_tree(ROOT, ROOT, [INNER])
+    for _ in range(5):
+        # Destroyed after the root window's children were listed
+        canned_x.error()
+    canned_x.get_geometry(ROOT, 5, 6, 50, 40)
+    canned_x.translate_coordinates(17, 28)
+    canned_x.get_property(ATOM_STRING, 8, b"")
+    canned_x.get_property(ATOM_STRING, 8, b"plain")
+    canned_x.query_tree(ROOT, FRAME, [])
+    tree = build_x11_tree(conn)
+    assert tree.root.name == "root"
+    assert tree_rows(tree) == [
+        (0, ROOT, None, None, [FRAME]),
+        (1, FRAME, "Façade ✓", (300, 200, 10, 20, 10, 20), [INNER]),
+        (2, INNER, "plain", (50, 40, 17, 28, 5, 6), []),
+    ]